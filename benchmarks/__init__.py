@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.benchmarks
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Micro-benchmarks for the hot paths of SnapSearch. Each module is runnable,
+    e.g. ``python -m benchmarks.bench_detector``.
+"""
+
+__all__ = ['measure', 'report', ]
+
+
+import os.path
+import sys
+import timeit
+
+# local SnapSearch package takes precedence
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+
+def measure(func, number=1000, repeat=5):
+    """
+    Returns the best time per call of ``func()`` in microseconds.
+    """
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def report(title, rows):
+    """
+    Writes a table of ``(label, value, ...)`` rows to standard output.
+    """
+    sys.stdout.write("\n%s\n%s\n" % (title, "-" * len(title)))
+    for row in rows:
+        sys.stdout.write("  %-36s" % row[0])
+        for val in row[1:]:
+            if isinstance(val, float):
+                sys.stdout.write(" %12.2f" % val)
+            else:
+                sys.stdout.write(" %12s" % (val, ))
+        sys.stdout.write("\n")
+    sys.stdout.flush()
+    pass  # void return
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.benchmarks.bench_asgi
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Benchmarks SnapSearch.asgi with an in-process ASGI test client
+"""
+
+import asyncio
+import time
+
+try:
+    from . import measure, report
+except (ValueError, ImportError):
+    from __init__ import measure, report
+
+from SnapSearch import Client, Detector, Interceptor
+from SnapSearch.aio import AsyncClient, AsyncInterceptor
+from SnapSearch.asgi import InterceptorMiddleware
+
+
+BROWSER_UA = b"Mozilla/5.0 (Windows NT 6.1; WOW64; rv:27.0) " \
+             b"Gecko/20100101 Firefox/27.0"
+ROBOT_UA = b"AdsBot-Google ( http://www.google.com/adsbot.html)"
+
+# simulated round trip to SnapSearch backend service, in seconds
+LATENCY = 0.02
+
+CONTENT = {'status': 200,
+           'headers': [{'name': "Server", 'value': "bench"}, ],
+           'html': "<html><body>bench</body></html>", }
+
+
+class SyncBackendClient(Client):
+
+    __slots__ = []
+
+    def __call__(self, current_url):
+        time.sleep(LATENCY)
+        return dict(CONTENT)
+
+    pass
+
+
+class AsyncBackendClient(AsyncClient):
+
+    __slots__ = []
+
+    async def __call__(self, current_url):
+        await asyncio.sleep(LATENCY)
+        return dict(CONTENT)
+
+    pass
+
+
+async def application(scope, receive, send):
+    await send({'type': "http.response.start", 'status': 200,
+                'headers': [(b"content-type", b"text/html"), ]})
+    await send({'type': "http.response.body", 'body': b"Hello World!\r\n"})
+
+
+class BlockingBridge(object):
+    """
+    The former setup: a WSGI-style interceptor run in a thread executor for
+    every request, before handing over to the ASGI application.
+    """
+
+    def __init__(self, interceptor):
+        self.interceptor = interceptor
+
+    async def __call__(self, scope, receive, send):
+        from SnapSearch.asgi import _build_environ
+        loop = asyncio.get_event_loop()
+        response = await loop.run_in_executor(
+            None, self.interceptor, _build_environ(scope))
+        if isinstance(response, dict):
+            await send({'type': "http.response.start", 'status': 200,
+                        'headers': []})
+            await send({'type': "http.response.body",
+                        'body': response['html'].encode("utf-8")})
+            return
+        await application(scope, receive, send)
+
+    pass
+
+
+def make_scope(user_agent):
+    return {'type': "http", 'http_version': "1.1", 'method': "GET",
+            'scheme': "http", 'path': "/blog/2014/03/", 'root_path': "",
+            'query_string': b"page=2", 'server': ("localhost", 80),
+            'headers': [(b"host", b"localhost"),
+                        (b"user-agent", user_agent), ], }
+
+
+async def request(app, scope):
+    # in-process ASGI test client
+    messages = []
+
+    async def receive():
+        return {'type': "http.request", 'body': b"", 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages
+
+
+async def fan_out(app, scope, concurrency):
+    return await asyncio.gather(
+        *[request(app, scope) for i in range(concurrency)])
+
+
+def make_apps():
+    sync_interceptor = Interceptor(
+        SyncBackendClient("bench@email.com", "key"), Detector())
+    async_interceptor = AsyncInterceptor(
+        AsyncBackendClient("bench@email.com", "key"), Detector())
+    return [("sync bridge (executor)", BlockingBridge(sync_interceptor)),
+            ("asgi + Interceptor",
+             InterceptorMiddleware(application, sync_interceptor)),
+            ("asgi + AsyncInterceptor",
+             InterceptorMiddleware(application, async_interceptor)), ]
+
+
+def bench_asgi_call():
+    loop = asyncio.new_event_loop()
+    rows = []
+    for label, app in [("application only", application)] + make_apps():
+        scope = make_scope(BROWSER_UA)
+        func = lambda: loop.run_until_complete(request(app, scope))
+        rows.append((label, measure(func, 1000)))
+    loop.close()
+    report("browser request: us/call", rows)
+    pass  # void return
+
+
+def bench_asgi_concurrency(concurrency=200):
+    loop = asyncio.new_event_loop()
+    rows = []
+    for label, app in make_apps():
+        scope = make_scope(ROBOT_UA)
+        start = time.time()
+        loop.run_until_complete(fan_out(app, scope, concurrency))
+        elapsed = time.time() - start
+        rows.append((label, elapsed * 1e3, concurrency / elapsed))
+    loop.close()
+    report("%d concurrent robot requests (%d ms backend): ms, requests/s" %
+           (concurrency, LATENCY * 1e3), rows)
+    pass  # void return
+
+
+if __name__ == '__main__':
+    bench_asgi_call()
+    bench_asgi_concurrency()
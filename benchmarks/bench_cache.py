@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.benchmarks.bench_cache
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Benchmarks SnapSearch.cache across worker processes
+"""
+
+import json
+import multiprocessing
+import shutil
+import tempfile
+import time
+
+try:
+    from . import measure, report
+except (ValueError, ImportError):
+    from __init__ import measure, report
+
+from SnapSearch import Client, Detector, Interceptor
+from SnapSearch.cache import DiskStorage, MemoryStorage, SnapshotCache
+
+
+ROBOT_UA = "AdsBot-Google ( http://www.google.com/adsbot.html)"
+
+# simulated render by SnapSearch backend service, in seconds
+LATENCY = 0.02
+
+CONTENT = {'status': 200,
+           'headers': [{'name': "Server", 'value': "bench"}, ],
+           'html': "<html><body>%s</body></html>" % ("x" * 64 * 1024), }
+
+
+class BackendClient(Client):
+
+    __slots__ = []
+
+    def __call__(self, current_url):
+        time.sleep(LATENCY)
+        return dict(CONTENT)
+
+    pass
+
+
+def make_environ(path):
+    return {'HTTP_USER_AGENT': ROBOT_UA,
+            'SERVER_NAME': "localhost",
+            'SERVER_PORT': "80",
+            'REQUEST_METHOD': "GET",
+            'PATH_INFO': path,
+            'wsgi.url_scheme': "http", }
+
+
+def worker(args):
+    # one worker process of a pre-fork server, returns its number of renders
+    directory, urls, rounds = args
+    storage = DiskStorage(directory) if directory else MemoryStorage()
+    cache = SnapshotCache(storage=storage)
+    interceptor = Interceptor(BackendClient("bench@email.com", "key"),
+                              Detector(), cache=cache)
+    for i in range(rounds):
+        for url in urls:
+            interceptor(make_environ(url))
+    return cache.misses
+
+
+def bench_cache_workers(workers=4, num_urls=50, rounds=4):
+    urls = ["/page/%d" % i for i in range(num_urls)]
+    pool = multiprocessing.Pool(workers)
+    rows = []
+    for label, shared in (("cache per process", False),
+                          ("shared DiskStorage", True)):
+        directory = tempfile.mkdtemp() if shared else None
+        # workers start on different URLs, as requests of a load balancer
+        jobs = [(directory, urls[i::workers] + urls, rounds)
+                for i in range(workers)]
+        start = time.time()
+        renders = sum(pool.map(worker, jobs))
+        elapsed = time.time() - start
+        rows.append((label, renders, elapsed * 1e3))
+        if directory:
+            shutil.rmtree(directory)
+    pool.close()
+    pool.join()
+    report("%d workers, %d URLs (%d ms render): renders, ms" %
+           (workers, num_urls, LATENCY * 1e3), rows)
+    pass  # void return
+
+
+def bench_cache_read():
+    directory = tempfile.mkdtemp()
+    storage = DiskStorage(directory)
+    blob = json.dumps({'stored': time.time(), 'content': CONTENT}).encode()
+    storage.set("k", blob)
+    path = storage._path("k")
+
+    def read_file():
+        with open(path, "rb") as f:
+            return json.loads(f.read().decode("utf-8"))
+
+    cache = SnapshotCache(storage=storage)
+    rows = [("read() + decode", measure(read_file, 200)),
+            ("SnapshotCache.lookup (mmap)",
+             measure(lambda: cache.lookup("k"), 200)), ]
+    shutil.rmtree(directory)
+    report("%d KB entry on disk: us/call" % (len(blob) // 1024), rows)
+    pass  # void return
+
+
+if __name__ == '__main__':
+    bench_cache_workers()
+    bench_cache_read()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.benchmarks.bench_client
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Benchmarks the request payloads and batch renders of SnapSearch.Client
+"""
+
+import json
+import time
+
+try:
+    from . import measure, report
+except (ValueError, ImportError):
+    from __init__ import measure, report
+
+from SnapSearch import Client
+
+
+# simulated render by SnapSearch backend service, in seconds
+LATENCY = 0.02
+
+URL = "http://localhost/page/42?q=\"snapsearch\""
+
+SMALL = {'test': 1, 'width': 1024, 'height': 768}
+
+LARGE = dict(SMALL,
+             javascript="document.title = \"%s\";" % ("x" * 4096),
+             cookies=[{'name': "c%d" % i, 'value': "v" * 64}
+                      for i in range(50)],
+             meta=True)
+
+
+def former_payload(request_parameters, current_url):
+    # the former serialization of all parameters for every request
+    params = dict(request_parameters)
+    params['url'] = current_url
+    return json.dumps(params)
+
+
+def bench_client_payload():
+    rows = []
+    for label, params in (("small", SMALL), ("large", LARGE)):
+        client = Client("bench@email.com", "key", params)
+        rows.append(("former: %s parameters" % label,
+                     measure(lambda: former_payload(params, URL))))
+        rows.append(("template: %s parameters" % label,
+                     measure(lambda: client._build_payload(URL))))
+    report("request payload: us/call", rows)
+    pass  # void return
+
+
+class BackendClient(Client):
+
+    __slots__ = []
+
+    def _dispatch(self, current_url):
+        time.sleep(LATENCY)
+        return {'status': 200, 'headers': [], 'html': current_url}
+
+    pass
+
+
+def bench_client_render_many(num_urls=500):
+    urls = ["http://localhost/page/%d" % i for i in range(num_urls)]
+    client = BackendClient("bench@email.com", "key", pool_size=32)
+
+    def serial():
+        for url in urls:
+            client(url)
+
+    rows = []
+    for label, func in [("serial loop", serial)] + [
+            ("render_many(concurrency=%d)" % concurrency,
+             lambda concurrency=concurrency: list(client.render_many(
+                 urls, concurrency=concurrency)))
+            for concurrency in (8, 32)]:
+        elapsed = measure(func, 1, 1) / 1e6
+        rows.append((label, elapsed, num_urls / elapsed))
+    report("%d URLs (%d ms render): s, URLs/s" %
+           (num_urls, LATENCY * 1e3), rows)
+    pass  # void return
+
+
+if __name__ == '__main__':
+    bench_client_payload()
+    bench_client_render_many()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.benchmarks.bench_detector
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Benchmarks SnapSearch.detector
+"""
+
+import json
+import random
+import re
+import string
+
+try:
+    from . import measure, report
+except (ValueError, ImportError):
+    from __init__ import measure, report
+
+import SnapSearch.api as api
+from SnapSearch import Detector
+from SnapSearch._compat import u
+from SnapSearch.detector import AhoCorasickMatcher, RegexMatcher, RouteMatcher
+from SnapSearch.detector import _file_extension
+
+
+BROWSER_UA = "Mozilla/5.0 (Windows NT 6.1; WOW64; rv:27.0) " \
+             "Gecko/20100101 Firefox/27.0"
+ROBOT_UA = "AdsBot-Google ( http://www.google.com/adsbot.html)"
+
+
+def make_tokens(size, seed=0):
+    # default robots, padded with random tokens up to ``size`` entries
+    with open(api.DEFAULT_ROBOTS_JSON) as f:
+        tokens = json.load(f)['match']
+    rng = random.Random(seed)
+    while len(tokens) < size:
+        tokens.append("".join(
+            rng.choice(string.ascii_letters) for i in range(10)) + "bot")
+    return tokens
+
+
+def bench_matchers():
+    rows = []
+    for size in (200, 2000, 20000):
+        tokens = make_tokens(size)
+        for engine in (AhoCorasickMatcher, RegexMatcher):
+            matcher = engine(tokens)
+            number = 10 if engine is RegexMatcher and size > 2000 else 200
+            rows.append(("%s x %d" % (engine.__name__, size),
+                         measure(lambda: matcher(BROWSER_UA), number),
+                         measure(lambda: matcher(ROBOT_UA), number)))
+    report("user agent matching (us/call): browser, robot", rows)
+    pass  # void return
+
+
+def bench_routes():
+    routes = set(["^/section%d/" % i for i in range(150)] +
+                 ["/archive/%d/[0-9]+$" % i for i in range(150)])
+    path = "/blog/2014/03/snapsearch-client-python?page=2"
+
+    def route_loop():
+        # per-request loop of ``Detector.__call__`` prior to ``RouteMatcher``
+        for route in routes:
+            if re.search(u(route), path, re.I | re.U):
+                return route
+        return None
+
+    matcher = RouteMatcher(routes)
+    assert not matcher(path) and route_loop() is None
+    report("route matching, %d routes (us/call)" % len(routes),
+           [("re.search() loop", measure(route_loop, 100)),
+            ("RouteMatcher", measure(lambda: matcher(path), 100))])
+    pass  # void return
+
+
+def bench_file_extension():
+    # regular expression of ``Detector.__call__`` prior to ``_file_extension``
+    regex = re.compile(r"^(?:(?![?#].*/[^/?#]+\.[^/?#]+).)*"
+                       r"/[^/?#]+\.([^/?#]+)", re.U)
+    rows = []
+    for label, path in (("normal", "/blog/2014/03/index.html?page=2"),
+                        ("8KB of slashes", "/" * 8192),
+                        ("8KB of '/a?'", "/a?" * 2731),
+                        ("8KB of '#/x'", "#/x" * 2731),
+                        ("8KB of '/x' and '?/a.b'", "/x" * 4093 + "?/a.b")):
+        number = 10 if len(path) > 100 else 1000
+        rows.append((label,
+                     measure(lambda: regex.match(path), number),
+                     measure(lambda: _file_extension(path), number)))
+    report("file extension (us/call): regex, scanner", rows)
+    pass  # void return
+
+
+def bench_detector_call():
+    environ = {
+        'SERVER_NAME': "localhost",
+        'SERVER_PORT': "80",
+        'SCRIPT_NAME': "/snapsearch/",
+        'PATH_INFO': "blog/2014/03/%E2%9C%93",
+        'REQUEST_METHOD': "GET",
+        'SERVER_PROTOCOL': "HTTP/1.1",
+        'QUERY_STRING': "page=2&sort=date",
+        'HTTP_HOST': "localhost",
+        'wsgi.url_scheme': "http", }
+    rows = []
+    for label, user_agent in (("browser", BROWSER_UA), ("robot", ROBOT_UA)):
+        request = dict(environ, HTTP_USER_AGENT=user_agent)
+        timings = []
+        for fast_path in (False, True):
+            detector = Detector(ignored_routes=["^/admin", "^/private"],
+                                check_file_extensions=True,
+                                fast_path=fast_path)
+            timings.append(measure(lambda: detector(dict(request)), 2000))
+        rows.append([label] + timings)
+    report("Detector.__call__ (us/call): fast_path=False, True", rows)
+    pass  # void return
+
+
+if __name__ == '__main__':
+    bench_detector_call()
+    bench_matchers()
+    bench_routes()
+    bench_file_extension()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.benchmarks.bench_environ
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Benchmarks SnapSearch.api.environ
+"""
+
+import tracemalloc
+
+try:
+    from . import measure, report
+except (ValueError, ImportError):
+    from __init__ import measure, report
+
+from SnapSearch.api import AnyEnv, LazyEnv
+
+
+ENVIRON = {
+    'SERVER_NAME': "localhost",
+    'SERVER_PORT': "80",
+    'SCRIPT_NAME': "/snapsearch/",
+    'PATH_INFO': "blog/2014/03/%E2%9C%93",
+    'REQUEST_METHOD': "GET",
+    'SERVER_PROTOCOL': "HTTP/1.1",
+    'QUERY_STRING': "page=2&sort=date",
+    'HTTP_HOST': "localhost",
+    'HTTP_USER_AGENT': "Mozilla/5.0 (Windows NT 6.1; rv:27.0) Firefox/27.0",
+    'HTTPS': "off", }
+
+
+def browser(wrapper):
+    # properties inspected by ``Detector`` for requests from browsers
+    def func():
+        environ = wrapper(dict(ENVIRON))
+        return environ.scheme, environ.method, environ.user_agent
+    return func
+
+
+def robot(wrapper):
+    # properties inspected by ``Detector`` for requests from robots
+    def func():
+        environ = wrapper(dict(ENVIRON))
+        return environ.scheme, environ.method, environ.user_agent, \
+            environ.path_qs, environ.url
+    return func
+
+
+def allocated(func, number=1000):
+    # average peak of memory allocated during one call, in bytes
+    tracemalloc.start()
+    total = 0
+    for i in range(number):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        func()
+        total += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return total / float(number)
+
+
+def bench_environ():
+    copy = lambda: dict(ENVIRON)
+    rows = [("dict(environ) only", measure(copy, 10000), allocated(copy))]
+    for label, case in (("browser", browser), ("robot", robot)):
+        for wrapper in (AnyEnv, LazyEnv):
+            func = case(wrapper)
+            rows.append(("%s: %s" % (label, wrapper.__name__),
+                         measure(func, 10000), allocated(func)))
+    report("environ wrappers: us/call, peak bytes/call", rows)
+    pass  # void return
+
+
+if __name__ == '__main__':
+    bench_environ()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.benchmarks.bench_response
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Benchmarks the response body path of SnapSearch.wsgi and SnapSearch.cgi
+"""
+
+import sys
+import tracemalloc
+
+try:
+    from . import measure, report
+except (ValueError, ImportError):
+    from __init__ import measure, report
+
+from SnapSearch import Client, Detector, Interceptor
+from SnapSearch._compat import u
+from SnapSearch.cgi import InterceptorController
+from SnapSearch.wsgi import InterceptorMiddleware, default_response_callback
+
+
+ENVIRON = {
+    'HTTP_USER_AGENT': "AdsBot-Google ( http://www.google.com/adsbot.html)",
+    'SERVER_NAME': "localhost",
+    'SERVER_PORT': "80",
+    'REQUEST_METHOD': "GET",
+    'PATH_INFO': "/",
+    'GATEWAY_INTERFACE': "CGI/1.1",
+    'HTTPS': "off",
+    'wsgi.url_scheme': "http", }
+
+# size of the rendered snapshots, in bytes
+SIZE = 4 * 1024 * 1024
+
+
+class SnapshotClient(Client):
+
+    __slots__ = ['html', ]
+
+    def __call__(self, current_url):
+        return {'status': 200,
+                'headers': [{'name': "Server", 'value': "bench"}, ],
+                'html': self.html, }
+
+    pass
+
+
+HTML = u("<html><body>%s</body></html>") % (u("x") * SIZE)
+
+
+def former_wsgi(interceptor):
+    # the former shipping of intercepted responses through WSGI
+    def app(environ, start_response):
+        message = default_response_callback(interceptor(environ))
+        start_response(message['status'].decode(),
+                       [(name.decode(), value.decode())
+                        for name, value in message['headers']])
+        return message['html'],
+    return app
+
+
+def former_cgi(interceptor, stdout):
+    # the former shipping of intercepted responses through CGI
+    message = default_response_callback(interceptor(dict(ENVIRON)))
+    stdout.write(b"Status: ")
+    stdout.write(message['status'])
+    stdout.write(b"\r\n")
+    for key, val in message['headers']:
+        stdout.write(key)
+        stdout.write(b": ")
+        stdout.write(val)
+        stdout.write(b"\r\n")
+    stdout.write(b"\r\n")
+    stdout.write(message['html'])
+
+
+def allocated(func, number=5):
+    # average peak of memory allocated during one call, in bytes
+    tracemalloc.start()
+    total = 0
+    for i in range(number):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        func()
+        total += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return total / float(number)
+
+
+class NullStream(object):
+    # binary standard output discarding its data
+
+    def write(self, data):
+        return len(data)
+
+    def flush(self):
+        pass
+
+    pass
+
+
+def make_interceptor(html):
+    client = SnapshotClient("bench@email.com", "key")
+    client.html = html
+    return Interceptor(client, Detector())
+
+
+def serve(app):
+    # a WSGI server writing out the chunks of the body
+    stream = NullStream()
+    for chunk in app(dict(ENVIRON), lambda *args: None):
+        stream.write(chunk)
+
+
+def bench_response_wsgi():
+    rows = []
+    interceptor = make_interceptor(HTML)
+    apps = [("former", former_wsgi(interceptor)),
+            ("InterceptorMiddleware",
+             InterceptorMiddleware(None, interceptor)),
+            ("chunk_size=65536",
+             InterceptorMiddleware(None, interceptor, chunk_size=65536)), ]
+    for label, app in apps:
+        func = lambda: serve(app)
+        rows.append((label, measure(func, 10), allocated(func) / SIZE))
+    report("%d MB snapshot via WSGI: us/response, peak bytes/byte" %
+           (SIZE >> 20), rows)
+    pass  # void return
+
+
+def bench_response_cgi():
+    interceptor = make_interceptor(HTML)
+
+    def former():
+        former_cgi(interceptor, NullStream())
+
+    def current():
+        ic = InterceptorController(interceptor)
+        old_stdout, sys.stdout = sys.stdout, NullStream()
+        try:
+            ic.start(dict(ENVIRON))
+            ic.stop(False)
+        finally:
+            sys.stdout = old_stdout
+
+    rows = [(label, measure(func, 10), allocated(func) / SIZE)
+            for label, func in (("former", former),
+                                ("InterceptorController", current))]
+    report("%d MB snapshot via CGI: us/response, peak bytes/byte" %
+           (SIZE >> 20), rows)
+    pass  # void return
+
+
+if __name__ == '__main__':
+    bench_response_wsgi()
+    bench_response_cgi()
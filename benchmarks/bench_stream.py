@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.benchmarks.bench_stream
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Benchmarks SnapSearch.api.stream
+"""
+
+import json
+import tracemalloc
+
+try:
+    from . import measure, report
+except (ValueError, ImportError):
+    from __init__ import measure, report
+
+from SnapSearch._compat import u
+from SnapSearch.api.stream import BodyParser, CHUNK_SIZE
+
+
+# size of the rendered snapshot, in bytes
+SIZE = 4 * 1024 * 1024
+
+RAW = json.dumps({
+    'code': "success",
+    'content': {
+        'status': 200,
+        'headers': [{'name': "Server", 'value': "bench"}, ],
+        'html': u("<p class=\"x\">caf\xe9</p>\n") * (SIZE // 24), },
+}).encode()
+
+CHUNKS = [RAW[i:i + CHUNK_SIZE] for i in range(0, len(RAW), CHUNK_SIZE)]
+
+
+def former():
+    # the former ``pycurl`` path: buffer, copy, decode, then parse
+    buffer_ = bytearray()
+    for chunk in CHUNKS:
+        buffer_.extend(chunk)
+    return json.loads(bytes(buffer_).decode())
+
+
+def streaming():
+    parser = BodyParser()
+    for chunk in CHUNKS:
+        parser.feed(chunk)
+    return parser.close()
+
+
+def allocated(func, number=5):
+    # average peak of memory allocated during one call, in bytes
+    tracemalloc.start()
+    total = 0
+    for i in range(number):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        func()
+        total += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return total / float(number)
+
+
+def bench_stream():
+    assert former() == streaming()
+    rows = [(label, measure(func, 5) / 1e3, allocated(func) / len(RAW))
+            for label, func in (("buffer + json.loads", former),
+                                ("BodyParser", streaming))]
+    report("%d MB response in %d KB chunks: ms, peak bytes/byte" %
+           (len(RAW) >> 20, CHUNK_SIZE >> 10), rows)
+    pass  # void return
+
+
+if __name__ == '__main__':
+    bench_stream()
@@ -34,6 +34,7 @@ try:
     from urllib.parse import quote as url_quote
     from urllib.parse import urlsplit as url_split
     from urllib.parse import unquote as url_unquote
+    import queue
 except ImportError:
     # python 2.x
     from httplib import responses as HTTP_STATUS_CODES
@@ -41,6 +42,7 @@ except ImportError:
     from urllib import quote as url_quote
     from urlparse import urlsplit as url_split
     from urllib import unquote as url_unquote
+    import Queue as queue
 
 # string literal utilities
 
@@ -77,3 +79,82 @@ def b(s):
 
 def identity(any):
     return any
+
+
+# ordered ``dict`` (missing in python 2.6)
+
+class _OrderedDict(dict):
+    """
+    ``dict`` remembering the insertion order of its keys, with the subset
+    of ``collections.OrderedDict`` used by SnapSearch (python 2.6).
+    """
+
+    __slots__ = ['__links', '__root', ]
+
+    def __init__(self):
+        super(_OrderedDict, self).__init__()
+        # circular doubly linked list of ``[prev, next, key]``
+        self.__root = root = []
+        root[:] = [root, root, None]
+        self.__links = {}
+        pass  # void return
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            root = self.__root
+            last = root[0]
+            last[1] = root[0] = self.__links[key] = [last, root, key]
+        super(_OrderedDict, self).__setitem__(key, value)
+        pass  # void return
+
+    def __delitem__(self, key):
+        super(_OrderedDict, self).__delitem__(key)
+        prev, next, key = self.__links.pop(key)
+        prev[1], next[0] = next, prev
+        pass  # void return
+
+    def __iter__(self):
+        root = self.__root
+        link = root[1]
+        while link is not root:
+            yield link[2]
+            link = link[1]
+
+    def clear(self):
+        super(_OrderedDict, self).clear()
+        root = self.__root
+        root[:] = [root, root, None]
+        self.__links.clear()
+        pass  # void return
+
+    def pop(self, key, *default):
+        if key not in self:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        value = self[key]
+        del self[key]
+        return value
+
+    def popitem(self, last=True):
+        if not self:
+            raise KeyError("dictionary is empty")
+        key = self.__root[0 if last else 1][2]
+        return key, self.pop(key)
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    pass
+
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    OrderedDict = _OrderedDict
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.aio
+    ~~~~~~~~~~~~~~
+
+    asyncio-native ``Client`` and ``Interceptor`` (requires python 3.5 or
+    later)
+
+    :copyright: 2014 by `SnapSearch <https://snapsearch.io/>`_
+    :license: MIT, see LICENSE for more details.
+
+    :author: `LIU Yu <liuyu@opencps.net>`_
+    :date: 2014/03/08
+"""
+
+__all__ = ['AsyncClient', 'AsyncInterceptor', ]
+
+
+import asyncio
+import copy
+import functools
+import inspect
+
+import SnapSearch.api.aio as aio_api
+import SnapSearch.error as error
+
+from .client import Client, RenderStats
+from .interceptor import Interceptor
+
+
+class AsyncClient(Client):
+    """
+    Coroutine version of ``Client``. Awaiting an ``AsyncClient`` object
+    dispatches a URL to SnapSearch backend service over asyncio streams, with
+    at most ``pool_size`` requests in flight at once.
+    """
+
+    # private properties
+    __slots__ = ['__timeout', '__flights', '__coalesce_timeout', ]
+
+    def __init__(self, api_email, api_key, request_parameters={},
+                 api_url=None, ca_path=None, pool_size=10, keep_alive=True,
+                 coalesce=True, coalesce_timeout=None, timeout=None,
+                 breaker=None):
+        """
+        Takes the same arguments as ``Client``, with ``pool_size`` bounding
+        the number of concurrent requests.
+
+        Optional arguments:
+
+        :param timeout: seconds allowed for each request, including the
+            connection to SnapSearch backend service (defaults to
+            ``api.SNAPSEARCH_API_TIMEOUT``).
+        :type timeout: ``int`` or ``float``
+        """
+        self.__timeout = timeout
+        super(AsyncClient, self).__init__(
+            api_email, api_key, request_parameters, api_url, ca_path,
+            pool_size, keep_alive, coalesce=False, breaker=breaker)
+
+        # dispatches in flight by URL (if coalescing), as futures
+        self.__flights = {} if coalesce else None
+        self.__coalesce_timeout = coalesce_timeout
+
+        pass  # void return
+
+    def _new_session(self, pool_size, keep_alive):
+        return aio_api.AsyncSession(pool_size=pool_size, keep_alive=keep_alive,
+                                    timeout=self.__timeout)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+        pass  # void return
+
+    async def __call__(self, current_url):
+        """
+        :param current_url: URL that the search engine robot is currently
+            trying to access.
+
+        :returns: the response from SnapSearch backend service, or ``None``
+            (as of ``Client.__call__()``).
+
+        :raises error.SnapSearchConnectionError: if SnapSearch backend service
+            cannot be reached within ``timeout`` seconds.
+        :raises error.SnapSearchError: if the response is malformed, or if
+            the ``code`` field of the response ``body`` equals
+            ``"validation_error"``.
+        :raises error.SnapSearchConnectionError: if ``coalesce_timeout``
+            elapsed before the in-flight dispatch of the same URL completed.
+        :raises error.SnapSearchCircuitOpenError: if the dispatch is skipped
+            by the ``breaker``.
+        """
+        if self.__flights is None:
+            return await self._dispatch_async(current_url)
+
+        # join the dispatch in flight for the same URL, if any
+        flight = self.__flights.get(current_url)
+        if flight is not None:
+            try:
+                return copy.deepcopy(await asyncio.wait_for(
+                    asyncio.shield(flight), self.__coalesce_timeout))
+            except asyncio.TimeoutError:
+                raise error.SnapSearchConnectionError(
+                    "timed out waiting for the in-flight request of the "
+                    "same URL")
+
+        # lead the dispatch, and share its outcome with the other callers,
+        # as a copy untouched by the leading caller
+        flight = self.__flights[current_url] = \
+            asyncio.get_event_loop().create_future()
+        try:
+            result = await self._dispatch_async(current_url)
+        except BaseException as e:
+            if not isinstance(e, Exception):
+                e = error.SnapSearchError(
+                    "in-flight request to SnapSearch backend aborted")
+            flight.set_exception(e)
+            flight.exception()  # retrieved, even without other callers
+            raise
+        else:
+            flight.set_result(copy.deepcopy(result))
+            return result
+        finally:
+            del self.__flights[current_url]
+
+    def render_many(self, urls, concurrency=10, retries=3, backoff=0.5,
+                    progress=None):
+        """
+        Takes the same arguments as ``Client.render_many()``, with
+        ``concurrency`` tasks (instead of threads) awaiting the
+        ``AsyncClient``, which in turn keeps at most ``pool_size`` requests
+        in flight.
+
+        :returns: an asynchronous iterator of ``(url, result)`` in the order
+            of completion (as of ``Client.render_many()``), to be consumed
+            with ``async for``. Awaiting its ``aclose()`` stops the rendering
+            early.
+        """
+        return _RenderMany(self, urls, concurrency, retries, backoff,
+                           progress)
+
+    async def _render_retrying(self, current_url, retries, backoff):
+        # ``(result, attempts)`` of ``current_url``, retrying on connection
+        # errors with exponential backoff
+        attempt = 0
+        while True:
+            try:
+                return await self(current_url), attempt + 1
+            except error.SnapSearchConnectionError as e:
+                if attempt >= retries:
+                    return e, attempt + 1
+                await asyncio.sleep(backoff * 2 ** attempt)
+            except error.SnapSearchError as e:
+                return e, attempt + 1
+            attempt += 1
+
+    async def _dispatch_async(self, current_url):
+        # dispatch the request to SnapSearch backend
+        with self._guard():
+            r = await aio_api.dispatch(**self._prepare_dispatch(current_url))
+            return self._parse_response(r)
+
+    pass
+
+
+class _RenderMany(object):
+    """
+    Asynchronous iterator of ``AsyncClient.render_many()``, fed by worker
+    tasks started on its first iteration.
+    """
+
+    # marks a finished worker
+    _END = object()
+
+    # private properties
+    __slots__ = ['__client', '__urls', '__concurrency', '__retries',
+                 '__backoff', '__progress', '__stats', '__results', '__tasks',
+                 '__running', ]
+
+    def __init__(self, client, urls, concurrency, retries, backoff, progress):
+        self.__client = client
+        self.__urls = iter(urls)
+        self.__concurrency = max(1, concurrency)
+        self.__retries = retries
+        self.__backoff = backoff
+        self.__progress = progress
+        self.__stats = None
+        self.__results = None
+        self.__tasks = None
+        self.__running = 0
+        pass  # void return
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.__tasks is None:
+            self.__start()
+        while self.__running:
+            url, result, attempts = await self.__results.get()
+            if url is self._END:
+                self.__running -= 1
+                if result is not None:
+                    await self.aclose()
+                    raise result
+                continue
+            self.__stats._count(result, attempts)
+            if self.__progress is not None:
+                self.__progress(self.__stats)
+            return url, result
+        raise StopAsyncIteration
+
+    async def aclose(self):
+        """
+        Stops the rendering, cancelling the dispatches in flight.
+        """
+        tasks, self.__tasks, self.__running = self.__tasks or [], [], 0
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        pass  # void return
+
+    def __start(self):
+        self.__stats = RenderStats()
+        self.__results = asyncio.Queue(2 * self.__concurrency)
+        self.__tasks = [asyncio.ensure_future(self.__work())
+                        for i in range(self.__concurrency)]
+        self.__running = len(self.__tasks)
+        pass  # void return
+
+    async def __work(self):
+        failure = None
+        try:
+            # ``urls`` is shared by the workers, between their awaits
+            for url in self.__urls:
+                result, attempts = await self.__client._render_retrying(
+                    url, self.__retries, self.__backoff)
+                await self.__results.put((url, result, attempts))
+        except Exception as e:
+            failure = e  # of ``urls`` itself
+        await self.__results.put((self._END, failure, 0))
+        pass  # void return
+
+    pass
+
+
+class AsyncInterceptor(Interceptor):
+    """
+    Coroutine version of ``Interceptor``, associated with an ``AsyncClient``
+    object. The ``before_intercept`` and ``after_intercept`` callbacks may be
+    either plain functions or coroutine functions.
+    """
+
+    # private properties
+    __slots__ = ['__tasks', ]
+
+    def __init__(self, client, detector, before_intercept=None,
+                 after_intercept=None, cache=None):
+        """
+        Takes the same arguments as ``Interceptor``.
+
+        :raises AssertionError: if ``client`` is not an instance of
+            ``AsyncClient``.
+        """
+        assert(isinstance(client, AsyncClient))
+        super(AsyncInterceptor, self).__init__(
+            client, detector, before_intercept, after_intercept, cache)
+        # refreshes in flight (the event loop keeps weak references only)
+        self.__tasks = set()
+        pass  # void return
+
+    async def _lookup(self, url):
+        # as of ``Interceptor._lookup()``, with the storage read in a thread
+        # of the default executor (off the event loop)
+        if self.cache is None:
+            return None, None
+        key = self.cache.make_key(url, self.client.request_parameters)
+        content, stale = await self._run_in_executor(self.cache.lookup, key)
+        if stale:
+            self._revalidate(key, url)
+        return key, content
+
+    async def _store(self, key, response):
+        if key is not None and isinstance(response, dict):
+            await self._run_in_executor(self.cache.set, key, response)
+        pass  # void return
+
+    def _run_in_executor(self, func, *args):
+        return asyncio.get_event_loop().run_in_executor(
+            None, functools.partial(func, *args))
+
+    def _revalidate(self, key, url):
+        # refresh in a task of the running event loop (instead of a thread)
+        if self.cache._begin_refresh(key):
+            task = asyncio.ensure_future(self._refresh(key, url))
+            self.__tasks.add(task)
+            task.add_done_callback(self.__tasks.discard)
+        pass  # void return
+
+    async def _refresh(self, key, url):
+        try:
+            await self._store(key, await self.client(url))
+        except Exception:
+            pass  # keep serving the stale entry
+        finally:
+            self.cache._end_refresh(key)
+        pass  # void return
+
+    async def __call__(self, request):
+        """
+        :param request: incoming HTTP request
+        :type request: ``dict``
+
+        :returns: the response from SnapSearch backend service (as of
+            ``Interceptor.__call__()``).
+        """
+
+        # check for the eligibility of interception
+        raw_current_url = self.detector(request)
+        if not raw_current_url:
+            return None
+
+        return await self._intercept(raw_current_url)
+
+    async def _intercept(self, raw_current_url):
+        # interception of an eligible request, past the ``Detector``
+
+        # invoke pre-interception callback
+        if callable(self.before_intercept):
+            result = self.before_intercept(raw_current_url)
+            if inspect.isawaitable(result):
+                result = await result
+            # allow pre-interception callback to shortcut the interception
+            if isinstance(result, dict):
+                return result
+
+        # dispatch backend service (unless cached)
+        key, response = await self._lookup(raw_current_url)
+        if response is None:
+            response = await self.client(raw_current_url)
+            await self._store(key, response)
+
+        # invoke post-interception callback
+        if callable(self.after_intercept):
+            result = self.after_intercept(raw_current_url, response)
+            if inspect.isawaitable(result):
+                await result
+
+        return response
+
+    pass
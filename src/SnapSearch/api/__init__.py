@@ -24,7 +24,10 @@ __all__ = ['SNAPSEARCH_API_URL',
            'DEFAULT_EXTENSIONS_JSON',
            'DEFAULT_ROBOTS_JSON',
            'dispatch',
+           'Session',
+           'sessions',
            'AnyEnv',
+           'LazyEnv',
            'Response', ]
 
 
@@ -69,8 +72,8 @@ DEFAULT_ROBOTS_JSON = confirm_resource("robots.json")
 
 # snapsearch api objects and methods
 
-from .backend import dispatch, httpinfo as __httpinfo
-from .environ import AnyEnv
+from .backend import dispatch, Session, sessions, httpinfo as __httpinfo
+from .environ import AnyEnv, LazyEnv
 from .response import Response
 
 
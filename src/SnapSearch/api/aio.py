@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.api.aio
+    ~~~~~~~~~~~~~~~~~~
+
+    asyncio-native communication with SnapSearch backend service (requires
+    python 3.5 or later)
+
+    :copyright: 2014 by `SnapSearch <https://snapsearch.io/>`_
+    :license: MIT, see LICENSE for more details.
+
+    :author: `LIU Yu <liuyu@opencps.net>`_
+    :date: 2014/03/08
+"""
+
+__all__ = ['dispatch', 'AsyncSession', ]
+
+
+import asyncio
+import base64
+import collections
+import ssl
+import zlib
+
+import SnapSearch.error as error
+
+from .._compat import url_split
+from .backend import _build_message
+from .response import Response
+from .stream import BodyParser, CHUNK_SIZE
+
+
+# errors of a broken connection to SnapSearch backend
+_CONNECTION_ERRORS = (OSError, EOFError, asyncio.IncompleteReadError,
+                      asyncio.TimeoutError, )
+
+
+def _content_decoder(headers):
+
+    # incremental decoder of the content coding, as a function of chunks
+    encoding = headers.get('content-encoding', "identity").lower()
+    if encoding == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress
+    if encoding == "deflate":
+        decoders = []
+
+        def decode(chunk):
+            if decoders:
+                return decoders[0].decompress(chunk)
+            # zlib-wrapped, or raw (as sent by some servers)
+            decoder = zlib.decompressobj()
+            try:
+                data = decoder.decompress(chunk)
+            except zlib.error:
+                decoder = zlib.decompressobj(-zlib.MAX_WBITS)
+                data = decoder.decompress(chunk)
+            decoders.append(decoder)
+            return data
+
+        return decode
+    return lambda chunk: chunk
+
+
+async def _read_response(reader, line):
+
+    # status line, the first one already read (skipping interim 1xx
+    # responses)
+    while True:
+        if not line:
+            raise EOFError("connection closed by SnapSearch backend")
+        try:
+            version, status = line.split(None, 2)[:2]
+            status_code = int(status)
+        except ValueError:
+            raise error.SnapSearchError(
+                "malformed response from SnapSearch backend")
+
+        # header lines
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.partition(b":")
+            headers[name.strip().lower().decode("iso-8859-1")] = \
+                value.strip().decode("iso-8859-1")
+
+        if status_code >= 200:
+            break
+        line = await reader.readline()
+
+    # response content, decoded and parsed as it arrives
+    will_close = (version == b"HTTP/1.0" or
+                  headers.get('connection', "").lower() == "close")
+    decode = _content_decoder(headers)
+    parser = BodyParser()
+    if headers.get('transfer-encoding', "").lower() == "chunked":
+        while True:
+            line = await reader.readline()
+            try:
+                size = int(line.split(b";")[0], 16)
+            except ValueError:
+                raise error.SnapSearchError(
+                    "malformed response from SnapSearch backend")
+            if size == 0:
+                # trailer lines
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                break
+            while size > 0:
+                chunk = await reader.readexactly(min(size, CHUNK_SIZE))
+                size -= len(chunk)
+                parser.feed(decode(chunk))
+            await reader.readline()
+    elif 'content-length' in headers:
+        size = int(headers['content-length'])
+        while size > 0:
+            chunk = await reader.readexactly(min(size, CHUNK_SIZE))
+            size -= len(chunk)
+            parser.feed(decode(chunk))
+    else:
+        while True:
+            chunk = await reader.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.feed(decode(chunk))
+        will_close = True
+
+    return status_code, headers, parser, will_close
+
+
+class AsyncSession(object):
+    """
+    Long-lived HTTPS session to SnapSearch backend service, built on asyncio
+    streams. At most ``pool_size`` requests are in flight at once, each over
+    its own persistent connection, and each request (including connecting)
+    is bounded by ``timeout`` seconds.
+    """
+
+    __slots__ = ['__idle', '__semaphore', '__contexts', '__pool_size',
+                 '__keep_alive', '__timeout', ]
+
+    def __init__(self, pool_size=10, keep_alive=True, timeout=None):
+        self.__idle = collections.deque()
+        self.__semaphore = None
+        self.__contexts = {}
+        self.__pool_size = pool_size
+        self.__keep_alive = keep_alive
+        self.__timeout = timeout
+        pass  # void return
+
+    def _get_semaphore(self):
+        # created on first use, within the running event loop
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.__pool_size)
+        return self.__semaphore
+
+    def _get_ssl_context(self, ca_path):
+        # loading a CA bundle is expensive, so do it once per bundle
+        context = self.__contexts.get(ca_path)
+        if context is None:
+            context = ssl.create_default_context(cafile=ca_path)
+            self.__contexts[ca_path] = context
+        return context
+
+    def _build_request(self, keep_alive, **kwds):
+
+        # redirects are never followed, regardless of the global setting
+        # ``SNAPSEARCH_API_FOLLOW_REDIRECT`` (which defaults to ``False``)
+        url = url_split(kwds['url'])
+        host, port = url.hostname, url.port or 443
+        headers, payload = _build_message(kwds['payload'])
+
+        credentials = ("%s:%s" % (kwds['email'], kwds['key'])).encode("utf-8")
+        target = (url.path or "/") + ("?" + url.query if url.query else "")
+        lines = ["POST %s HTTP/1.1" % target,
+                 "Host: %s" % (url.netloc.rpartition("@")[2], ),
+                 "Authorization: Basic %s" %
+                 base64.b64encode(credentials).decode("ascii"),
+                 "Connection: %s" % ("keep-alive" if keep_alive else "close")]
+        lines.extend("%s: %s" % item for item in headers.items())
+        message = ("\r\n".join(lines) + "\r\n\r\n").encode("iso-8859-1")
+
+        return (host, port), message + payload
+
+    async def _open(self, address, ca_path):
+        return await asyncio.open_connection(
+            address[0], address[1], ssl=self._get_ssl_context(ca_path),
+            server_hostname=address[0])
+
+    def _close(self, connection):
+        connection[1].close()
+        pass  # void return
+
+    async def _exchange(self, address, request, keep_alive, ca_path):
+
+        # an idle connection to the same address, or a new connection
+        connection = None
+        while self.__idle and connection is None:
+            idle_address, idle_connection = self.__idle.pop()
+            if idle_address != address or idle_connection[0].at_eof():
+                self._close(idle_connection)
+            else:
+                connection = idle_connection
+        reused = connection is not None
+        if not reused:
+            connection = await self._open(address, ca_path)
+
+        reader, writer = connection
+        try:
+            writer.write(request)
+            await writer.drain()
+            line = await reader.readline()
+            if not line:
+                raise EOFError("connection closed by SnapSearch backend")
+        except _CONNECTION_ERRORS:
+            self._close(connection)
+            if not reused:
+                raise
+            # the backend closed the idle connection before responding (not
+            # after a partial response), try once afresh
+            return await self._exchange(address, request, keep_alive, ca_path)
+        except BaseException:
+            self._close(connection)
+            raise
+
+        try:
+            status, headers, parser, will_close = \
+                await _read_response(reader, line)
+        except BaseException:
+            self._close(connection)
+            raise
+
+        if keep_alive and not will_close:
+            self.__idle.append((address, connection))
+        else:
+            self._close(connection)
+
+        return status, headers, parser
+
+    async def dispatch(self, **kwds):
+        """
+        Sends an HTTPS POST request to SnapSearch backend service.
+
+        :returns: a ``Response`` object (as of ``api.dispatch()``).
+
+        :raises error.SnapSearchConnectionError: if the backend service cannot
+            be reached, or does not respond within ``timeout`` seconds.
+        """
+
+        # import locally to allow override
+        from . import SNAPSEARCH_API_TIMEOUT
+
+        keep_alive = kwds.get('keep_alive', self.__keep_alive)
+        timeout = self.__timeout or SNAPSEARCH_API_TIMEOUT
+        address, request = self._build_request(keep_alive, **kwds)
+
+        async with self._get_semaphore():
+            try:
+                status, headers, parser = await asyncio.wait_for(
+                    self._exchange(address, request, keep_alive,
+                                   kwds['ca_path']),
+                    timeout)
+            except _CONNECTION_ERRORS as e:
+                raise error.SnapSearchConnectionError(e)
+
+        return Response(status=status, headers=headers, body=parser.close())
+
+    def close(self):
+        """
+        Closes the idle connections to SnapSearch backend service.
+        """
+        while self.__idle:
+            self._close(self.__idle.pop()[1])
+        pass  # void return
+
+    pass
+
+
+async def dispatch(**kwds):
+    """
+    Coroutine version of ``api.dispatch()``, which sends an HTTPS POST request
+    through ``kwds['session']`` (an ``AsyncSession`` object) if specified, or
+    through a one-shot connection otherwise.
+    """
+    session = kwds.pop('session', None)
+    if session is not None:
+        return await session.dispatch(**kwds)
+    session = AsyncSession(pool_size=1, keep_alive=False)
+    try:
+        return await session.dispatch(**kwds)
+    finally:
+        session.close()
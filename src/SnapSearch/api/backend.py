@@ -12,17 +12,18 @@
     :date: 2014/03/08
 """
 
-__all__ = ['dispatch', ]
+__all__ = ['dispatch', 'Session', 'sessions', ]
 
 
-import json
 import os
 import sys
+import threading
 
 import SnapSearch.error as error
 
 from .._compat import b
 from .response import Response
+from .stream import BodyParser, CHUNK_SIZE
 
 
 def _build_message(content):
@@ -30,7 +31,7 @@ def _build_message(content):
     # import locally to allow override
     from . import SNAPSEARCH_API_ACCEPT_ENCODING, SNAPSEARCH_API_USER_AGENT
 
-    payload = b(content)
+    payload = content if isinstance(content, bytes) else b(content)
     headers = {
         "User-Agent": SNAPSEARCH_API_USER_AGENT,
         "Accept-Encoding": SNAPSEARCH_API_ACCEPT_ENCODING,
@@ -40,17 +41,15 @@ def _build_message(content):
     return headers, payload
 
 
-def _dispatch_via_requests(**kwds):
+def _request_via_requests(s, **kwds):
 
     # import locally to allow override
     from . import SNAPSEARCH_API_FOLLOW_REDIRECT, SNAPSEARCH_API_TIMEOUT
 
-    # HTTPS connection
-    import requests
-    s = requests.Session()
-
     # HTTPS POST request
     headers, payload = _build_message(kwds['payload'])
+    if not kwds.get('keep_alive', True):
+        headers['Connection'] = "close"
 
     try:
         r = s.request(
@@ -61,101 +60,395 @@ def _dispatch_via_requests(**kwds):
             data=payload,
             headers=headers,
             allow_redirects=SNAPSEARCH_API_FOLLOW_REDIRECT,
-            timeout=SNAPSEARCH_API_TIMEOUT)
+            timeout=SNAPSEARCH_API_TIMEOUT,
+            stream=True)
     except Exception as e:
         raise error.SnapSearchConnectionError(e)
-    else:
-        return Response(
-            status=r.status_code, headers=r.headers, body=json.loads(r.text))
+
+    # response content, parsed as it arrives
+    parser = BodyParser()
+    try:
+        for chunk in r.iter_content(CHUNK_SIZE):
+            parser.feed(chunk)
+    except Exception as e:
+        raise error.SnapSearchConnectionError(e)
+    finally:
+        r.close()
+
+    return Response(
+        status=r.status_code, headers=r.headers, body=parser.close())
+
+
+def _dispatch_via_requests(**kwds):
+
+    # HTTPS connection
+    import requests
+    s = requests.Session()
+
+    try:
+        return _request_via_requests(s, **kwds)
     finally:
         s.close()
 
     pass  # void return
 
 
-def _dispatch_via_pycurl(**kwds):
+class _SessionViaRequests(object):
+    """
+    Thread-safe, long-lived HTTPS session to SnapSearch backend service,
+    keeping up to ``pool_size`` persistent connections (``requests``).
+    """
+
+    __slots__ = ['__lock', '__session', '__pool_size', '__keep_alive', ]
+
+    # ``dispatch_many()`` sends one request at a time
+    concurrent = False
+
+    def __init__(self, pool_size=10, keep_alive=True):
+        self.__lock = threading.Lock()
+        self.__session = None
+        self.__pool_size = pool_size
+        self.__keep_alive = keep_alive
+        pass  # void return
+
+    def _get_session(self):
+        # the ``requests.Session`` is created on first use (or after close)
+        with self.__lock:
+            if self.__session is None:
+                import requests
+                s = requests.Session()
+                # threads beyond ``pool_size`` wait for a free connection
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=1, pool_maxsize=self.__pool_size,
+                    pool_block=True)
+                s.mount("https://", adapter)
+                self.__session = s
+            return self.__session
+
+    def dispatch(self, **kwds):
+        kwds.setdefault('keep_alive', self.__keep_alive)
+        return _request_via_requests(self._get_session(), **kwds)
+
+    def dispatch_many(self, batch):
+        """
+        Sends the requests in ``batch`` (a sequence of ``dispatch()`` keyword
+        dicts) one after another over the pooled connections.
+
+        :returns: a ``list`` of ``Response`` objects in the order of
+            ``batch``, with the exception object in place of each request
+            that failed.
+        """
+        results = []
+        for kwds in batch:
+            try:
+                results.append(self.dispatch(**dict(kwds)))
+            except (error.SnapSearchError, ValueError) as e:
+                results.append(e)
+        return results
+
+    def close(self):
+        with self.__lock:
+            s, self.__session = self.__session, None
+        if s is not None:
+            s.close()
+        pass  # void return
 
-    # import locally to allow override
-    from . import (
-        SNAPSEARCH_API_ACCEPT_ENCODING,
-        SNAPSEARCH_API_FOLLOW_REDIRECT,
-        SNAPSEARCH_API_TIMEOUT, )
+    pass
+
+
+def _configure_pycurl(c, **kwds):
 
-    # HTTPS connection
     import pycurl
-    c = pycurl.Curl()
-    c.setopt(pycurl.URL, kwds['url'])
 
     # HTTPS POST request
-    headers_dict, payload = _build_message(kwds['payload'])
-    headers = ["%s: %s" % (key, val) for key, val in headers_dict.items()]
     c.setopt(pycurl.POST, True)
-    c.setopt(pycurl.HTTPHEADER, headers)
-    c.setopt(pycurl.POSTFIELDS, payload)
 
     # authentication
     c.setopt(pycurl.HTTPAUTH, pycurl.HTTPAUTH_BASIC)
-    c.setopt(pycurl.USERPWD, "%s:%s" % (kwds['email'], kwds['key']))
 
     # SSL verfification
-    c.setopt(pycurl.CAINFO, kwds['ca_path'])
     c.setopt(pycurl.SSL_VERIFYPEER, True)
     c.setopt(pycurl.SSL_VERIFYHOST, 2)
 
+    # persistent connection
+    if not kwds.get('keep_alive', True):
+        c.setopt(pycurl.FORBID_REUSE, True)
+
+    return c
+
+
+def _prepare_pycurl(c, **kwds):
+
+    # import locally to allow override
+    from . import (
+        SNAPSEARCH_API_ACCEPT_ENCODING,
+        SNAPSEARCH_API_FOLLOW_REDIRECT,
+        SNAPSEARCH_API_TIMEOUT, )
+
+    import pycurl
+
+    # per-request fields, and those a pooled handle must not keep from its
+    # first request, see ``_configure_pycurl()`` for the rest
+    c.setopt(pycurl.URL, kwds['url'])
+
+    # SSL verfification
+    c.setopt(pycurl.CAINFO, kwds['ca_path'])
+
     # transfer parameters
     CURLOPT_ENCODING = getattr(pycurl, 'ACCEPT_ENCODING', pycurl.ENCODING)
     c.setopt(CURLOPT_ENCODING, SNAPSEARCH_API_ACCEPT_ENCODING)
     c.setopt(pycurl.FOLLOWLOCATION, SNAPSEARCH_API_FOLLOW_REDIRECT)
     c.setopt(pycurl.TIMEOUT, SNAPSEARCH_API_TIMEOUT)
 
-    # buffer for response
-    buffer_ = bytearray()
-    c.setopt(pycurl.HEADER, True)
-    c.setopt(pycurl.WRITEFUNCTION, buffer_.extend)
+    headers_dict, payload = _build_message(kwds['payload'])
+    if not kwds.get('keep_alive', True):
+        headers_dict['Connection'] = "close"
+    headers = ["%s: %s" % (key, val) for key, val in headers_dict.items()]
+    c.setopt(pycurl.HTTPHEADER, headers)
+    c.setopt(pycurl.POSTFIELDS, payload)
 
-    try:
-        c.perform()
+    c.setopt(pycurl.USERPWD, "%s:%s" % (kwds['email'], kwds['key']))
+
+    # response headers, and content parsed as it arrives
+    header_lines = []
+    parser = BodyParser()
+    c.setopt(pycurl.HEADERFUNCTION, header_lines.append)
+    c.setopt(pycurl.WRITEFUNCTION, parser.feed)
+
+    return header_lines, parser
 
-        # markup buffer sections
-        CRLF = b"\r\n"
-        eos = buffer_.find(CRLF)  # end of status line
-        eoh = buffer_.find(CRLF + CRLF)  # end of header lines
+
+def _parse_via_pycurl(sink):
+
+    header_lines, parser = sink
+    try:
+        # the last response, after any interim (e.g. ``100 Continue``) or
+        # redirected responses
+        start = max(i for i, line in enumerate(header_lines)
+                    if line.startswith(b"HTTP/"))
 
         # response status
-        normalize_status = \
-            lambda tup: tup[2].partition(b" ")[::2]
-        status_tuple = tuple(map(
-            lambda b: bytes(b.strip()),
-            normalize_status(buffer_[:eos].partition(b" "))))
-        status_code = int(status_tuple[0] or "0")
+        status_code = int(header_lines[start].split(None, 2)[1])
 
         # response headers
-        normalize_header = \
-            lambda hdr: (bytes(hdr[0].strip().lower()),
-                         bytes(hdr[2].strip()))
-        headers = dict(map(
-            lambda b: normalize_header(b.partition(b":")),
-            buffer_[eos + len(CRLF):eoh].splitlines()))
-
-        # response content
-        text = bytes(buffer_[eoh + 2 * len(CRLF):].strip()).decode()
-    except pycurl.error as e:
-        raise error.SnapSearchConnectionError(e)
+        headers = dict(
+            (name.strip().lower(), value.strip())
+            for name, sep, value in (
+                line.partition(b":") for line in header_lines[start + 1:])
+            if sep)
     except Exception as e:
         raise error.SnapSearchError(
             "malformed response from SnapSearch backend")
     else:
         return Response(
-            status=status_code, headers=headers, body=json.loads(text))
+            status=status_code, headers=headers, body=parser.close())
+
+    pass  # void return
+
+
+def _dispatch_via_pycurl(**kwds):
+
+    # HTTPS connection
+    import pycurl
+    c = _configure_pycurl(pycurl.Curl(), **kwds)
+
+    try:
+        sink = _prepare_pycurl(c, **kwds)
+        try:
+            c.perform()
+        except pycurl.error as e:
+            raise error.SnapSearchConnectionError(e)
+        return _parse_via_pycurl(sink)
     finally:
         c.close()
 
     pass  # void return
 
 
+class _SessionViaPycurl(object):
+    """
+    Thread-safe, long-lived HTTPS session to SnapSearch backend service,
+    keeping up to ``pool_size`` pre-configured ``Curl`` handles (``pycurl``).
+    Each handle retains its own connection cache, and all handles share TLS
+    sessions and DNS lookups.
+    """
+
+    __slots__ = ['__cond', '__idle', '__multis', '__created', '__share',
+                 '__pool_size', '__keep_alive', ]
+
+    # ``dispatch_many()`` sends the requests concurrently
+    concurrent = True
+
+    def __init__(self, pool_size=10, keep_alive=True):
+        self.__cond = threading.Condition(threading.Lock())
+        self.__idle = []
+        self.__multis = []  # idle ``CurlMulti`` of ``dispatch_many()``
+        self.__created = 0
+        self.__share = None
+        self.__pool_size = pool_size
+        self.__keep_alive = keep_alive
+        pass  # void return
+
+    def _acquire(self, kwds, block=True):
+        # an idle handle, a new handle, or (if ``block``) wait for one
+        with self.__cond:
+            while not self.__idle and self.__created >= self.__pool_size:
+                if not block:
+                    return None
+                self.__cond.wait()
+            if self.__idle:
+                return self.__idle.pop()
+            self.__created += 1
+            share = self.__share
+            if share is None:
+                share = self.__share = self._new_share()
+        try:
+            import pycurl
+            c = _configure_pycurl(pycurl.Curl(), **kwds)
+            if share is not None:
+                c.setopt(pycurl.SHARE, share)
+            return c
+        except Exception:
+            self._release(None)
+            raise
+
+    def _release(self, c):
+        with self.__cond:
+            if c is not None:
+                self.__idle.append(c)
+            else:
+                self.__created -= 1
+            self.__cond.notify()
+        pass  # void return
+
+    @staticmethod
+    def _new_share():
+        import pycurl
+        try:
+            share = pycurl.CurlShare()
+            share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_DNS)
+            share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_SSL_SESSION)
+        except (AttributeError, pycurl.error):
+            return None  # not supported by libcurl
+        return share
+
+    def dispatch(self, **kwds):
+        import pycurl
+        kwds.setdefault('keep_alive', self.__keep_alive)
+        c = self._acquire(kwds)
+        try:
+            sink = _prepare_pycurl(c, **kwds)
+            try:
+                c.perform()
+            except pycurl.error as e:
+                raise error.SnapSearchConnectionError(e)
+        finally:
+            self._release(c)
+        return _parse_via_pycurl(sink)
+
+    def dispatch_many(self, batch):
+        """
+        Sends the requests in ``batch`` (a sequence of ``dispatch()`` keyword
+        dicts) concurrently through a ``pycurl.CurlMulti``, using at most
+        ``pool_size`` handles at a time, without spawning threads.
+
+        :returns: a ``list`` of ``Response`` objects in the order of
+            ``batch``, with the exception object in place of each request
+            that failed.
+        """
+        import pycurl
+
+        results = [None] * len(batch)
+        pending = list(enumerate(batch))[::-1]
+        active = {}  # handle -> (index, sink)
+
+        # the connections of transfers driven by a ``CurlMulti`` are cached
+        # in it (rather than in their handles), hence it is kept for reuse
+        with self.__cond:
+            m = self.__multis.pop() if self.__multis else None
+        if m is None:
+            m = pycurl.CurlMulti()
+
+        def finish(c, failure=None):
+            m.remove_handle(c)
+            i, sink = active.pop(c)
+            self._release(c)
+            if failure is None:
+                try:
+                    results[i] = _parse_via_pycurl(sink)
+                except (error.SnapSearchError, ValueError) as e:
+                    results[i] = e
+            else:
+                results[i] = failure
+            pass  # void return
+
+        try:
+            while pending or active:
+                # fill up the pool, waiting only if nothing is in flight
+                while pending:
+                    c = self._acquire(pending[-1][1], block=not active)
+                    if c is None:
+                        break
+                    i, kwds = pending.pop()
+                    kwds = dict(kwds)
+                    kwds.setdefault('keep_alive', self.__keep_alive)
+                    try:
+                        active[c] = (i, _prepare_pycurl(c, **kwds))
+                    except Exception:
+                        self._release(c)
+                        raise
+                    m.add_handle(c)
+
+                # drive all transfers
+                while True:
+                    ret, num_handles = m.perform()
+                    if ret != pycurl.E_CALL_MULTI_PERFORM:
+                        break
+
+                # collect finished transfers
+                while True:
+                    queued, ok_list, err_list = m.info_read()
+                    for c in ok_list:
+                        finish(c)
+                    for c, errno, errmsg in err_list:
+                        finish(c, error.SnapSearchConnectionError(
+                            pycurl.error(errno, errmsg)))
+                    if not queued:
+                        break
+
+                if active:
+                    m.select(1.0)
+        finally:
+            for c in list(active):
+                m.remove_handle(c)
+                self._release(c)
+            with self.__cond:
+                self.__multis.append(m)
+
+        return results
+
+    def close(self):
+        with self.__cond:
+            idle, self.__idle = self.__idle, []
+            multis, self.__multis = self.__multis, []
+            self.__created -= len(idle)
+            self.__cond.notify_all()
+        for c in idle:
+            c.close()
+        for m in multis:
+            m.close()
+        pass  # void return
+
+    pass
+
+
 # unified HTTP library interface
-dispatch = None
 httpinfo = None
+Session = None
+_dispatch_once = None
+
+# ``Session`` classes of the available HTTP libraries, by name
+sessions = {}
 
 # preferred HTTP library
 try:
@@ -163,10 +456,12 @@ try:
 except ImportError:
     pass  # no raise
 else:
-    if not dispatch:
-        dispatch = _dispatch_via_requests
+    sessions["requests"] = _SessionViaRequests
+    if not _dispatch_once:
+        _dispatch_once = _dispatch_via_requests
         httpinfo = ("requests", requests.__version__,
                     ("gzip", "deflate", "identity"))
+        Session = _SessionViaRequests
     pass
 
 # fallback HTTP library
@@ -175,13 +470,32 @@ try:
 except ImportError:
     pass  # no raise
 else:
-    if not dispatch:
-        dispatch = _dispatch_via_pycurl
+    sessions["pycurl"] = _SessionViaPycurl
+    if not _dispatch_once:
+        _dispatch_once = _dispatch_via_pycurl
         httpinfo = ("pycurl", pycurl.version,
                     ("gzip", "deflate", "identity"))
+        Session = _SessionViaPycurl
     pass
 
 # failed all options
-if not dispatch:
+if not _dispatch_once:
     raise error.SnapSearchDependencyError(
         "missing HTTP library, requires ``requests`` or ``pycurl``")
+
+
+def dispatch(**kwds):
+    """
+    Sends an HTTPS POST request to SnapSearch backend service, through the
+    pooled connections of ``kwds['session']`` (a ``Session`` object) if
+    specified, or through a one-shot connection otherwise.
+
+    :returns: a ``Response`` object.
+
+    :raises error.SnapSearchConnectionError: if the backend service cannot
+        be reached.
+    """
+    session = kwds.pop('session', None)
+    if session is not None:
+        return session.dispatch(**kwds)
+    return _dispatch_once(**kwds)
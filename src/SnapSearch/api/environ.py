@@ -12,7 +12,7 @@
     :date: 2014/03/08
 """
 
-__all__ = ['AnyEnv', ]
+__all__ = ['AnyEnv', 'LazyEnv', ]
 
 
 import os
@@ -26,7 +26,93 @@ from .._compat import (
     url_unquote, )
 
 
-class AnyEnv(object):
+class _EnvBase(object):
+    # common methods of CGI-style ``environ`` wrappers, reconstructing the
+    # request URL from ``environ`` variables (see :PEP:`3333`), given that
+    # derived classes define ``environ`` and ``GET``.
+
+    @property
+    def has_escaped_fragment(self):
+        """
+        whether ``_escaped_fragment_`` is among the query parameters.
+        """
+        # parsing the query string is only necessary if the key could be
+        # there, possibly percent-encoded.
+        query_string = self.environ.get('QUERY_STRING', "")
+        if "_escaped_fragment_" in query_string or "%" in query_string:
+            return "_escaped_fragment_" in self.GET
+        return False
+
+    __slots__ = ['__uri', ]
+
+    def __init__(self):
+        self.__uri = None
+        pass  # void return
+
+    def _request_uri(self, include_qs=True):
+        # percent-encoded full request uri.
+        return wsgiref.util.request_uri(self.environ, include_qs)
+
+    def _get_uri_components(self):
+        # the percent-encoded request uri without and with query string, and
+        # the latter split into components. they are built once per request,
+        # and both the encoded url and the decoded path are derived from them.
+        if self.__uri is None:
+            base = self._request_uri(False)
+            # same as ``self._request_uri(True)``
+            query_string = self.environ.get('QUERY_STRING')
+            full = base + "?" + query_string if query_string else base
+            self.__uri = (base, full, url_split(full))
+        return self.__uri
+
+    def _get_encoded_url(self, include_qs=True):
+        # percent-encoded full uri, to be passed to SnapSearch backend.
+        base, full, parts = self._get_uri_components()
+        if not include_qs:
+            return base
+        if self.has_escaped_fragment:
+            return base + "%(qs)s%(hash)s" % \
+                self._get_real_qs_and_hash_fragment(True)
+        return full
+
+    def _get_decoded_path(self, include_qs=True):
+        # un-percent-encoded request uri, relative to site root (/).
+        base, full, parts = self._get_uri_components()
+        if include_qs and self.has_escaped_fragment:
+            return url_unquote(parts.path) + "%(qs)s%(hash)s" % \
+                self._get_real_qs_and_hash_fragment(False)
+        path = "?".join([parts.path, parts.query]) if include_qs else \
+            parts.path
+        return url_unquote(path)
+
+    def _get_real_qs_and_hash_fragment(self, encode):
+        # Gets the real query string and hash fragment by reversing Google's
+        # ``_escaped_fragment_``__ protocol to the hash bang mode.
+        #
+        # .. __: http://developers.google.com/webmasters/ajax-crawling/docs
+        #        /specification
+
+        # build query parameters and hash fragment. note that ``self.GET`` is a
+        # ``MultiDict``, namely, each ``key`` identifies a list of ``val``'s.
+        # keep this in mind when trying to enumerate all ``key``-``val`` pairs.
+        qs = []
+        frag = []
+        for key, val_list in self.GET.items():
+            if key == "_escaped_fragment_":
+                frag.extend(filter(None, val_list))
+                continue
+            qs.extend(["%s=%s" % (key, val) for val in val_list])
+
+        # apply encoding / decoding filter
+        f = url_unquote if encode else url_quote
+
+        return {'qs': f("?{0}".format("&".join(qs)) if qs else ""),
+                'hash': f("#!{0}".format("".join(frag)) if frag else "")}
+
+    pass
+
+
+class AnyEnv(_EnvBase):
     """
     Wraps a CGI-style ``environ`` (builtin Python ``dict``) with WSGI-defined
     variables and properties in SnapSearch-specified format and encoding.
@@ -124,50 +210,112 @@ class AnyEnv(object):
         environ.setdefault('wsgi.run_once', True)
         environ.setdefault('wsgi.url_scheme',
                            wsgiref.util.guess_scheme(environ))
+        super(AnyEnv, self).__init__()
         # parsed query string
         self.__parsed_qs = {}
         # make a local reference to the raw ``environ``
         self.__environ = environ
         pass  # void return
 
-    def _get_encoded_url(self, include_qs=True):
-        # percent-encoded full uri, to be passed to SnapSearch backend.
-        if include_qs and "_escaped_fragment_" in self.GET:
-            return self._get_encoded_url(False) + "%(qs)s%(hash)s" % \
-                self._get_real_qs_and_hash_fragment(True)
-        return wsgiref.util.request_uri(self.environ, include_qs)
+    pass
 
-    def _get_decoded_path(self, include_qs=True):
-        # un-percent-encoded request uri, relative to site root (/).
-        if include_qs and "_escaped_fragment_" in self.GET:
-            return self._get_decoded_path(False) + "%(qs)s%(hash)s" % \
-                self._get_real_qs_and_hash_fragment(False)
-        url = url_split(wsgiref.util.request_uri(self.environ, True))
-        path = "?".join([url.path, url.query]) if include_qs else url.path
-        return url_unquote(path)
 
-    def _get_real_qs_and_hash_fragment(self, encode):
-        # Gets the real query string and hash fragment by reversing Google's
-        # ``_escaped_fragment_``__ protocol to the hash bang mode.
-        #
-        # .. __: http://developers.google.com/webmasters/ajax-crawling/docs
-        #        /specification
+class LazyEnv(_EnvBase):
+    """
+    Read-only view of a CGI-style ``environ`` (builtin Python ``dict``) with
+    the same properties as ``AnyEnv``. Unlike ``AnyEnv``, it never adds or
+    alters any variable of the underlying ``environ``, and each property is
+    computed on first access only.
+    """
 
-        # build query parameters and hash fragment. note that ``self.GET`` is a
-        # ``MultiDict``, namely, each ``key`` identifies a list of ``val``'s.
-        # keep this in mind when trying to enumerate all ``key``-``val`` pairs.
-        qs = []
-        frag = []
-        for key, val_list in self.GET.items():
-            if key == "_escaped_fragment_":
-                frag.extend(filter(None, val_list))
-                continue
-            qs.extend(["%s=%s" % (key, val) for val in val_list])
+    @property
+    def environ(self):
+        """
+        underlying CGI-style ``environ`` (never modified).
+        """
+        return self.__environ
 
-        # apply encoding / decoding filter
-        f = url_unquote if encode else url_quote
+    @property
+    def GET(self):
+        """
+        parsed ``QUERY_STRING`` as a multi-``dict`` (i.e. each ``key``
+        associated with a ``list`` of values).
+        """
+        # :PEP:`3333`: ``QUERY_STRING`` MAY be empty or absent.
+        if self.__parsed_qs is None:
+            self.__parsed_qs = url_parse_qs(
+                self.__environ.get('QUERY_STRING', ""), True)
+        return self.__parsed_qs
 
-        return {'qs': f("?{0}".format("&".join(qs)) if qs else ""),
-                'hash': f("#!{0}".format("".join(frag)) if frag else "")}
+    @property
+    def scheme(self):
+        """
+        ``environ['wsgi.url_scheme']``, or the scheme guessed from
+        ``environ['HTTPS']`` if absent.
+        """
+        if self.__scheme is None:
+            self.__scheme = self.__environ.get('wsgi.url_scheme') or \
+                wsgiref.util.guess_scheme(self.__environ)
+        return self.__scheme
+
+    @property
+    def method(self):
+        """
+        ``environ['REQUEST_METHOD']``, or ``"N/A"`` if absent.
+        """
+        # :PEP:`3333`: ``REQUEST_METHOD`` MUST present and be non-empty.
+        return self.__environ.get('REQUEST_METHOD', "N/A")
+
+    @property
+    def user_agent(self):
+        """
+        ``environ['HTTP_USER_AGENT']``, or ``""`` if absent.
+        """
+        # :PEP:`3333`: ``HTTP_USER_AGENT`` MAY be empty or absent.
+        return self.__environ.get('HTTP_USER_AGENT', "")
+
+    @property
+    def path_qs(self):
+        """
+        same as ``AnyEnv.path_qs``.
+        """
+        if self.__path_qs is None:
+            self.__path_qs = self._get_decoded_path(True)
+        return self.__path_qs
+
+    @property
+    def url(self):
+        """
+        same as ``AnyEnv.url``.
+        """
+        if self.__url is None:
+            self.__url = self._get_encoded_url(True)
+        return self.__url
+
+    # private properties
+    __slots__ = ['__environ', '__parsed_qs', '__scheme', '__path_qs',
+                 '__url', ]
+
+    def __init__(self, environ):
+        """
+        :param environ: CGI-style environment variables
+        :type environ: builtin Python ``dict`` (see :PEP:`3333`)
+        """
+        super(LazyEnv, self).__init__()
+        self.__environ = environ
+        self.__parsed_qs = None
+        self.__scheme = None
+        self.__path_qs = None
+        self.__url = None
+        pass  # void return
+
+    def _request_uri(self, include_qs=True):
+        # ``wsgiref.util.request_uri()`` requires ``wsgi.url_scheme``, which
+        # is supplied to (a shallow copy of) ``environ`` if absent.
+        environ = self.__environ
+        if 'wsgi.url_scheme' not in environ:
+            environ = dict(environ)
+            environ['wsgi.url_scheme'] = self.scheme
+        return wsgiref.util.request_uri(environ, include_qs)
 
     pass
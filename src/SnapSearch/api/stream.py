@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.api.stream
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    incremental parser of response bodies from SnapSearch backend service
+
+    :copyright: 2014 by `SnapSearch <https://snapsearch.io/>`_
+    :license: MIT, see LICENSE for more details.
+
+    :author: `LIU Yu <liuyu@opencps.net>`_
+    :date: 2014/03/08
+"""
+
+__all__ = ['BodyParser', ]
+
+
+import codecs
+import json
+import re
+
+from .._compat import u
+
+
+# size in bytes of the chunks read from SnapSearch backend
+CHUNK_SIZE = 64 * 1024
+
+# lexical elements of JSON (:RFC:`7159`)
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_SCALAR = re.compile(r"[^ \t\n\r,\]}]*")  # number, or literal name
+
+# characters of a string up to its closing quote, as ``(str, end)`` (with
+# the C accelerator of ``json`` if available)
+_scanstring = json.decoder.scanstring
+
+# parser states
+_VALUE, _FIRST_VALUE, _KEY, _FIRST_KEY, _COLON, _NEXT, _STRING, _DONE = \
+    range(8)
+
+
+def _safe_cut(text, start, end):
+
+    # end of the longest prefix of ``text[start:end]`` (the characters of an
+    # unterminated string) that splits neither an escape sequence, nor a
+    # surrogate pair of escape sequences
+
+    def is_escape(i):
+        # preceded by an even number of backslashes
+        j = i
+        while j > start and text[j - 1] == "\\":
+            j -= 1
+        return (i - j) % 2 == 0
+
+    cut = end
+    i = text.rfind("\\u", max(start, end - 12), end)
+    while i >= 0:
+        if is_escape(i):
+            cut = i
+        i = text.rfind("\\u", max(start, end - 12), i)
+
+    # the high surrogate of a pair
+    if cut - 6 >= start and text[cut - 6:cut - 3].lower() == "\\ud" and \
+            text[cut - 3] in "89abAB" and is_escape(cut - 6):
+        cut -= 6
+
+    # a trailing backslash
+    if cut > start and text[cut - 1] == "\\" and is_escape(cut - 1):
+        cut -= 1
+
+    return cut
+
+
+class BodyParser(object):
+    """
+    Incremental JSON parser, fed with the chunks of a response body as they
+    arrive from SnapSearch backend service. The characters of strings, such
+    as the HTML of ``content.html``, are decoded piece by piece as they
+    arrive, so that the raw body is never held as a whole.
+
+    Errors are deferred, i.e. ``feed()`` discards the rest of a malformed
+    body, and ``close()`` raises the error.
+    """
+
+    @property
+    def done(self):
+        """
+        whether the complete JSON value has been parsed.
+        """
+        return self.__state == _DONE
+
+    # private properties
+    __slots__ = ['__decoder', '__text', '__state', '__stack', '__pieces',
+                 '__is_key', '__result', '__error', ]
+
+    def __init__(self):
+        self.__decoder = codecs.getincrementaldecoder("utf-8")()
+        self.__text = u("")  # characters not parsed yet
+        self.__state = _VALUE
+        self.__stack = []  # of [container, key]
+        self.__pieces = None  # of the string being parsed
+        self.__is_key = False
+        self.__result = None
+        self.__error = None
+        pass  # void return
+
+    def feed(self, data):
+        """
+        Parses the next chunk ``data`` (``bytes``) of the response body.
+        """
+        if self.__error is None:
+            self._parse(data, False)
+        pass  # void return
+
+    def close(self):
+        """
+        :returns: the parsed JSON value of the response body.
+
+        :raises ValueError: if the response body is malformed or incomplete.
+        """
+        if self.__error is None:
+            self._parse(b"", True)
+            if self.__error is None and self.__state != _DONE:
+                self.__error = ValueError("incomplete JSON response body")
+        if self.__error is not None:
+            raise self.__error
+        return self.__result
+
+    def _fail(self):
+        self.__error = ValueError("malformed JSON response body")
+        self.__text = self.__pieces = None
+        pass  # void return
+
+    def _emit(self, value):
+        # a complete value in the current container
+        if not self.__stack:
+            self.__result = value
+            self.__state = _DONE
+            return
+        container, key = self.__stack[-1]
+        if isinstance(container, list):
+            container.append(value)
+        else:
+            container[key] = value
+        self.__state = _NEXT
+        pass  # void return
+
+    def _parse(self, data, eof):
+        try:
+            text = self.__text + self.__decoder.decode(data, eof)
+        except ValueError:
+            return self._fail()
+        pos = 0
+        end = len(text)
+        while True:
+            state = self.__state
+
+            if state == _STRING:
+                piece = None
+                if not self.__pieces:
+                    # a string starting in this chunk, likely a short one
+                    try:
+                        piece, pos = _scanstring(text, pos)
+                    except ValueError:
+                        pass  # unterminated in this chunk
+                if piece is None:
+                    # decode the characters within this chunk, closed with a
+                    # quote of its own unless the string ends within them
+                    cut = _safe_cut(text, pos, end)
+                    try:
+                        if cut == pos:
+                            piece, pos = _scanstring(text, pos)
+                        else:
+                            piece, stop = _scanstring(
+                                text[pos:cut] + '"', 0)
+                            if stop > cut - pos:
+                                self.__pieces.append(piece)
+                                pos = cut
+                                break  # continued in the next chunk
+                            pos += stop
+                    except ValueError:
+                        if cut == pos:
+                            break  # continued in the next chunk
+                        return self._fail()
+                self.__pieces.append(piece)
+                value, self.__pieces = u("").join(self.__pieces), None
+                if self.__is_key:
+                    self.__stack[-1][1] = value
+                    self.__state = _COLON
+                else:
+                    self._emit(value)
+                continue
+
+            pos = _WHITESPACE.match(text, pos).end()
+            if pos == end:
+                break
+            char = text[pos]
+
+            if state == _DONE:
+                return self._fail()  # extra data
+
+            if state in (_KEY, _FIRST_KEY):
+                if char == "}" and state == _FIRST_KEY:
+                    pos += 1
+                    self._emit(self.__stack.pop()[0])
+                elif char == '"':
+                    pos += 1
+                    self.__pieces = []
+                    self.__is_key = True
+                    self.__state = _STRING
+                else:
+                    return self._fail()
+
+            elif state == _COLON:
+                if char != ":":
+                    return self._fail()
+                pos += 1
+                self.__state = _VALUE
+
+            elif state == _NEXT:
+                is_list = isinstance(self.__stack[-1][0], list)
+                if char == ("]" if is_list else "}"):
+                    pos += 1
+                    self._emit(self.__stack.pop()[0])
+                elif char == ",":
+                    pos += 1
+                    self.__state = _VALUE if is_list else _KEY
+                else:
+                    return self._fail()
+
+            else:  # _VALUE, _FIRST_VALUE
+                if char == "]" and state == _FIRST_VALUE:
+                    pos += 1
+                    self._emit(self.__stack.pop()[0])
+                elif char == "{":
+                    pos += 1
+                    self.__stack.append([{}, None])
+                    self.__state = _FIRST_KEY
+                elif char == "[":
+                    pos += 1
+                    self.__stack.append([[], None])
+                    self.__state = _FIRST_VALUE
+                elif char == '"':
+                    pos += 1
+                    self.__pieces = []
+                    self.__is_key = False
+                    self.__state = _STRING
+                else:
+                    stop = _SCALAR.match(text, pos).end()
+                    if stop == end and not eof:
+                        break  # may continue in the next chunk
+                    try:
+                        self._emit(json.loads(text[pos:stop]))
+                    except ValueError:
+                        return self._fail()
+                    pos = stop
+
+        # keep the characters not parsed yet
+        self.__text = text[pos:]
+        pass  # void return
+
+    pass
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.asgi
+    ~~~~~~~~~~~~~~~
+
+    ASGI middleware (requires python 3.5 or later)
+
+    :copyright: 2014 by `SnapSearch <https://snapsearch.io/>`_
+    :license: MIT, see LICENSE for more details.
+
+    :author: `LIU Yu <liuyu@opencps.net>`_
+    :date: 2014/03/08
+"""
+
+__all__ = ['InterceptorMiddleware', ]
+
+
+import asyncio
+
+from .aio import AsyncInterceptor
+from .interceptor import Interceptor
+from .wsgi import default_response_callback
+
+
+def _build_environ(scope):
+
+    # CGI-style view of ``scope``, as inspected by ``Detector`` (see
+    # :PEP:`3333` for the encoding of ``PATH_INFO`` and ``QUERY_STRING``)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ""),
+        'PATH_INFO': scope['path'].encode("utf-8").decode("iso-8859-1"),
+        'QUERY_STRING': scope.get('query_string', b"").decode("iso-8859-1"),
+        'SERVER_PROTOCOL': "HTTP/%s" % scope.get('http_version', "1.1"),
+        'wsgi.url_scheme': scope.get('scheme', "http"), }
+
+    server = scope.get('server')
+    if server:
+        environ['SERVER_NAME'] = server[0]
+        environ['SERVER_PORT'] = str(server[1] or "")
+    else:
+        environ['SERVER_NAME'] = "localhost"
+        environ['SERVER_PORT'] = \
+            "443" if environ['wsgi.url_scheme'] == "https" else "80"
+
+    client = scope.get('client')
+    if client:
+        environ['REMOTE_ADDR'] = client[0]
+
+    for name, value in scope.get('headers', ()):
+        name = name.decode("iso-8859-1").upper().replace("-", "_")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = "HTTP_" + name
+        value = value.decode("iso-8859-1")
+        if name in environ:
+            value = environ[name] + "," + value
+        environ[name] = value
+
+    return environ
+
+
+class InterceptorMiddleware(object):
+    """
+    Wraps an ASGI application (HTTP protocol) and intercepts incoming HTTP
+    requests through the associated ``Interceptor`` object. An
+    ``AsyncInterceptor`` is awaited on the event loop. The backend dispatch of
+    a synchronous ``Interceptor`` runs in the default executor, and only for
+    requests that its ``Detector`` deems eligible for interception.
+    """
+
+    @property
+    def application(self):
+        """
+        associated ASGI application.
+        """
+        return self.__application
+
+    @property
+    def interceptor(self):
+        """
+        associated ``Interceptor`` object.
+        """
+        return self.__interceptor
+
+    @property
+    def response_callback(self):
+        """
+        associated callback object.
+        """
+        return self.__response_callback
+
+    # private members
+    __slots__ = ['__application', '__interceptor', '__response_callback', ]
+
+    def __init__(self, application, interceptor, response_callback=None):
+        """
+        :param application: associated (wrapped) ASGI application object
+        :param interceptor: associated ``Interceptor`` (or
+            ``AsyncInterceptor``) object
+
+        Optional argument(s):
+
+        :param response_callback: callback object for handling the response
+            from SnapSearch backend service (as of
+            ``wsgi.InterceptorMiddleware``).
+        :type response_callback: ``callable`` with signature ``"(response)->
+            dict"``
+
+        :raises AssertionError: if ``interceptor`` is not an instance of
+            ``Interceptor``.
+        """
+        assert(isinstance(interceptor, Interceptor))
+        #
+        self.__application = application
+        self.__interceptor = interceptor
+        self.__response_callback = response_callback \
+            if callable(response_callback) else default_response_callback
+        pass
+
+    async def _intercept(self, environ):
+        if isinstance(self.interceptor, AsyncInterceptor):
+            return await self.interceptor(environ)
+        # reject non-eligible requests without leaving the event loop, and
+        # run the rest of the interception (not the ``Detector`` again) in
+        # the executor
+        raw_current_url = self.interceptor.detector(environ)
+        if not raw_current_url:
+            return None
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None, self.interceptor._intercept, raw_current_url)
+
+    async def __call__(self, scope, receive, send):
+        """
+        ASGI application interface (version 3).
+        """
+        if scope['type'] != "http":
+            return await self.application(scope, receive, send)
+
+        # start interception
+        response = None
+        try:
+            response = await self._intercept(_build_environ(scope))
+        except Exception:
+            # silently resume to non-intercepted response
+            pass
+
+        # non-intercepted response
+        if not isinstance(response, dict):
+            return await self.application(scope, receive, send)
+
+        # intercepted response
+        message = self.response_callback(response)
+        headers = list(message['headers'])
+        if not any(name.lower() == b"content-length" for name, _ in headers):
+            headers.append(
+                (b"content-length", str(len(message['html'])).encode()))
+
+        # ship out
+        await send({'type': "http.response.start",
+                    'status': int(message['status'].split(None, 1)[0]),
+                    'headers': headers, })
+        await send({'type': "http.response.body",
+                    'body': message['html'], })
+        pass  # void return
+
+    pass
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.breaker
+    ~~~~~~~~~~~~~~~~~~
+
+    circuit breaker around the dispatches to SnapSearch backend service
+
+    :copyright: 2014 by `SnapSearch <https://snapsearch.io/>`_
+    :license: MIT, see LICENSE for more details.
+
+    :author: `LIU Yu <liuyu@opencps.net>`_
+    :date: 2014/03/08
+"""
+
+__all__ = ['CircuitBreaker', ]
+
+
+import collections
+import threading
+import time
+
+import SnapSearch.error as error
+
+
+class _Guard(object):
+    """
+    Context of one dispatch through a ``CircuitBreaker``, recording its
+    outcome and latency on exit.
+    """
+
+    __slots__ = ['breaker', 'probe', 'start', ]
+
+    def __init__(self, breaker):
+        self.breaker = breaker
+        self.probe = False
+        self.start = None
+        pass  # void return
+
+    def __enter__(self):
+        self.probe = self.breaker._admit()
+        self.start = self.breaker._clock()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None and \
+                not issubclass(exc_type, error.SnapSearchError):
+            # e.g. interrupted, tells nothing about the backend service
+            self.breaker._release(self.probe)
+        else:
+            # answered by the backend service (possibly with an error), or
+            # not reached at all
+            failed = exc_type is not None and \
+                issubclass(exc_type, error.SnapSearchConnectionError)
+            self.breaker._record(
+                self.probe, failed, self.breaker._clock() - self.start)
+        return False
+
+    pass
+
+
+class CircuitBreaker(object):
+    """
+    Thread-safe circuit breaker of the dispatches of a ``Client``, which
+    stops waiting on SnapSearch backend service while it is down or slow.
+
+    The breaker is *closed* at first, i.e. dispatches pass through, and their
+    outcomes are recorded over the last ``window`` dispatches. A dispatch
+    fails if it raises ``SnapSearchConnectionError``, or if it takes longer
+    than ``slow_call_duration`` seconds. Once ``failure_rate`` of the
+    recorded dispatches (at least ``min_calls`` of them) have failed, the
+    breaker *opens*: dispatches are skipped at once, raising
+    ``SnapSearchCircuitOpenError``, for ``reset_timeout`` seconds. The
+    breaker is then *half-open*, letting ``half_open_calls`` probes through
+    (one at a time), and closes if all of them succeed, or opens again on the
+    first failure.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    @property
+    def state(self):
+        """
+        ``CLOSED``, ``OPEN`` or ``HALF_OPEN``.
+        """
+        with self.__lock:
+            if self.__state == self.OPEN and \
+                    self._clock() >= self.__opened + self.__reset_timeout:
+                return self.HALF_OPEN
+            return self.__state
+
+    @property
+    def failure_rate(self):
+        """
+        rate of failed dispatches among the recorded ones.
+        """
+        with self.__lock:
+            if not self.__outcomes:
+                return 0.0
+            return self.__failures / float(len(self.__outcomes))
+
+    @property
+    def trips(self):
+        """
+        number of times the breaker opened.
+        """
+        return self.__trips
+
+    @property
+    def rejections(self):
+        """
+        number of dispatches skipped while the breaker was open.
+        """
+        return self.__rejections
+
+    # private properties
+    __slots__ = ['__lock', '__state', '__outcomes', '__failures',
+                 '__opened', '__probes', '__successes', '__trips',
+                 '__rejections', '__failure_rate', '__slow_call_duration',
+                 '__min_calls', '__reset_timeout', '__half_open_calls', ]
+
+    # monotonic time source, in seconds (overridable for tests)
+    _clock = staticmethod(getattr(time, 'monotonic', time.time))
+
+    def __init__(self, failure_rate=0.5, slow_call_duration=10.0, window=20,
+                 min_calls=5, reset_timeout=30.0, half_open_calls=1):
+        """
+        Optional arguments:
+
+        :param failure_rate: rate of failed dispatches (between ``0`` and
+            ``1``) that opens the breaker.
+        :type failure_rate: ``float``
+        :param slow_call_duration: seconds beyond which a dispatch counts as
+            failed, or ``None`` to count connection errors only.
+        :type slow_call_duration: ``int`` or ``float``
+        :param window: number of the last dispatches recorded.
+        :type window: ``int``
+        :param min_calls: minimum number of recorded dispatches before the
+            breaker may open.
+        :type min_calls: ``int``
+        :param reset_timeout: seconds the breaker stays open before probing
+            SnapSearch backend service again.
+        :type reset_timeout: ``int`` or ``float``
+        :param half_open_calls: number of successful probes that close the
+            breaker.
+        :type half_open_calls: ``int``
+        """
+        self.__lock = threading.Lock()
+        self.__state = self.CLOSED
+        self.__outcomes = collections.deque(maxlen=max(window, 1))
+        self.__failures = 0
+        self.__opened = None
+        self.__probes = 0  # in flight while half-open
+        self.__successes = 0  # of the probes while half-open
+        self.__trips = self.__rejections = 0
+        self.__failure_rate = failure_rate
+        self.__slow_call_duration = slow_call_duration
+        self.__min_calls = max(min_calls, 1)
+        self.__reset_timeout = reset_timeout
+        self.__half_open_calls = max(half_open_calls, 1)
+        pass  # void return
+
+    def guard(self):
+        """
+        :returns: the context manager of one dispatch, which raises
+            ``SnapSearchCircuitOpenError`` on entry if the dispatch is to be
+            skipped, and records the outcome of the dispatch on exit.
+        """
+        return _Guard(self)
+
+    def reset(self):
+        """
+        Closes the breaker, and forgets the recorded dispatches.
+        """
+        with self.__lock:
+            self._close()
+        pass  # void return
+
+    def _close(self):
+        self.__state = self.CLOSED
+        self.__outcomes.clear()
+        self.__failures = 0
+        self.__probes = self.__successes = 0
+        pass  # void return
+
+    def _open(self):
+        self.__state = self.OPEN
+        self.__opened = self._clock()
+        self.__probes = self.__successes = 0
+        self.__trips += 1
+        pass  # void return
+
+    def _admit(self):
+        # let a dispatch through (returning whether it is a probe), or raise
+        with self.__lock:
+            if self.__state == self.OPEN and \
+                    self._clock() >= self.__opened + self.__reset_timeout:
+                self.__state = self.HALF_OPEN
+            if self.__state == self.CLOSED:
+                return False
+            if self.__state == self.HALF_OPEN and not self.__probes:
+                self.__probes += 1
+                return True
+            self.__rejections += 1
+        raise error.SnapSearchCircuitOpenError(
+            "circuit breaker of SnapSearch backend service open")
+
+    def _release(self, probe):
+        # a dispatch let through ended without an outcome
+        with self.__lock:
+            if probe and self.__state == self.HALF_OPEN:
+                self.__probes -= 1
+        pass  # void return
+
+    def _record(self, probe, failed, duration):
+        # the outcome of a dispatch let through
+        if self.__slow_call_duration is not None and \
+                duration > self.__slow_call_duration:
+            failed = True
+        with self.__lock:
+            if probe:
+                if self.__state != self.HALF_OPEN:
+                    return  # reset meanwhile
+                self.__probes -= 1
+                if failed:
+                    self._open()
+                else:
+                    self.__successes += 1
+                    if self.__successes >= self.__half_open_calls:
+                        self._close()
+                return
+            if self.__state != self.CLOSED:
+                return  # opened meanwhile by other dispatches
+            if len(self.__outcomes) == self.__outcomes.maxlen:
+                self.__failures -= self.__outcomes[0]
+            self.__outcomes.append(failed)
+            self.__failures += failed
+            if self.__failures and \
+                    len(self.__outcomes) >= self.__min_calls and \
+                    self.__failures >= \
+                    self.__failure_rate * len(self.__outcomes):
+                self._open()
+        pass  # void return
+
+    pass
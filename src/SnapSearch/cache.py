@@ -0,0 +1,510 @@
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.cache
+    ~~~~~~~~~~~~~~~~
+
+    local cache of rendered snapshots from SnapSearch backend service
+
+    :copyright: 2014 by `SnapSearch <https://snapsearch.io/>`_
+    :license: MIT, see LICENSE for more details.
+
+    :author: `LIU Yu <liuyu@opencps.net>`_
+    :date: 2014/03/08
+"""
+
+__all__ = ['DiskStorage', 'MemoryStorage', 'SnapshotCache', ]
+
+
+import codecs
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+
+import SnapSearch.error as error
+
+from ._compat import OrderedDict
+
+
+class MemoryStorage(object):
+    """
+    Stores the serialized snapshots in a ``dict`` of this process.
+    """
+
+    # private properties
+    __slots__ = ['__data', ]
+
+    # not visible to other processes
+    shared = False
+
+    def __init__(self):
+        self.__data = {}
+        pass  # void return
+
+    def get(self, key):
+        """
+        :returns: the stored ``bytes`` of ``key``, or ``None`` if absent.
+        """
+        return self.__data.get(key)
+
+    def set(self, key, blob):
+        self.__data[key] = blob
+        pass  # void return
+
+    def delete(self, key):
+        self.__data.pop(key, None)
+        pass  # void return
+
+    def keys(self):
+        return list(self.__data.keys())
+
+    def size(self, key):
+        """
+        :returns: the size in bytes of the stored ``key``.
+        """
+        return len(self.__data[key])
+
+    pass
+
+
+class DiskStorage(object):
+    """
+    Stores the serialized snapshots as one file per key in a directory, which
+    outlives this process and is shared by all processes using it (e.g. the
+    workers of a pre-fork server). Files are replaced atomically, and read
+    through memory maps of the page cache shared by these processes.
+    """
+
+    @property
+    def directory(self):
+        """
+        directory of the snapshot files.
+        """
+        return self.__directory
+
+    @property
+    def mode(self):
+        """
+        permission bits of the snapshot files.
+        """
+        return self.__mode
+
+    # private properties
+    __slots__ = ['__directory', '__mode', ]
+
+    # file name suffix of snapshots
+    SUFFIX = ".snapshot"
+
+    # visible to other processes
+    shared = True
+
+    def __init__(self, directory, mode=0o644):
+        """
+        :param directory: directory of the snapshot files, created if absent.
+        :param mode: permission bits of the snapshot files, e.g. ``0o640``
+            for workers of another user in the same group.
+        :type mode: ``int``
+
+        :raises error.SnapSearchError: if ``directory`` is not accessible.
+        """
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+        except OSError as e:
+            raise error.SnapSearchError(
+                "``directory`` invalid or inaccessible", message=str(e))
+        self.__directory = directory
+        self.__mode = mode
+        pass  # void return
+
+    def _path(self, key):
+        return os.path.join(self.__directory, key + self.SUFFIX)
+
+    def get(self, key):
+        """
+        :returns: a read-only ``mmap`` of the stored bytes of ``key`` (to be
+            closed by the caller), or ``None`` if absent.
+        """
+        # a map stays valid even if the file is replaced or removed meanwhile
+        try:
+            with open(self._path(key), "rb") as f:
+                if not os.fstat(f.fileno()).st_size:
+                    return b""
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def set(self, key, blob):
+        # write aside, then rename over the old file (atomic on POSIX)
+        fd, tmp = tempfile.mkstemp(dir=self.__directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            # readable by other users, unlike the ``0o600`` of ``mkstemp()``
+            os.chmod(tmp, self.__mode)
+            getattr(os, 'replace', os.rename)(tmp, self._path(key))
+        except Exception:
+            os.remove(tmp)
+            raise
+        pass  # void return
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass  # already gone
+        pass  # void return
+
+    def keys(self):
+        return [name[:-len(self.SUFFIX)]
+                for name in os.listdir(self.__directory)
+                if name.endswith(self.SUFFIX)]
+
+    def size(self, key):
+        """
+        :returns: the size in bytes of the stored ``key``.
+        """
+        return os.path.getsize(self._path(key))
+
+    pass
+
+
+class SnapshotCache(object):
+    """
+    Thread-safe cache of the responses from SnapSearch backend service, with
+    a time-to-live for its entries and least-recently-used eviction to keep
+    the serialized entries within ``max_bytes``.
+
+    With a ``hard_ttl`` beyond ``ttl``, an entry older than ``ttl`` becomes
+    stale instead of expired: ``lookup()`` still returns it (to be served
+    while it is revalidated in the background) until ``hard_ttl``.
+    """
+
+    @property
+    def storage(self):
+        """
+        associated storage object.
+        """
+        return self.__storage
+
+    @property
+    def hits(self):
+        """
+        number of lookups that found a live entry.
+        """
+        return self.__hits
+
+    @property
+    def stale_hits(self):
+        """
+        number of lookups that found a stale entry.
+        """
+        return self.__stale_hits
+
+    @property
+    def refreshes(self):
+        """
+        number of background refreshes started.
+        """
+        return self.__refreshes
+
+    @property
+    def misses(self):
+        """
+        number of lookups that found no entry, or an expired entry.
+        """
+        return self.__misses
+
+    @property
+    def evictions(self):
+        """
+        number of entries discarded to keep the cache within ``max_bytes``.
+        """
+        return self.__evictions
+
+    @property
+    def size(self):
+        """
+        total size in bytes of the cached entries.
+        """
+        return self.__size
+
+    # private properties
+    __slots__ = ['__storage', '__index', '__lock', '__ttl', '__hard_ttl',
+                 '__max_bytes', '__max_refreshes', '__refreshing', '__size',
+                 '__hits', '__stale_hits', '__misses', '__evictions',
+                 '__refreshes', '__scanned', ]
+
+    # wall clock, as entries may outlive this process
+    _clock = staticmethod(time.time)
+
+    # seconds between scans of a storage shared with other processes
+    SCAN_INTERVAL = 5.0
+
+    def __init__(self, storage=None, ttl=3600, max_bytes=64 * 1024 * 1024,
+                 hard_ttl=None, max_refreshes=2):
+        """
+        Optional arguments:
+
+        :param storage: storage object of serialized entries (defaults to a
+            new ``MemoryStorage``), whose ``get()`` returns a bytes-like
+            object (closed after use if it has a ``close()`` method). Entries
+            found in ``storage`` are adopted, and for a ``shared`` storage,
+            entries added by other processes are adopted every
+            ``SCAN_INTERVAL`` seconds.
+        :param ttl: seconds an entry stays fresh, or ``None`` for no expiry.
+        :type ttl: ``int`` or ``float``
+        :param max_bytes: maximum total size in bytes of the serialized
+            entries.
+        :type max_bytes: ``int``
+        :param hard_ttl: seconds an entry may be served stale, i.e. beyond
+            ``ttl`` while being revalidated, or ``None`` to expire entries at
+            ``ttl``.
+        :type hard_ttl: ``int`` or ``float``
+        :param max_refreshes: maximum number of concurrent background
+            refreshes of stale entries.
+        :type max_refreshes: ``int``
+        """
+        self.__storage = storage if storage is not None else MemoryStorage()
+        self.__index = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__ttl = ttl
+        self.__hard_ttl = hard_ttl if ttl is not None else None
+        self.__max_bytes = max(max_bytes or 0, 0)
+        self.__max_refreshes = max(max_refreshes or 0, 0)
+        self.__refreshing = set()
+        self.__size = 0
+        self.__hits = self.__stale_hits = self.__misses = 0
+        self.__evictions = self.__refreshes = 0
+        self.__scanned = None
+
+        self._scan()
+        with self.__lock:
+            victims = self._evict()
+        self._delete(victims)
+
+        pass  # void return
+
+    def __len__(self):
+        return len(self.__index)
+
+    @staticmethod
+    def make_key(url, request_parameters=None):
+        """
+        :returns: the key of the snapshot of ``url`` rendered with
+            ``request_parameters`` (the ``url`` field excluded).
+        """
+        params = dict((key, val) for key, val in
+                      (request_parameters or {}).items() if key != 'url')
+        digest = hashlib.sha1(
+            url if isinstance(url, bytes) else url.encode("utf-8"))
+        digest.update(b"\0" + json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _scan(self):
+        # synchronize the index with the storage, where entries unknown to
+        # this process count as the least recently used ones; the storage is
+        # read outside the lock, and entries indexed meanwhile are kept
+        with self.__lock:
+            self.__scanned = self._clock()
+            known = set(self.__index)
+        keys = set(self.__storage.keys())
+        sizes = []
+        for key in keys.difference(known):
+            try:
+                sizes.append((key, self.__storage.size(key)))
+            except (IOError, OSError):
+                continue  # removed meanwhile
+        with self.__lock:
+            index = OrderedDict()
+            for key, size in sizes:
+                if key not in self.__index:
+                    index[key] = size
+            for key, size in self.__index.items():
+                if key in keys or key not in known:
+                    index[key] = size
+            self.__index = index
+            self.__size = sum(index.values())
+        pass  # void return
+
+    def _scan_due(self):
+        # claim the periodic scan of a shared storage (under the lock)
+        if not getattr(self.__storage, 'shared', False) or \
+                self._clock() - self.__scanned < self.SCAN_INTERVAL:
+            return False
+        self.__scanned = self._clock()
+        return True
+
+    def _evict(self):
+        # drop least recently used entries from the index until within
+        # ``max_bytes`` (under the lock), and return their keys to be deleted
+        # from the storage (outside the lock)
+        victims = []
+        while self.__index and self.__size > self.__max_bytes:
+            key, size = self.__index.popitem(last=False)
+            self.__size -= size
+            victims.append(key)
+            self.__evictions += 1
+        return victims
+
+    def _discard(self, key):
+        # drop ``key`` from the index (under the lock), to be deleted from
+        # the storage (outside the lock)
+        self.__size -= self.__index.pop(key, 0)
+        return [key]
+
+    def _delete(self, keys):
+        for key in keys:
+            self.__storage.delete(key)
+        pass  # void return
+
+    def _age(self, entry):
+        # 0 for a fresh entry, 1 for a stale entry, 2 for an expired entry
+        if self.__ttl is None:
+            return 0
+        age = self._clock() - entry['stored']
+        if age < self.__ttl:
+            return 0
+        if self.__hard_ttl is not None and age < self.__hard_ttl:
+            return 1
+        return 2
+
+    def lookup(self, key):
+        """
+        :returns: a 2-``tuple`` of the cached response of ``key`` (or
+            ``None`` if absent or expired) and whether that response is
+            stale.
+        """
+        blob = self.__storage.get(key)
+        if blob is not None:
+            size = len(blob)
+            try:
+                # decode in place, e.g. from a memory map
+                entry = json.loads(codecs.utf_8_decode(blob)[0])
+                age = self._age(entry)
+            except (ValueError, KeyError, TypeError):
+                age = 2  # corrupted
+            finally:
+                if hasattr(blob, 'close'):
+                    blob.close()
+
+        if blob is not None and age == 2:
+            with self.__lock:
+                victims = self._discard(key)
+                self.__misses += 1
+            self._delete(victims)
+            return None, False
+
+        with self.__lock:
+            if blob is None:
+                self.__size -= self.__index.pop(key, 0)
+                self.__misses += 1
+                return None, False
+            # (re-)insert as the most recently used entry
+            self.__size += size - self.__index.pop(key, 0)
+            self.__index[key] = size
+            if age:
+                self.__stale_hits += 1
+            else:
+                self.__hits += 1
+            return entry['content'], bool(age)
+
+    def get(self, key, default=None):
+        """
+        :returns: the cached response of ``key``, or ``default`` if absent,
+            stale or expired.
+        """
+        content, stale = self.lookup(key)
+        if content is None or stale:
+            return default
+        return content
+
+    def set(self, key, content):
+        """
+        Caches the response ``content`` for ``key``, evicting the least
+        recently used entries if the cache is full. Responses larger than
+        ``max_bytes`` are not cached.
+        """
+        blob = json.dumps(
+            {'stored': self._clock(), 'content': content}).encode("utf-8")
+        if len(blob) > self.__max_bytes:
+            return
+        # write outside the lock, which only guards the index
+        self.__storage.set(key, blob)
+        with self.__lock:
+            scan = self._scan_due()
+        if scan:
+            self._scan()
+        with self.__lock:
+            self.__size += len(blob) - self.__index.pop(key, 0)
+            self.__index[key] = len(blob)
+            victims = self._evict()
+        self._delete(victims)
+        pass  # void return
+
+    def _begin_refresh(self, key):
+        # claim the refresh of ``key``, unless in progress or at capacity
+        with self.__lock:
+            if key in self.__refreshing or \
+                    len(self.__refreshing) >= self.__max_refreshes:
+                return False
+            self.__refreshing.add(key)
+            self.__refreshes += 1
+            return True
+
+    def _end_refresh(self, key):
+        with self.__lock:
+            self.__refreshing.discard(key)
+        pass  # void return
+
+    def revalidate(self, key, render):
+        """
+        Refreshes the entry of ``key`` with ``render()`` in a background
+        thread, unless a refresh of ``key`` is in progress or
+        ``max_refreshes`` refreshes are. A failed refresh keeps the stale
+        entry.
+
+        :returns: ``True`` if a refresh was started.
+        """
+        if not self._begin_refresh(key):
+            return False
+
+        def refresh():
+            try:
+                content = render()
+                if isinstance(content, dict):
+                    self.set(key, content)
+            except Exception:
+                pass  # keep serving the stale entry
+            finally:
+                self._end_refresh(key)
+
+        thread = threading.Thread(target=refresh)
+        thread.daemon = True
+        thread.start()
+        return True
+
+    def delete(self, key):
+        """
+        Discards the entry of ``key``, if any.
+        """
+        with self.__lock:
+            victims = self._discard(key)
+        self._delete(victims)
+        pass  # void return
+
+    def clear(self):
+        """
+        Discards all entries (counters are kept).
+        """
+        with self.__lock:
+            victims = list(self.__index)
+            for key in victims:
+                self._discard(key)
+        self._delete(victims)
+        pass  # void return
+
+    pass
@@ -124,19 +124,28 @@ class InterceptorController(object):
 
         # intercepted response
         message = self.response_callback(response)
-        self.__real_stdout.write(b"Status: ")
-        self.__real_stdout.write(message['status'])
-        self.__real_stdout.write(b"\r\n")
+        header = [b"Status: ", message['status'], b"\r\n"]
         for key, val in message['headers']:
-            self.__real_stdout.write(key)
-            self.__real_stdout.write(b": ")
-            self.__real_stdout.write(val)
-            self.__real_stdout.write(b"\r\n")
-        self.__real_stdout.write(b"\r\n")
-        self.__real_stdout.write(message['html'])
+            header.extend((key, b": ", val, b"\r\n"))
+        header.append(b"\r\n")
+
+        # ship out to the underlying binary stream (not the text stream of
+        # python 3.x)
+        stdout = self._binary_stdout()
+        stdout.write(b"".join(header))
+        stdout.write(message['html'])
+        stdout.flush()
 
         return True
 
+    def _binary_stdout(self):
+        # binary stream underlying the real standard output (python 3.x)
+        stdout = self.__real_stdout
+        if hasattr(stdout, 'buffer'):
+            stdout.flush()
+            stdout = stdout.buffer
+        return stdout
+
     def stop(self, release=False):
         """
         Optional argument(s):
@@ -144,9 +153,17 @@ class InterceptorController(object):
         :param release: release bufferred data to standard output stream.
         :type release: ``bool``
         """
-        # relase buffered data to real stdout
+        # relase buffered data to real stdout (through a view of the buffer
+        # where available, instead of a copy)
         if release:
-            self.__real_stdout.write(self.__stdout_buffer.getvalue())
+            stdout = self._binary_stdout()
+            if hasattr(self.__stdout_buffer, 'getbuffer'):
+                view = self.__stdout_buffer.getbuffer()
+                stdout.write(view)
+                view.release()
+            else:
+                stdout.write(self.__stdout_buffer.getvalue())
+            stdout.flush()
             self.__stdout_buffer.close()
         # resume standard output stream
         sys.stdout, self.__real_stdout = self.__real_stdout, None
@@ -10,29 +10,263 @@
     :date: 2014/03/08
 """
 
-__all__ = ['Client', ]
+__all__ = ['Client',
+           'RenderStats', ]
 
 
+import copy
 import json
 import os
 import sys
+import threading
+import time
+import uuid
 
 import SnapSearch.api as api
 import SnapSearch.error as error
 
+from ._compat import b, queue
+
+
+class _Flight(object):
+    """
+    Dispatch in flight to SnapSearch backend service, whose outcome is shared
+    by all callers asking for the same URL meanwhile, each with its own copy
+    of the response.
+    """
+
+    __slots__ = ['done', 'result', 'error', ]
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        # unless completed by the leading caller
+        self.error = error.SnapSearchError(
+            "in-flight request to SnapSearch backend aborted")
+        pass  # void return
+
+    def wait(self, timeout=None):
+        self.done.wait(timeout)
+        if not self.done.is_set():
+            raise error.SnapSearchConnectionError(
+                "timed out waiting for the in-flight request of the same URL")
+        if self.error is not None:
+            raise self.error
+        return copy.deepcopy(self.result)
+
+    pass
+
+
+class _NoGuard(object):
+    """
+    Context of a dispatch without circuit breaker.
+    """
+
+    __slots__ = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    pass
+
+
+_NO_GUARD = _NoGuard()
+
+
+class _Parameters(dict):
+    """
+    Request parameters, with a ``version`` counting the modifications of its
+    items (i.e. of the top-level fields only).
+    """
+
+    __slots__ = ['version', ]
+
+    def __init__(self, *args, **kwds):
+        super(_Parameters, self).__init__(*args, **kwds)
+        self.version = 0
+        pass  # void return
+
+    def __setitem__(self, key, value):
+        super(_Parameters, self).__setitem__(key, value)
+        self.version += 1
+        pass  # void return
+
+    def __delitem__(self, key):
+        super(_Parameters, self).__delitem__(key)
+        self.version += 1
+        pass  # void return
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        super(_Parameters, self).clear()
+        self.version += 1
+        pass  # void return
+
+    def pop(self, *args):
+        self.version += 1
+        return super(_Parameters, self).pop(*args)
+
+    def popitem(self):
+        self.version += 1
+        return super(_Parameters, self).popitem()
+
+    def setdefault(self, *args):
+        self.version += 1
+        return super(_Parameters, self).setdefault(*args)
+
+    def update(self, *args, **kwds):
+        super(_Parameters, self).update(*args, **kwds)
+        self.version += 1
+        pass  # void return
+
+    pass
+
+
+def _build_template(request_parameters):
+
+    # serialize the parameters once, around a placeholder for the ``url``
+    # (which keeps the position of an existing ``url`` field), so that
+    # ``head + json.dumps(url) + tail`` is exactly ``json.dumps()`` of the
+    # parameters with that ``url``
+    placeholder = json.dumps(uuid.uuid4().hex)
+    params = dict(request_parameters)
+    params['url'] = json.loads(placeholder)
+    text = json.dumps(params)
+    if text.count(placeholder) != 1:
+        return None
+    head, tail = text.split(placeholder)
+    return b(head), b(tail)
+
+
+class RenderStats(object):
+    """
+    Progress of ``Client.render_many()``, i.e. the URLs completed so far and
+    the throughput.
+    """
+
+    @property
+    def rendered(self):
+        """
+        number of URLs rendered by SnapSearch backend service.
+        """
+        return self.__rendered
+
+    @property
+    def failed(self):
+        """
+        number of URLs failed (after their retries).
+        """
+        return self.__failed
+
+    @property
+    def retries(self):
+        """
+        number of retried dispatches.
+        """
+        return self.__retries
+
+    @property
+    def elapsed(self):
+        """
+        seconds since the start of ``Client.render_many()``.
+        """
+        return self._clock() - self.__start
+
+    @property
+    def throughput(self):
+        """
+        completed URLs per second.
+        """
+        elapsed = self.elapsed
+        if elapsed <= 0:
+            return 0.0
+        return (self.__rendered + self.__failed) / elapsed
+
+    # time source, in seconds (overridable for tests)
+    _clock = staticmethod(time.time)
+
+    # private properties
+    __slots__ = ['__rendered', '__failed', '__retries', '__start', ]
+
+    def __init__(self):
+        self.__rendered = 0
+        self.__failed = 0
+        self.__retries = 0
+        self.__start = self._clock()
+        pass  # void return
+
+    def __str__(self):
+        return "%d rendered, %d failed, %d retries in %.1f s (%.1f URLs/s)" % (
+            self.__rendered, self.__failed, self.__retries, self.elapsed,
+            self.throughput)
+
+    def _count(self, result, attempts):
+        # a completed URL, with its outcome after ``attempts`` dispatches
+        if isinstance(result, Exception):
+            self.__failed += 1
+        else:
+            self.__rendered += 1
+        self.__retries += attempts - 1
+        pass  # void return
+
+    pass
+
 
 class Client(object):
     """
     Dispatches a URL to SnapSearch backend service, and receives a response
     containing search engine optimized representation of the URL's target.
+
+    A ``Client`` owns a pool of persistent HTTPS connections to the backend
+    service, which is shared by all threads calling it. Call ``close()`` (or
+    use the ``Client`` as a context manager) to release the connections.
+
+    A ``Client`` is safe for concurrent use by multiple threads, as the
+    payload of each request is built for that request only. The parameters
+    other than ``url`` are serialized once into a payload template, and
+    again only after ``request_parameters`` is modified.
     """
 
+    @property
+    def request_parameters(self):
+        """
+        parameters sent to SnapSearch backend service (``dict``), along with
+        the ``url`` of each request. Nested values must be replaced (e.g.
+        ``client.request_parameters['cookies'] = [...]``) rather than modified
+        in place, or else the modification is not sent.
+        """
+        return self.__request_parameters
+
+    @property
+    def breaker(self):
+        """
+        associated ``CircuitBreaker`` (or ``None``).
+        """
+        return self.__breaker
+
+    @request_parameters.setter
+    def request_parameters(self, value):
+        # a deep copy, so that nested values of the caller changed in place
+        # later on cannot leave a stale payload template
+        self.__request_parameters = _Parameters(copy.deepcopy(value or {}))
+        pass  # void return
+
     # private properties
     __slots__ = ['__api_email', '__api_key', '__request_parameters',
-                 '__api_url', '__ca_path', ]
+                 '__template', '__api_url', '__ca_path', '__session',
+                 '__flights', '__flights_lock', '__coalesce_timeout',
+                 '__breaker', '__http_library', ]
 
     def __init__(self, api_email, api_key, request_parameters={},
-                 api_url=None, ca_path=None):
+                 api_url=None, ca_path=None, pool_size=10, keep_alive=True,
+                 coalesce=True, coalesce_timeout=None, breaker=None,
+                 http_library=None):
         """
         :param api_email: registered email as username for authentication
             against the SnapSearch backend service.
@@ -42,19 +276,43 @@ class Client(object):
         Optional arguments:
 
         :param request_parameters: ``dict`` of parameters to be json-serialized
-            and sent to SnapSearch backend service.
+            and sent to SnapSearch backend service (deep-copied, i.e. neither
+            modified by the ``Client``, nor affected by later modifications
+            of the caller).
         :param api_url: URL to SnapSearch backend service.
         :param ca_path: absolute path to an external CA bundle file.
+        :param pool_size: maximum number of persistent connections kept to
+            SnapSearch backend service.
+        :type pool_size: ``int``
+        :param keep_alive: to keep connections open between requests,
+            otherwise each request uses a new connection.
+        :type keep_alive: ``bool``
+        :param coalesce: to share one in-flight dispatch among concurrent
+            callers asking for the same URL, otherwise each caller dispatches
+            its own request.
+        :type coalesce: ``bool``
+        :param coalesce_timeout: seconds a caller waits for the in-flight
+            dispatch of the same URL, or ``None`` to wait until it completes.
+        :type coalesce_timeout: ``int`` or ``float``
+        :param breaker: circuit breaker of the dispatches, which skips them
+            while SnapSearch backend service is down or slow.
+        :type breaker: ``CircuitBreaker``
+        :param http_library: HTTP library of the connections, ``"requests"``
+            or ``"pycurl"`` (defaults to
+            ``api.SNAPSEARCH_API_HTTP_LIBRARY``).
 
         :raises error.SnapSearchError: if ``api_url`` uses a non-https scheme
             (i.e. not starting with ``"https://"``).
         :raises error.SnapSearchError: if ``ca_path`` is either invalid or
             inaccessible.
+        :raises error.SnapSearchDependencyError: if ``http_library`` is not
+            installed.
         """
 
         self.__api_email = api_email
         self.__api_key = api_key
-        self.__request_parameters = request_parameters or {}
+        self.request_parameters = request_parameters
+        self.__template = (None, None, None)  # (parameters, version, parts)
 
         self.__api_url = api_url or api.SNAPSEARCH_API_URL
         if not self.__api_url.startswith("https://"):
@@ -64,6 +322,27 @@ class Client(object):
         if not os.access(self.__ca_path, os.F_OK | os.R_OK):
             raise error.SnapSearchError("``ca_path`` invalid or inaccessable")
 
+        self.__http_library = http_library or api.SNAPSEARCH_API_HTTP_LIBRARY
+        if self.__http_library not in api.sessions:
+            raise error.SnapSearchDependencyError(
+                "``http_library`` not installed", message=http_library)
+
+        self.__session = self._new_session(pool_size, keep_alive)
+
+        # dispatches in flight by URL (if coalescing)
+        self.__flights = {} if coalesce else None
+        self.__flights_lock = threading.Lock()
+        self.__coalesce_timeout = coalesce_timeout
+
+        self.__breaker = breaker
+
+        pass  # void return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
         pass  # void return
 
     def __call__(self, current_url):
@@ -81,17 +360,247 @@ class Client(object):
             (i.e. not containing fields ``"code"`` and ``"content"``).
         :raises error.SnapSearchError: if the ``code`` field of the response
             ``body`` equals ``"validation_error"``.
+        :raises error.SnapSearchConnectionError: if ``coalesce_timeout``
+            elapsed before the in-flight dispatch of the same URL completed.
+        :raises error.SnapSearchCircuitOpenError: if the dispatch is skipped
+            by the ``breaker``.
+        """
+        if self.__flights is None:
+            return self._dispatch(current_url)
+
+        # join the dispatch in flight for the same URL, if any
+        with self.__flights_lock:
+            flight = self.__flights.get(current_url)
+            leading = flight is None
+            if leading:
+                flight = self.__flights[current_url] = _Flight()
+        if not leading:
+            return flight.wait(self.__coalesce_timeout)
+
+        # lead the dispatch, and share its outcome with the other callers,
+        # as a copy untouched by the leading caller
+        try:
+            result = self._dispatch(current_url)
+            flight.result = copy.deepcopy(result)
+            flight.error = None
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.__flights_lock:
+                del self.__flights[current_url]
+            flight.done.set()
+        return result
+
+    def render_many(self, urls, concurrency=10, retries=3, backoff=0.5,
+                    progress=None):
+        """
+        Renders many URLs (e.g. to warm up a cache of snapshots) through the
+        pooled connections, with ``concurrency`` threads calling the
+        ``Client``. With the ``"pycurl"`` HTTP library (and no ``breaker``),
+        the URLs are instead sent in batches of ``concurrency`` concurrent
+        requests from a single thread, through ``Session.dispatch_many()``.
+
+        ``urls`` is consumed lazily, so it can be a generator over a large
+        sitemap. A dispatch failing with ``SnapSearchConnectionError`` is
+        retried up to ``retries`` times, after ``backoff`` seconds doubled on
+        each retry. Other errors are not retried.
+
+        :param urls: iterable of URLs to render.
+        :param concurrency: number of URLs rendered at a time, best no more
+            than the ``pool_size`` of the ``Client``.
+        :type concurrency: ``int``
+        :param retries: maximum number of retries of each URL.
+        :type retries: ``int``
+        :param backoff: seconds to wait before the first retry of a URL.
+        :type backoff: ``int`` or ``float``
+        :param progress: callback ``progress(stats)`` with a ``RenderStats``
+            object, called after each completed URL.
+
+        :returns: a generator of ``(url, result)`` in the order of
+            completion, ``result`` being what the ``Client`` returns for the
+            ``url``, or the exception object if it failed. Closing the
+            generator early stops the rendering (after the dispatches in
+            flight).
         """
-        self.__request_parameters['url'] = current_url
-        payload = json.dumps(self.__request_parameters)
+        if self.__breaker is None and \
+                getattr(self.__session, 'concurrent', False):
+            return self._render_batches(urls, concurrency, retries, backoff,
+                                        progress)
+        return self._render_threads(urls, concurrency, retries, backoff,
+                                    progress)
+
+    def _render_threads(self, urls, concurrency, retries, backoff, progress):
+        # ``render_many()`` by threads calling the ``Client``
+        stats = RenderStats()
+        urls = iter(urls)
+        urls_lock = threading.Lock()
+        results = queue.Queue(2 * concurrency)
+        stopped = threading.Event()
+        end = object()  # marks a finished thread
 
+        def put(item):
+            # unless the consumer has gone away meanwhile
+            while not stopped.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            pass  # void return
+
+        def work():
+            failure = None
+            try:
+                while not stopped.is_set():
+                    with urls_lock:
+                        url = next(urls, end)
+                    if url is end:
+                        break
+                    result, attempts = self._render_retrying(
+                        url, retries, backoff, stopped)
+                    put((url, result, attempts))
+            except Exception as e:
+                failure = e  # of ``urls`` itself
+            put((end, failure, 0))
+            pass  # void return
+
+        threads = [threading.Thread(target=work)
+                   for i in range(max(1, concurrency))]
+        for t in threads:
+            t.daemon = True
+            t.start()
+
+        running = len(threads)
+        try:
+            while running:
+                url, result, attempts = results.get()
+                if url is end:
+                    running -= 1
+                    if result is not None:
+                        raise result
+                    continue
+                stats._count(result, attempts)
+                if progress is not None:
+                    progress(stats)
+                yield url, result
+        finally:
+            stopped.set()
+            for t in threads:
+                t.join()
+        pass  # void return
+
+    def _render_batches(self, urls, concurrency, retries, backoff, progress):
+        # ``render_many()`` by ``dispatch_many()`` of the session, bypassing
+        # the coalescing of ``__call__()``
+        stats = RenderStats()
+        urls = iter(urls)
+        concurrency = max(1, concurrency)
+        retrying = []  # ``(due time, url, attempts)`` of URLs to retry
+        end = object()  # marks the end of ``urls``
+        while True:
+            batch = []
+            retrying.sort()
+            while retrying and len(batch) < concurrency and \
+                    retrying[0][0] <= time.time():
+                due, url, attempts = retrying.pop(0)
+                batch.append((url, attempts))
+            while urls is not None and len(batch) < concurrency:
+                url = next(urls, end)
+                if url is end:
+                    urls = None
+                else:
+                    batch.append((url, 0))
+            if not batch:
+                if not retrying:
+                    break
+                time.sleep(max(0, retrying[0][0] - time.time()))
+                continue
+
+            results = self.__session.dispatch_many(
+                [self._prepare_batched(url) for url, attempts in batch])
+            for (url, attempts), result in zip(batch, results):
+                attempts += 1
+                if not isinstance(result, Exception):
+                    try:
+                        result = self._parse_response(result)
+                    except error.SnapSearchError as e:
+                        result = e
+                if isinstance(result, error.SnapSearchConnectionError) and \
+                        attempts <= retries:
+                    retrying.append((time.time() + backoff * 2 ** (
+                        attempts - 1), url, attempts))
+                    continue
+                stats._count(result, attempts)
+                if progress is not None:
+                    progress(stats)
+                yield url, result
+        pass  # void return
+
+    def _prepare_batched(self, current_url):
+        # keyword arguments of ``Session.dispatch_many()`` for ``current_url``
+        kwds = self._prepare_dispatch(current_url)
+        del kwds['session']
+        return kwds
+
+    def _render_retrying(self, current_url, retries, backoff, stopped):
+        # ``(result, attempts)`` of ``current_url``, retrying on connection
+        # errors with exponential backoff
+        attempt = 0
+        while True:
+            try:
+                return self(current_url), attempt + 1
+            except error.SnapSearchConnectionError as e:
+                if attempt >= retries or \
+                        stopped.wait(backoff * 2 ** attempt) or \
+                        stopped.is_set():
+                    return e, attempt + 1
+            except error.SnapSearchError as e:
+                return e, attempt + 1
+            attempt += 1
+
+    def _dispatch(self, current_url):
         # dispatch the request to SnapSearch backend
-        r = api.dispatch(email=self.__api_email,
-                         key=self.__api_key,
-                         payload=payload,
-                         url=self.__api_url,
-                         ca_path=self.__ca_path)
+        with self._guard():
+            r = api.dispatch(**self._prepare_dispatch(current_url))
+            return self._parse_response(r)
+
+    def _guard(self):
+        # context of a dispatch through the circuit breaker (if any)
+        if self.__breaker is None:
+            return _NO_GUARD
+        return self.__breaker.guard()
 
+    def _new_session(self, pool_size, keep_alive):
+        # pooled connections to SnapSearch backend (opened on demand)
+        return api.sessions[self.__http_library](pool_size=pool_size,
+                                                 keep_alive=keep_alive)
+
+    def _prepare_dispatch(self, current_url):
+        # keyword arguments of ``api.dispatch()`` for ``current_url``, with a
+        # payload of its own (concurrent calls share no mutable state)
+        return dict(email=self.__api_email,
+                    key=self.__api_key,
+                    payload=self._build_payload(current_url),
+                    url=self.__api_url,
+                    ca_path=self.__ca_path,
+                    session=self.__session)
+
+    def _build_payload(self, current_url):
+        # serialized parameters with ``current_url``, spliced into a template
+        # of the other parameters (rebuilt whenever those are modified)
+        params = self.__request_parameters
+        version = params.version
+        template = self.__template
+        if template[0] is not params or template[1] != version:
+            template = (params, version, _build_template(params))
+            self.__template = template
+        parts = template[2]
+        if parts is None:
+            return b(json.dumps(dict(params, url=current_url)))
+        return b"".join((parts[0], b(json.dumps(current_url)), parts[1]))
+
+    def _parse_response(self, r):
         # parse response body as json data
         try:
             # HTTP status code and headers should exist
@@ -116,4 +625,12 @@ class Client(object):
         # nothing we can do
         return None
 
+    def close(self):
+        """
+        Closes the pooled connections to SnapSearch backend service. The
+        ``Client`` remains usable, and reconnects on demand.
+        """
+        self.__session.close()
+        pass  # void return
+
     pass
@@ -14,18 +14,445 @@
 # future import should come first
 from __future__ import with_statement
 
-__all__ = ['Detector', ]
+__all__ = ['AhoCorasickMatcher',
+           'Detector',
+           'LRUCache',
+           'RegexMatcher',
+           'RouteMatcher', ]
 
 
+import collections
 import json
 import os
 import re
 import sys
+import threading
+import time
 
 import SnapSearch.api as api
 import SnapSearch.error as error
 
-from ._compat import u
+from ._compat import u, OrderedDict
+
+
+class _TrackedList(list):
+    """
+    ``list`` that bumps the revision of its owning ``_TrackedDict`` whenever
+    it is mutated in place.
+    """
+
+    __slots__ = ['owner', ]
+
+    def __init__(self, iterable=(), owner=None):
+        super(_TrackedList, self).__init__(iterable)
+        self.owner = owner
+        pass  # void return
+
+    pass
+
+
+class _TrackedDict(dict):
+    """
+    ``dict`` of ``list``'s with a ``revision`` counter that increases whenever
+    the ``dict`` itself, or any of its ``list`` values, is mutated in place.
+    """
+
+    __slots__ = ['revision', ]
+
+    def __init__(self, *args, **kwds):
+        super(_TrackedDict, self).__init__()
+        self.revision = 0
+        self.update(*args, **kwds)
+        pass  # void return
+
+    def touch(self):
+        self.revision += 1
+        pass  # void return
+
+    def __setitem__(self, key, val):
+        if isinstance(val, list) and not isinstance(val, _TrackedList):
+            val = _TrackedList(val, self)
+        super(_TrackedDict, self).__setitem__(key, val)
+        self.touch()
+        pass  # void return
+
+    def setdefault(self, key, val=None):
+        if key not in self:
+            self[key] = val
+        return self[key]
+
+    def update(self, *args, **kwds):
+        for key, val in dict(*args, **kwds).items():
+            self[key] = val
+        pass  # void return
+
+    pass
+
+
+def _tracked(cls, name):
+    # wraps the in-place mutator ``name`` of ``cls`` (base class of a tracked
+    # container) so that the owning ``_TrackedDict`` is touched afterwards.
+    method = getattr(cls, name)
+
+    if cls is list:
+        def wrapper(self, *args, **kwds):
+            result = method(self, *args, **kwds)
+            if self.owner is not None:
+                self.owner.touch()
+            return result
+    else:
+        def wrapper(self, *args, **kwds):
+            result = method(self, *args, **kwds)
+            self.touch()
+            return result
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for name in ('__delitem__', '__delslice__', '__iadd__', '__imul__',
+             '__setitem__', '__setslice__', 'append', 'clear', 'extend',
+             'insert', 'pop', 'remove', 'reverse', 'sort', ):
+    if hasattr(list, name):
+        setattr(_TrackedList, name, _tracked(list, name))
+
+for name in ('__delitem__', 'clear', 'pop', 'popitem', ):
+    setattr(_TrackedDict, name, _tracked(dict, name))
+
+del name
+
+
+# "/{file}.{ext}" path segment, capturing its (last) extension
+_file_segment = re.compile(u(r"/[^/?#]+\.([^/?#]+)"), re.U)
+
+
+def _file_extension(path):
+    # file extension of the path. it looks for "/{file}.{ext}" in an URL that
+    # is not preceded by '?' (query parameters) or '#' (hash fragment). it will
+    # acquire the last extension that is present in the URL so with
+    # "/{file1}.{ext1}/{file2}.{ext2}" the ext2 will be the matched extension.
+    # furthermore if a file has multiple extensions "/{file}.{ext1}.{ext2}",
+    # it will only match extension2 because unix systems don't consider
+    # extensions to be metadata, and windows only considers the last
+    # extension to be valid metadata. Basically the {file}.{ext1} could
+    # actually just be the filename.
+    #
+    # this is a linear-time scan returning exactly what the former regular
+    # expression (applied with ``re.match(..., re.U | re.X)``) returned,
+    #
+    #     ^(?:(?![?#].*/[^/?#]+\.[^/?#]+).)*/[^/?#]+\.([^/?#]+)
+    #
+    # whose negative lookahead inside the repetition is quadratic on long
+    # paths. note that its wildcards do not match newlines.
+    end = path.find("\n")
+    if end < 0:
+        end = len(path)
+
+    # every "/{file}.{ext}" starting before the first newline, where {file}
+    # and {ext} are non-empty and do not contain '/', '?' or '#'. each path
+    # segment is scanned (and backtracked) at most once.
+    found = []
+    for matches in _file_segment.finditer(path):
+        if matches.start() >= end:
+            break
+        found.append((matches.start(), matches.group(1)))
+    if not found:
+        return None
+
+    # a '?' or '#' followed by any "/{file}.{ext}" on the same line marks the
+    # start of query parameters or hash fragment.
+    last = found[-1][0]
+    for ch in "?#":
+        pos = path.find(ch, 0, last)
+        if pos >= 0:
+            end = min(end, pos)
+
+    # the last "/{file}.{ext}" before that
+    for slash, extension in reversed(found):
+        if slash < end:
+            return extension
+    return None
+
+
+class RegexMatcher(object):
+    """
+    Matches a user agent string against a ``list`` of case-insensitive literal
+    tokens, using a single pre-compiled regular expression alternation.
+    """
+
+    # private properties
+    __slots__ = ['__regex', ]
+
+    def __init__(self, tokens):
+        """
+        :param tokens: literal user agent tokens.
+        :type tokens: ``list`` or ``tuple``
+        """
+        # an empty alternation matches any string, as ``re.search("")`` did.
+        self.__regex = re.compile(
+            u("|").join([re.escape(tok) for tok in tokens]), re.I | re.U)
+        pass  # void return
+
+    def __call__(self, user_agent):
+        """
+        :returns: ``True`` if any of the tokens occurs in ``user_agent``.
+        """
+        return self.__regex.search(user_agent) is not None
+
+    pass
+
+
+class AhoCorasickMatcher(object):
+    """
+    Matches a user agent string against a ``list`` of case-insensitive literal
+    tokens, using an Aho-Corasick automaton over the lower-cased tokens. The
+    cost of matching grows with the length of the user agent string, but not
+    with the number of tokens.
+
+    Lower-casing agrees with the case-insensitive matching of ``re`` on ASCII
+    only (e.g. ``re`` matches "s" to the long s, and "i" to the dotted capital
+    I). Non-ASCII tokens, and any token against a non-ASCII user agent string,
+    are matched by a ``RegexMatcher`` instead.
+    """
+
+    # any character beyond ASCII
+    _non_ascii = re.compile(u(r"[^\x00-\x7f]"), re.U)
+
+    # private properties
+    __slots__ = ['__goto', '__fail', '__output', '__regex', '__fallback', ]
+
+    def __init__(self, tokens):
+        """
+        :param tokens: literal user agent tokens.
+        :type tokens: ``list`` or ``tuple``
+        """
+        # state transitions, failure links, and whether any token ends at
+        # (or is a suffix of) each state. state ``0`` is the root.
+        goto, fail, output = [{}], [0], [False]
+
+        # an empty token list matches any string, as ``RegexMatcher`` does.
+        if not tokens:
+            output[0] = True
+
+        # build the trie of lower-cased ASCII tokens
+        non_ascii = []
+        for tok in tokens:
+            if self._non_ascii.search(tok) is not None:
+                non_ascii.append(tok)
+                continue
+            state = 0
+            for ch in tok.lower():
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    fail.append(0)
+                    output.append(False)
+                state = nxt
+            output[state] = True
+
+        # compute failure links in breadth-first order
+        queue = collections.deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                link = fail[state]
+                while link and ch not in goto[link]:
+                    link = fail[link]
+                if state:
+                    fail[nxt] = goto[link].get(ch, 0)
+                output[nxt] = output[nxt] or output[fail[nxt]]
+
+        self.__goto = goto
+        self.__fail = fail
+        self.__output = output
+        self.__regex = RegexMatcher(tokens)
+        self.__fallback = RegexMatcher(non_ascii) if non_ascii else None
+        pass  # void return
+
+    def __call__(self, user_agent):
+        """
+        :returns: ``True`` if any of the tokens occurs in ``user_agent``.
+        """
+        goto, fail, output = self.__goto, self.__fail, self.__output
+        if output[0]:
+            return True
+        if self._non_ascii.search(user_agent) is not None:
+            return self.__regex(user_agent)
+        if self.__fallback is not None and self.__fallback(user_agent):
+            return True
+        state = 0
+        for ch in user_agent.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                return True
+        return False
+
+    pass
+
+
+class RouteMatcher(object):
+    """
+    Matches a request path against a ``list`` of route regular expressions,
+    using a single pre-compiled alternation of all routes.
+    """
+
+    # routes referring to their own groups by number, or by condition, would
+    # break once their groups are renumbered inside the alternation.
+    _group_reference = re.compile(r"\\[1-9]|\(\?\(")
+
+    # private properties
+    __slots__ = ['__routes', '__regex', '__regexes', ]
+
+    def __init__(self, routes):
+        """
+        :param routes: route regular expressions.
+        :type routes: ``list``, ``tuple`` or ``set``
+        """
+        self.__routes = tuple(routes)
+        self.__regex = None
+        self.__regexes = [re.compile(u(route), re.I | re.U)
+                          for route in self.__routes]
+
+        # combine all routes into one alternation, unless any of them would
+        # not survive the combination (in which case they are tried in turn).
+        # note that the branches are deliberately left as non-capturing groups,
+        # which allows ``re`` to optimize the alternation as a whole.
+        if not any(regex.groups and self._group_reference.search(route)
+                   for route, regex in zip(self.__routes, self.__regexes)):
+            try:
+                self.__regex = re.compile(u("|").join(
+                    [u("(?:%s)") % u(route) for route in self.__routes]),
+                    re.I | re.U)
+            except re.error:
+                pass  # no raise
+        pass  # void return
+
+    def __len__(self):
+        return len(self.__routes)
+
+    def __call__(self, path):
+        """
+        :returns: ``True`` if any of the routes matches ``path``.
+        """
+        if self.__regex is not None:
+            return self.__regex.search(path) is not None
+        return self.match(path) is not None
+
+    def match(self, path):
+        """
+        :returns: the first route that matches ``path``, or ``None``.
+        """
+        if self.__regex is not None and not self.__regex.search(path):
+            return None
+        for route, regex in zip(self.__routes, self.__regexes):
+            if regex.search(path):
+                return route
+        return None
+
+    pass
+
+
+class LRUCache(object):
+    """
+    Thread-safe, size-bounded, least-recently-used cache with an optional
+    time-to-live for its entries.
+    """
+
+    @property
+    def hits(self):
+        """
+        number of lookups that found a live entry.
+        """
+        return self.__hits
+
+    @property
+    def misses(self):
+        """
+        number of lookups that found no entry, or an expired entry.
+        """
+        return self.__misses
+
+    @property
+    def evictions(self):
+        """
+        number of entries discarded to keep the cache within ``maxsize``.
+        """
+        return self.__evictions
+
+    # private properties
+    __slots__ = ['__data', '__lock', '__maxsize', '__ttl', '__hits',
+                 '__misses', '__evictions', ]
+
+    # monotonic clock (if available)
+    _clock = staticmethod(getattr(time, 'monotonic', time.time))
+
+    def __init__(self, maxsize=512, ttl=None):
+        """
+        Optional arguments:
+
+        :param maxsize: maximum number of entries, ``0`` disables the cache.
+        :type maxsize: ``int``
+        :param ttl: seconds an entry stays valid, or ``None`` for no expiry.
+        :type ttl: ``int`` or ``float``
+        """
+        self.__data = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__maxsize = max(maxsize or 0, 0)
+        self.__ttl = ttl
+        self.__hits = self.__misses = self.__evictions = 0
+        pass  # void return
+
+    def __len__(self):
+        return len(self.__data)
+
+    def get(self, key, default=None):
+        """
+        :returns: the cached value of ``key``, or ``default`` if absent.
+        """
+        with self.__lock:
+            try:
+                val, expires = self.__data.pop(key)
+            except KeyError:
+                self.__misses += 1
+                return default
+            if expires is not None and expires <= self._clock():
+                self.__misses += 1
+                return default
+            # re-insert as the most recently used entry
+            self.__data[key] = (val, expires)
+            self.__hits += 1
+            return val
+
+    def set(self, key, val):
+        """
+        Caches ``val`` for ``key``, evicting the least recently used entries
+        if the cache is full.
+        """
+        if not self.__maxsize:
+            return
+        expires = None if self.__ttl is None else self._clock() + self.__ttl
+        with self.__lock:
+            self.__data.pop(key, None)
+            self.__data[key] = (val, expires)
+            while len(self.__data) > self.__maxsize:
+                self.__data.popitem(last=False)
+                self.__evictions += 1
+        pass  # void return
+
+    def clear(self):
+        """
+        Discards all entries (counters are kept).
+        """
+        with self.__lock:
+            self.__data.clear()
+        pass  # void return
+
+    pass
 
 
 class Detector(object):
@@ -80,23 +507,44 @@ class Detector(object):
                 ],
                 "python": [
                     # valid python extensions
-                ]
+                ],
+                ...
             }
 
-        Can be changed to customize valid file extensions.
+        Can be changed to customize valid file extensions. Only the groups
+        named in ``extension_groups`` (by default ``generic`` and ``python``)
+        are considered valid.
         """
         return self.__extensions
 
+    @property
+    def verdict_cache(self):
+        """
+        ``LRUCache`` of user agent verdicts against ``robots``, exposing the
+        ``hits``, ``misses`` and ``evictions`` counters. It is invalidated
+        whenever ``robots`` is altered.
+        """
+        return self.__verdict_cache
+
     # private properties
     __slots__ = ['__check_file_extensions', '__extensions', '__ignored_routes',
-                 '__matched_routes', '__robots', ]
+                 '__matched_routes', '__matcher', '__robots',
+                 '__robots_matchers', '__robots_revision',
+                 '__verdict_cache', '__extension_groups',
+                 '__valid_extensions', '__extensions_revision',
+                 '__fast_path', ]
 
     def __init__(self,
                  ignored_routes=[],
                  matched_routes=[],
                  check_file_extensions=False,
                  robots_json=None,
-                 extensions_json=None):
+                 extensions_json=None,
+                 matcher=None,
+                 verdict_cache_size=512,
+                 verdict_cache_ttl=None,
+                 extension_groups=("generic", "python", ),
+                 fast_path=True):
         """
         Optional arguments:
 
@@ -110,13 +558,35 @@ class Detector(object):
         :param robots_json: absolute path to an external ``robots.json`` file.
         :param extensions_json: absolute path to an external
             ``extensions.json`` file.
+        :param matcher: engine for matching user agents against ``robots``,
+            defaults to ``AhoCorasickMatcher``. ``RegexMatcher`` is the
+            regular expression based fallback.
+        :type matcher: ``callable`` with signature ``"(tokens) -> callable"``,
+            where the returned ``callable`` has signature
+            ``"(user_agent) -> bool"``
+        :param verdict_cache_size: number of distinct user agents whose
+            verdicts are memoized, ``0`` disables the cache.
+        :type verdict_cache_size: ``int``
+        :param verdict_cache_ttl: seconds a memoized verdict stays valid, or
+            ``None`` for no expiry.
+        :type verdict_cache_ttl: ``int`` or ``float``
+        :param extension_groups: groups of ``extensions`` that are valid file
+            extensions, e.g. add ``"php"``, ``"asp"``, ``"java"`` and
+            ``"perl"`` for sites served by these languages.
+        :type extension_groups: ``list`` or ``tuple``
+        :param fast_path: to reject requests from user agents that match no
+            robots (and that have no ``_escaped_fragment_``) before decoding
+            the request path. The verdicts are the same either way, except
+            that a malformed ``environ`` of such a request is not inspected.
+        :type fast_path: ``bool``
 
         :raises AssertionError: if ``extensions.json`` is specified, yet
             ``check_file_extensions`` is ``False``.
         """
 
-        self.__ignored_routes = set(ignored_routes)
-        self.__matched_routes = set(matched_routes)
+        # route regular expressions are compiled once and for all
+        self.__ignored_routes = RouteMatcher(set(ignored_routes))
+        self.__matched_routes = RouteMatcher(set(matched_routes))
 
         # ``extensions.json`` is specified, yet do not require checking file
         # extensions. this probably means a mistake.
@@ -125,16 +595,36 @@ class Detector(object):
             "yet ``check_file_extensions`` is false"
         self.__check_file_extensions = check_file_extensions
 
+        # early rejection of requests from non-robots
+        self.__fast_path = fast_path
+
+        # user agent matching engine
+        self.__matcher = matcher or AhoCorasickMatcher
+
+        # memoized user agent verdicts
+        self.__verdict_cache = LRUCache(verdict_cache_size, verdict_cache_ttl)
+
         # json.load() may raise IOError, TypeError, or ValueError
         with open(robots_json or api.DEFAULT_ROBOTS_JSON) as f:
-            self.__robots = json.load(f)
+            self.__robots = _TrackedDict(json.load(f))
             f.close()
 
+        # compiled ``(ignore, match)`` matchers, and the revision of
+        # ``robots`` that they were compiled from.
+        self.__robots_matchers = None
+        self.__robots_revision = None
+
         # same as above
         with open(extensions_json or api.DEFAULT_EXTENSIONS_JSON) as f:
-            self.__extensions = json.load(f)
+            self.__extensions = _TrackedDict(json.load(f))
             f.close()
 
+        # valid file extensions, and the revision of ``extensions`` that they
+        # were collected from.
+        self.__extension_groups = tuple(extension_groups)
+        self.__valid_extensions = None
+        self.__extensions_revision = None
+
         pass  # void return
 
     def __call__(self, request):
@@ -149,8 +639,9 @@ class Detector(object):
             ``robots.json`` or ``extensions.json`` is invalid.
         """
 
-        # wrap the incoming HTTP request (CGI-style environ)
-        environ = api.AnyEnv(request)
+        # wrap the incoming HTTP request (CGI-style environ) in a read-only
+        # view, which only computes what is actually inspected below.
+        environ = api.LazyEnv(request)
 
         # do not intercept protocols other than HTTP and HTTPS
         if environ.scheme not in ("http", "https", ):
@@ -164,110 +655,92 @@ class Detector(object):
         user_agent = environ.user_agent
 
         # request uri with query string
-        real_path = environ.path_qs
+        if not self.__fast_path:
+            real_path = environ.path_qs
 
-        # validate ``robots`` since it can be altered from outside
-        if not self._validate_robots():
-            raise error.SnapSearchError(
-                "structure of ``robots`` is invalid")
+        # verdicts of the user agent against ``robots``
+        ignored, matched = self._get_robots_verdict(user_agent)
 
         # do not intercept requests from ignored robots
-        ignore_regex = u("|").join(
-            [re.escape(tok) for tok in self.robots.get('ignore', [])])
-        if re.search(ignore_regex, user_agent, re.I | re.U):
+        if ignored:
             return None
 
+        # do not intercept requests from non-robots without escaped fragment,
+        # which is the vast majority of requests. it is decided here, without
+        # decoding the request uri, since none of the route and file extension
+        # checks below could make such a request eligible for interception.
+        if self.__fast_path:
+            if not matched and not environ.has_escaped_fragment:
+                # same as below: invalid ``extensions`` raises an error
+                if self.__check_file_extensions:
+                    self._get_valid_extensions()
+                return None
+            real_path = environ.path_qs
+
         # do not intercept if there exist whitelisted route(s) (matched_routes)
         # and that the requested route **does not** match any one of them.
-        if self.__matched_routes:
-            found = False
-            for route in self.__matched_routes:
-                route_regex = u(route)
-                if re.search(route_regex, real_path, re.I | re.U):
-                    found = True
-                    break
-            if not found:
-                return None
+        if self.__matched_routes and not self.__matched_routes(real_path):
+            return None
 
         # do not intercept if there exist blacklisted route(s) (ignored_routes)
         # and that the requested route **does** matches one of them.
-        if self.__ignored_routes:
-            for route in self.__ignored_routes:
-                route_regex = u(route)
-                if re.search(route_regex, real_path, re.I | re.U):
-                    return None
+        if self.__ignored_routes and self.__ignored_routes(real_path):
+            return None
 
         # detect extensions in order to prevent direct requests to static files
         if self.__check_file_extensions:
 
-            # validate ``extensions`` since it can be altered from outside
-            if not self._validate_extensions():
-                raise error.SnapSearchError(
-                    "structure of ``extensions`` is invalid")
+            # file extensions common for HTML resources
+            valid_extensions = self._get_valid_extensions()
 
-            # create a set of file extensions common for HTML resources
-            valid_extensions = set(
-                [s.lower() for s in self.extensions.get('generic', [])])
-            valid_extensions.update(
-                [s.lower() for s in self.extensions.get('python', [])])
-
-            # file extension regex. it looks for "/{file}.{ext}" in an URL that
-            # is not preceded by '?' (query parameters) or '#' (hash fragment).
-            # it will acquire the last extension that is present in the URL so
-            # with "/{file1}.{ext1}/{file2}.{ext2}" the ext2 will be the
-            # matched extension. furthermore if a file has multiple extensions
-            # "/{file}.{ext1}.{ext2}", it will only match extension2 because
-            # unix systems don't consider extensions to be metadata, and
-            # windows only considers the last extension to be valid metadata.
-            # Basically the {file}.{ext1} could actually just be the filename.
-            extension_regex = u(r"""
-                ^              # start of the string
-                (?:            # begin non-capturing group
-                    (?!        # begin negative lookahead
-                       [?#]    # question mark '?' or hash '#'
-                       .*      # zero or more wildcard characters
-                       /       # literal slash '/'
-                       [^/?#]+ # {file} - has one or more of any character
-                               #     except '/', '?' or '#'
-                       \.      # literal dot '.'
-                       [^/?#]+ # {extension} - has one or more of any character
-                               #     except '/', '?' or '#'
-                    )          # end negative lookahead (prevents any '?' or
-                               #     '#' that precedes {file}.{extension} by
-                               #     any characters)
-                    .          # one wildcard character
-                )*             # end non-capturing group (captures any number
-                               #     of wildcard characters that passes the
-                               #     negative lookahead)
-                /              # literal slash '/'
-                [^/?#]+        # {file} - has one or more of any character
-                               # except forward slash, question mark or hash
-                \.             # literal dot '.'
-                ([^/?#]+)      # {extension} - subgroup has one or more of any
-                               #     character except '/', '?' or '#'
-            """)
-
-            # match extension regex against decoded path
-            matches = re.match(extension_regex, real_path, re.U | re.X)
-            if matches:
-                url_extension = matches.group(1).lower()
-                if url_extension not in valid_extensions:
+            # extension of the last "/{file}.{ext}" in the decoded path
+            url_extension = _file_extension(real_path)
+            if url_extension is not None:
+                if url_extension.lower() not in valid_extensions:
                     return None
 
         # detect escaped fragment (since the ignored user agents has already
         # been detected, SnapSearch won't continue the interception loop)
-        if "_escaped_fragment_" in environ.GET:
+        if environ.has_escaped_fragment:
             return environ.url
 
         # intercept requests from matched robots
-        matched_regex = u("|").join(
-            [re.escape(tok) for tok in self.robots.get('match', [])])
-        if re.search(matched_regex, user_agent, re.I | re.U):
+        if matched:
             return environ.url
 
         # do not intercept if no match at all
         return None
 
+    def _get_robots_matchers(self):
+        # ``(ignore, match)`` matchers compiled from ``robots``. ``robots`` can
+        # be altered from outside, so the matchers are re-validated and
+        # re-compiled whenever its revision changes, but only then.
+        revision = self.__robots.revision
+        if self.__robots_revision != revision:
+            if not self._validate_robots():
+                raise error.SnapSearchError(
+                    "structure of ``robots`` is invalid")
+            self.__robots_matchers = (
+                self.__matcher(self.robots.get('ignore', [])),
+                self.__matcher(self.robots.get('match', [])), )
+            self.__robots_revision = revision
+            self.__verdict_cache.clear()
+        return self.__robots_matchers
+
+    def _get_robots_verdict(self, user_agent):
+        # ``(ignored, matched)`` verdict of ``user_agent`` against ``robots``.
+        # verdicts are memoized along with the revision of ``robots`` they
+        # were made against, so that stale verdicts are never returned.
+        ignore_matcher, match_matcher = self._get_robots_matchers()
+        revision = self.__robots_revision
+        cached = self.__verdict_cache.get(user_agent)
+        if cached is not None and cached[0] == revision:
+            return cached[1:]
+        ignored = ignore_matcher(user_agent)
+        matched = not ignored and match_matcher(user_agent)
+        self.__verdict_cache.set(user_agent, (revision, ignored, matched))
+        return ignored, matched
+
     def _validate_robots(self):
         # ``robots`` should be a ``dict`` object, if keys ``ignore`` and
         # ``match`` exist, the respective values must be ``list`` objects.
@@ -275,11 +748,27 @@ class Detector(object):
             isinstance(self.robots.get('ignore', []), list) and \
             isinstance(self.robots.get('match', []), list)
 
+    def _get_valid_extensions(self):
+        # ``frozenset`` of lower-cased extensions in ``extension_groups``.
+        # ``extensions`` can be altered from outside, so the set is
+        # re-validated and re-collected whenever its revision changes.
+        revision = self.__extensions.revision
+        if self.__extensions_revision != revision:
+            if not self._validate_extensions():
+                raise error.SnapSearchError(
+                    "structure of ``extensions`` is invalid")
+            self.__valid_extensions = frozenset(
+                [s.lower() for group in self.__extension_groups
+                 for s in self.extensions.get(group, [])])
+            self.__extensions_revision = revision
+        return self.__valid_extensions
+
     def _validate_extensions(self):
-        # ``extensions`` should be a ``dict`` object, if keys ``generic`` and
-        # ``python`` exist, the respective values must be ``list`` objects.
+        # ``extensions`` should be a ``dict`` object, if keys in
+        # ``extension_groups`` (``generic`` and ``python`` by default) exist,
+        # the respective values must be ``list`` objects.
         return isinstance(self.extensions, dict) and \
-            isinstance(self.extensions.get('generic', []), list) and \
-            isinstance(self.extensions.get('python', []), list)
+            all(isinstance(self.extensions.get(group, []), list)
+                for group in self.__extension_groups)
 
     pass
@@ -36,6 +36,13 @@ class SnapSearchConnectionError(SnapSearchError):
     pass
 
 
+class SnapSearchCircuitOpenError(SnapSearchConnectionError):
+    """
+    SnapSearch backend service skipped, as its circuit breaker is open.
+    """
+    pass
+
+
 class SnapSearchDependencyError(SnapSearchError):
     """
     Cannot import package(s) required by SnapSearch.
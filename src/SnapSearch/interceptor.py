@@ -13,6 +13,8 @@
 __all__ = ['Interceptor', ]
 
 
+import functools
+
 from .client import Client
 from .detector import Detector
 
@@ -53,11 +55,18 @@ class Interceptor(object):
         """
         return self.__end
 
+    @property
+    def cache(self):
+        """
+        associated ``SnapshotCache`` object (or ``None``)
+        """
+        return self.__cache
+
     # private properties
-    __slots__ = ['__detector', '__client', '__start', '__end', ]
+    __slots__ = ['__detector', '__client', '__start', '__end', '__cache', ]
 
     def __init__(self, client, detector, before_intercept=None,
-                 after_intercept=None):
+                 after_intercept=None, cache=None):
         """
         :param client: initialized ``Client`` object to associate
         :param detector: initialized ``Detector`` object to associate
@@ -70,6 +79,12 @@ class Interceptor(object):
         :param after_intercept: post-interception callable object
         :type after_intercept: ``callable`` with signature
             ``"(url, response) -> None"``
+        :param cache: local cache of the responses from SnapSearch backend
+            service, keyed on the requested URL and the request parameters of
+            ``client``. Stale responses (see the ``hard_ttl`` of
+            ``SnapshotCache``) are served while being refreshed in the
+            background.
+        :type cache: ``SnapshotCache``
 
         :raises AssertionError: if ``client`` is not an instance of ``Client``
         :raises AssertionError: if ``detector`` is not an instance of
@@ -84,9 +99,30 @@ class Interceptor(object):
         # optional arguments
         self.__start = before_intercept if callable(before_intercept) else None
         self.__end = after_intercept if callable(after_intercept) else None
+        self.__cache = cache
 
         pass  # void return
 
+    def _lookup(self, url):
+        # cache key and cached response (if any) of ``url``
+        if self.cache is None:
+            return None, None
+        key = self.cache.make_key(url, self.client.request_parameters)
+        content, stale = self.cache.lookup(key)
+        if stale:
+            # serve the stale response, and refresh it in the background
+            self._revalidate(key, url)
+        return key, content
+
+    def _revalidate(self, key, url):
+        self.cache.revalidate(key, functools.partial(self.client, url))
+        pass  # void return
+
+    def _store(self, key, response):
+        if key is not None and isinstance(response, dict):
+            self.cache.set(key, response)
+        pass  # void return
+
     def __call__(self, request):
         """
         :param request: incoming HTTP request
@@ -103,6 +139,11 @@ class Interceptor(object):
         if not raw_current_url:
             return None
 
+        return self._intercept(raw_current_url)
+
+    def _intercept(self, raw_current_url):
+        # interception of an eligible request, past the ``Detector``
+
         # invoke pre-interception callback
         if callable(self.before_intercept):
             result = self.before_intercept(raw_current_url)
@@ -110,8 +151,11 @@ class Interceptor(object):
             if isinstance(result, dict):
                 return result
 
-        # dispatch backend service
-        response = self.client(raw_current_url)
+        # dispatch backend service (unless cached)
+        key, response = self._lookup(raw_current_url)
+        if response is None:
+            response = self.client(raw_current_url)
+            self._store(key, response)
 
         # invoke post-interception callback
         if callable(self.after_intercept):
@@ -0,0 +1,458 @@
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.warm
+    ~~~~~~~~~~~~~~~
+
+    warms up a ``DiskStorage`` of snapshots from sitemaps, e.g.,
+
+    .. code-block:: bash
+
+        $ python -m SnapSearch.warm --cache-dir /var/cache/snapsearch \\
+              --checkpoint warm.json https://example.com/sitemap.xml
+
+    :copyright: 2014 by `SnapSearch <https://snapsearch.io/>`_
+    :license: MIT, see LICENSE for more details.
+
+    :author: `LIU Yu <liuyu@opencps.net>`_
+    :date: 2014/03/08
+"""
+
+__all__ = ['Checkpoint', 'iter_urls', 'main', 'warm', ]
+
+
+import argparse
+import collections
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+from xml.etree.ElementTree import iterparse
+
+import SnapSearch.error as error
+
+from .cache import DiskStorage, SnapshotCache
+from .client import Client, RenderStats
+
+
+# size in bytes of the chunks read from sitemaps
+CHUNK_SIZE = 64 * 1024
+
+# seconds to wait for the server of a remote sitemap
+TIMEOUT = 60
+
+
+class _Reader(object):
+    """
+    Binary file object over a source of a sitemap (a path, an http(s) URL, or
+    ``"-"`` for the standard input), decompressing gzip'ed sources on the fly.
+    """
+
+    __slots__ = ['__file', '__inflate', '__buffer', ]
+
+    def __init__(self, source):
+        if source == "-":
+            self.__file = getattr(sys.stdin, 'buffer', sys.stdin)
+        elif source.startswith(("http://", "https://")):
+            try:
+                from urllib.request import urlopen
+            except ImportError:
+                from urllib2 import urlopen
+            self.__file = urlopen(source, timeout=TIMEOUT)
+        else:
+            self.__file = open(source, "rb")
+        self.__buffer = self.__file.read(CHUNK_SIZE)
+        self.__inflate = None
+        if self.__buffer.startswith(b"\x1f\x8b"):
+            # gzip header and trailer handled by zlib
+            self.__inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            self.__buffer = self.__inflate.decompress(self.__buffer)
+        pass  # void return
+
+    def _fill(self, size):
+        # buffers at least ``size`` bytes, unless at the end of the source
+        while size < 0 or len(self.__buffer) < size:
+            chunk = self.__file.read(CHUNK_SIZE)
+            if not chunk:
+                if self.__inflate is not None:
+                    self.__buffer += self.__inflate.flush()
+                    self.__inflate = None
+                break
+            if self.__inflate is not None:
+                chunk = self.__inflate.decompress(chunk)
+            self.__buffer += chunk
+        pass  # void return
+
+    def read(self, size=-1):
+        self._fill(size)
+        if size < 0:
+            size = len(self.__buffer)
+        data, self.__buffer = self.__buffer[:size], self.__buffer[size:]
+        return data
+
+    def is_xml(self):
+        # whether the content starts with markup (after a BOM and spaces)
+        self._fill(256)
+        return self.__buffer.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"<")
+
+    def close(self):
+        self.__file.close()
+        pass  # void return
+
+    pass
+
+
+def _iter_sitemap(reader):
+    # ``(is_index, loc)`` of a sitemap or a sitemap index, parsed
+    # incrementally and discarding each entry once parsed; only the ``loc``
+    # of each entry counts (not, e.g., the ``image:loc`` of an image sitemap)
+    root = ns = is_index = None
+    path = []  # tags of the open elements
+    for event, elem in iterparse(reader, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                # in the namespace of the root element, i.e. that of the
+                # sitemap protocol, a former one, or none at all
+                root = elem
+                ns = root.tag[:root.tag.find("}") + 1]
+                is_index = root.tag == ns + "sitemapindex"
+            path.append(elem.tag)
+            continue
+        path.pop()
+        if len(path) == 2 and elem.tag == ns + "loc" and \
+                path[1] == ns + ("sitemap" if is_index else "url"):
+            if elem.text and elem.text.strip():
+                yield is_index, elem.text.strip()
+        elif len(path) == 1:
+            root.clear()  # the entry is complete
+    pass  # void return
+
+
+def iter_urls(sources):
+    """
+    Yields the URLs of ``sources`` in order, each being a sitemap, a sitemap
+    index (whose sitemaps are followed), or a file of one URL per line (blank
+    lines and ``#`` comments skipped). Sources are paths, http(s) URLs, or
+    ``"-"`` for the standard input, optionally gzip'ed. Sitemaps are parsed
+    incrementally, i.e. never held in memory as a whole.
+    """
+    for source in sources:
+        reader = _Reader(source)
+        try:
+            if reader.is_xml():
+                for is_index, loc in _iter_sitemap(reader):
+                    if is_index:
+                        for url in iter_urls([loc]):
+                            yield url
+                    else:
+                        yield loc
+            else:
+                pending = b""
+                while True:
+                    chunk = reader.read(CHUNK_SIZE)
+                    lines = (pending + chunk).split(b"\n")
+                    pending = lines.pop() if chunk else b""
+                    for line in lines:
+                        line = line.decode("utf-8").strip()
+                        if line and not line.startswith("#"):
+                            yield line
+                    if not chunk:
+                        break
+        finally:
+            reader.close()
+    pass  # void return
+
+
+class Checkpoint(object):
+    """
+    Resumable position of a warm-up in its stream of URLs, i.e. the number of
+    leading URLs that have all completed (URLs complete out of order), saved
+    as JSON to ``path`` along with the URLs that failed, which are retried
+    first when resuming.
+    """
+
+    @property
+    def path(self):
+        """
+        path of the checkpoint file.
+        """
+        return self.__path
+
+    @property
+    def position(self):
+        """
+        number of leading URLs completed.
+        """
+        return self.__position
+
+    @property
+    def failed(self):
+        """
+        ``list`` of the URLs that failed, and have not been rendered since
+        (to be retried when resuming).
+        """
+        with self.__lock:
+            return self.__failed + self.__retried
+
+    # private properties
+    __slots__ = ['__path', '__sources', '__position', '__issued', '__done',
+                 '__failed', '__retried', '__lock', '__interval', '__saved', ]
+
+    def __init__(self, path, sources, interval=5.0):
+        """
+        :param path: path of the checkpoint file, resumed from if it records
+            the same ``sources``.
+        :param sources: ``list`` of the sources of the URLs.
+        :param interval: seconds between saves of the checkpoint file.
+        :type interval: ``int`` or ``float``
+        """
+        self.__path = path
+        self.__sources = list(sources)
+        self.__position = 0
+        self.__issued = collections.defaultdict(collections.deque)
+        self.__done = set()
+        self.__failed = []
+        self.__retried = []  # failed ones of the checkpoint file, pending
+        self.__lock = threading.Lock()
+        self.__interval = interval
+        self.__saved = time.time()
+        try:
+            with open(path, "r") as f:
+                state = json.load(f)
+            if state['sources'] == self.__sources:
+                self.__position = int(state['position'])
+                self.__retried = list(state.get('failed', []))
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            pass  # start over
+        pass  # void return
+
+    def track(self, urls):
+        """
+        Yields the URLs that failed before resuming, then the URLs of ``urls``
+        after the completed ones, recording their positions.
+        """
+        for url in list(self.__retried):
+            with self.__lock:
+                self.__issued[url].append(None)  # out of ``urls``
+            yield url
+        start = self.__position
+        for i, url in enumerate(urls):
+            if i < start:
+                continue
+            with self.__lock:
+                self.__issued[url].append(i)
+            yield url
+        pass  # void return
+
+    def complete(self, url, failed=False):
+        """
+        Records the completion of ``url`` (as failed, to be retried when
+        resuming, if ``failed``), and saves the checkpoint file if
+        ``interval`` has elapsed.
+        """
+        with self.__lock:
+            indices = self.__issued[url]
+            index = indices.popleft()
+            if not indices:
+                del self.__issued[url]
+            if failed:
+                self.__failed.append(url)
+            if index is None:
+                self.__retried.remove(url)
+            else:
+                self.__done.add(index)
+            while self.__position in self.__done:
+                self.__done.remove(self.__position)
+                self.__position += 1
+        if time.time() - self.__saved >= self.__interval:
+            self.save()
+        pass  # void return
+
+    def save(self):
+        """
+        Writes the checkpoint file (replaced atomically).
+        """
+        with self.__lock:
+            state = {'sources': self.__sources, 'position': self.__position,
+                     'failed': self.__failed + self.__retried}
+        directory = os.path.dirname(os.path.abspath(self.__path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, f)
+            getattr(os, 'replace', os.rename)(tmp, self.__path)
+        except Exception:
+            os.remove(tmp)
+            raise
+        self.__saved = time.time()
+        pass  # void return
+
+    pass
+
+
+def _throttle(urls, rate):
+    # yields ``urls`` at no more than ``rate`` URLs per second
+    interval = 1.0 / rate
+    due = time.time()
+    for url in urls:
+        now = time.time()
+        if due > now:
+            time.sleep(due - now)
+        due = max(due, now) + interval
+        yield url
+    pass  # void return
+
+
+def warm(client, urls, cache, concurrency=10, rate=None, checkpoint=None,
+         retries=3, backoff=0.5, progress=None):
+    """
+    Renders ``urls`` with ``client.render_many()``, and stores the snapshots
+    into ``cache`` under the keys ``Interceptor`` looks up.
+
+    :param client: the ``Client`` rendering the URLs.
+    :param urls: iterable of URLs, e.g. from ``iter_urls()``.
+    :param cache: the ``SnapshotCache`` to store the snapshots into.
+    :param concurrency: number of URLs rendered at a time.
+    :type concurrency: ``int``
+    :param rate: maximum number of URLs dispatched per second, or ``None``
+        for no limit.
+    :type rate: ``int`` or ``float``
+    :param checkpoint: ``Checkpoint`` to resume from and to record the
+        completed URLs into. URLs without a snapshot (failed, or not
+        rendered by SnapSearch backend service) are recorded as failed.
+    :param retries: maximum number of retries of each URL.
+    :type retries: ``int``
+    :param backoff: seconds to wait before the first retry of a URL.
+    :type backoff: ``int`` or ``float``
+    :param progress: callback ``progress(stats, url, result)`` called after
+        each completed URL.
+
+    :returns: the ``RenderStats`` of the warm-up.
+    """
+    if checkpoint is not None:
+        urls = checkpoint.track(urls)
+    if rate:
+        urls = _throttle(urls, rate)
+    last = [RenderStats()]  # from ``render_many()`` once a URL completes
+
+    def count(stats):
+        last[0] = stats
+
+    for url, result in client.render_many(
+            urls, concurrency=concurrency, retries=retries, backoff=backoff,
+            progress=count):
+        if isinstance(result, dict):
+            cache.set(cache.make_key(url, client.request_parameters), result)
+        if checkpoint is not None:
+            checkpoint.complete(url, failed=not isinstance(result, dict))
+        if progress is not None:
+            progress(last[0], url, result)
+    if checkpoint is not None:
+        checkpoint.save()
+    return last[0]
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m SnapSearch.warm",
+        description="Renders the URLs of sitemaps (or of files of one URL "
+                    "per line) with SnapSearch, into a directory of "
+                    "snapshots shared with SnapshotCache(DiskStorage(...)).")
+    parser.add_argument(
+        "sources", nargs="+", metavar="SOURCE",
+        help="sitemap, sitemap index, or file of URLs (path, http(s) URL, "
+             "or - for the standard input)")
+    parser.add_argument(
+        "--cache-dir", required=True,
+        help="directory of the snapshots")
+    parser.add_argument(
+        "--max-mb", type=float, default=1024,
+        help="maximum size of the snapshots in MB (default: %(default)s)")
+    parser.add_argument(
+        "--credentials", default=os.environ.get('SNAPSEARCH_API_CREDENTIALS'),
+        help="EMAIL:KEY (default: $SNAPSEARCH_API_CREDENTIALS)")
+    parser.add_argument(
+        "--parameters", type=json.loads, default={},
+        help="request parameters as a JSON object, as in the application")
+    parser.add_argument("--api-url", help="URL of SnapSearch backend service")
+    parser.add_argument("--ca-path", help="path to an external CA bundle")
+    parser.add_argument(
+        "--concurrency", type=int, default=10,
+        help="number of URLs rendered at a time (default: %(default)s)")
+    parser.add_argument(
+        "--rate", type=float,
+        help="maximum number of URLs per second (default: no limit)")
+    parser.add_argument(
+        "--retries", type=int, default=3,
+        help="maximum number of retries of each URL (default: %(default)s)")
+    parser.add_argument(
+        "--checkpoint",
+        help="checkpoint file to resume from (and to save progress into)")
+    parser.add_argument(
+        "--progress-interval", type=float, default=10.0,
+        help="seconds between progress reports (default: %(default)s)")
+    args = parser.parse_args(argv)
+    email, sep, key = (args.credentials or "").partition(":")
+    if not (email and key):
+        parser.error("requires --credentials EMAIL:KEY")
+    args.email, args.key = email, key
+    return args
+
+
+def main(argv=None):
+    """
+    Runs the command line ``python -m SnapSearch.warm``.
+
+    :returns: the exit status, i.e. ``0`` if all URLs were rendered, ``1``
+        if some failed (or were not rendered by SnapSearch backend service),
+        ``2`` for invalid options.
+    """
+    args = _parse_args(argv)
+    try:
+        cache = SnapshotCache(storage=DiskStorage(args.cache_dir), ttl=None,
+                              max_bytes=int(args.max_mb * 1024 * 1024))
+        client = Client(args.email, args.key, args.parameters,
+                        api_url=args.api_url, ca_path=args.ca_path,
+                        pool_size=args.concurrency)
+    except error.SnapSearchError as e:
+        sys.stderr.write("error: %s\n" % e)
+        return 2
+    checkpoint = None
+    if args.checkpoint:
+        checkpoint = Checkpoint(args.checkpoint, args.sources)
+        if checkpoint.position or checkpoint.failed:
+            sys.stderr.write("resuming after %d URLs, retrying %d failed\n" %
+                             (checkpoint.position, len(checkpoint.failed)))
+    reported = [time.time()]
+    failed = [0]  # including the URLs not rendered, unlike ``stats.failed``
+
+    def progress(stats, url, result):
+        if not isinstance(result, dict):
+            failed[0] += 1
+            sys.stderr.write("failed: %s (%s)\n" % (
+                url, result if result is not None else "not rendered"))
+        if time.time() - reported[0] >= args.progress_interval:
+            reported[0] = time.time()
+            sys.stderr.write("%s\n" % stats)
+
+    try:
+        stats = warm(client, iter_urls(args.sources), cache,
+                     concurrency=args.concurrency, rate=args.rate,
+                     checkpoint=checkpoint, retries=args.retries,
+                     progress=progress)
+    except KeyboardInterrupt:
+        if checkpoint is not None:
+            checkpoint.save()
+        sys.stderr.write("interrupted\n")
+        return 130
+    finally:
+        client.close()
+    sys.stderr.write("%s\n" % stats)
+    return 1 if failed[0] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -33,6 +33,14 @@ def default_response_callback(response_body):
     return response_body
 
 
+def _iter_chunks(body, chunk_size):
+    # :PEP:`3333` requires ``bytes`` (i.e. no ``memoryview``) from the
+    # application, so that each chunk is a copy, while ``body`` stays whole
+    # until the last chunk (i.e. chunking saves no memory)
+    for offset in range(0, len(body), chunk_size):
+        yield body[offset:offset + chunk_size]
+
+
 class InterceptorMiddleware(object):
     """
     Wraps a WSGI-defined web application (see :PEP:`3333`) and intercepts
@@ -60,10 +68,20 @@ class InterceptorMiddleware(object):
         """
         return self.__response_callback
 
+    @property
+    def chunk_size(self):
+        """
+        size in bytes of the chunks of intercepted response bodies, or
+        ``None`` for a single chunk.
+        """
+        return self.__chunk_size
+
     # private members
-    __slots__ = ['__application', '__interceptor', '__response_callback', ]
+    __slots__ = ['__application', '__interceptor', '__response_callback',
+                 '__chunk_size', ]
 
-    def __init__(self, application, interceptor, response_callback=None):
+    def __init__(self, application, interceptor, response_callback=None,
+                 chunk_size=None):
         """
         :param application: associated (wrapped) WSGI application object
         :param interceptor: associated ``Interceptor`` object
@@ -80,6 +98,11 @@ class InterceptorMiddleware(object):
 
         :type response_callback: ``callable`` with signature ``"(response)->
             dict"``
+        :param chunk_size: size in bytes of the chunks to stream intercepted
+            response bodies in (e.g. ``65536``), instead of a single chunk.
+            The whole body is still held in memory, and each chunk is copied
+            from it.
+        :type chunk_size: ``int``
 
         :raises AssertionError: if ``interceptor`` is not an instance of
             ``Interceptor``.
@@ -90,6 +113,8 @@ class InterceptorMiddleware(object):
         self.__interceptor = interceptor
         self.__response_callback = response_callback \
             if callable(response_callback) else default_response_callback
+        self.__chunk_size = chunk_size if chunk_size and chunk_size > 0 \
+            else None
         pass
 
     def __call__(self, environ, start_response):
@@ -111,12 +136,23 @@ class InterceptorMiddleware(object):
         # intercepted response
         message = self.response_callback(response)
 
-        # ship out
+        # the length of the body is known up front
+        body = message['html']
+        headers = [(name, value) for name, value in message['headers']
+                   if name.lower() != b"content-length"]
+        headers.append((b"content-length", str(len(body)).encode()))
+
+        # ship out, with :PEP:`3333` native strings for the status and
+        # headers, and the body as a single ``bytes`` object
         if PY2:
-            start_response(message['status'], message['headers'])
+            start_response(message['status'], headers)
         else:
-            start_response(message['status'].decode(), [(name.decode(), value.decode()) for name, value in message['headers']])
-        return message['html'],
-
+            start_response(message['status'].decode("iso-8859-1"),
+                           [(name.decode("iso-8859-1"),
+                             value.decode("iso-8859-1"))
+                            for name, value in headers])
+        if self.__chunk_size is None or len(body) <= self.__chunk_size:
+            return body,
+        return _iter_chunks(body, self.__chunk_size)
 
     pass
@@ -10,9 +10,15 @@
 __all__ = ['test_suite', ]
 
 
-from . import (test_client,
+from . import (test_aio,
+               test_asgi,
+               test_breaker,
+               test_cache,
+               test_client,
                test_detector,
                test_interceptor,
+               test_stream,
+               test_warm,
                test_wsgi,
                test_cgi)
 
@@ -23,9 +29,15 @@ def test_suite():
     suite = unittest.TestSuite()
     suite.addTest(unittest.TestLoader().
                   loadTestsFromTestCase(TestPackageIntegrity))
-    for pkg in (test_client,
+    for pkg in (test_aio,
+                test_asgi,
+                test_breaker,
+                test_cache,
+                test_client,
                 test_detector,
                 test_interceptor,
+                test_stream,
+                test_warm,
                 test_wsgi,
                 test_cgi):
         suite.addTest(pkg.test_suite())
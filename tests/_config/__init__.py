@@ -15,8 +15,11 @@ import os
 import os.path
 import platform
 import shutil
+import ssl
 import sys
 import tempfile
+import threading
+import time
 
 # package names unification
 
@@ -34,6 +37,22 @@ except ImportError:
     # python 2.7+
     import unittest
 
+try:
+    # python 3.x
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    # python 2.x
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+try:
+    # python 3.4+
+    import asyncio
+except ImportError:
+    # python 2.x
+    asyncio = None
+
 
 # unittest verbosity
 
@@ -110,6 +129,11 @@ DATA_GOOGBOT_IGNORED = load_data("req_googbot_ignored.json").decode("utf-8")
 DATA_MSNBOT_MATCHED = load_data("req_msnbot_matched.json").decode("utf-8")
 
 
+# self-signed certificate (and private key) for ``localhost`` / 127.0.0.1
+
+LOCALHOST_PEM = os.path.join(DATA_DIR, "localhost.pem")
+
+
 # pre-configured data
 
 def get_api_credentials(user_input=True, prompt="API credentials: "):
@@ -122,6 +146,234 @@ def get_api_credentials(user_input=True, prompt="API credentials: "):
     return email, key
 
 
+# local stand-in for SnapSearch backend service
+
+def render_url(payload):
+    """
+    Default response body of ``StandInBackend``, rendering the requested URL
+    into a tiny HTML page.
+    """
+    return {'code': "success",
+            'content': {
+                'status': 200,
+                'headers': [{'name': "Content-Type", 'value': "text/html"},
+                            {'name': "Server", 'value': "stand-in"}, ],
+                'html': "<html><body>%s</body></html>" % payload['url'], }}
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+
+    # persistent connections
+    protocol_version = "HTTP/1.1"
+
+    # buffered writes, i.e. headers and body in one segment
+    wbufsize = 65536
+
+    def do_POST(self):
+        backend = self.server.backend
+        length = int(self.headers['Content-Length'])
+        payload = json.loads(self.rfile.read(length).decode("utf-8"))
+        backend.record(payload)
+        if backend.delay:
+            time.sleep(backend.delay)
+        body = json.dumps(backend.responder(payload)).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+        pass  # void return
+
+    def log_message(self, *args):
+        pass  # silence
+
+    pass
+
+
+class _StandInServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+    def get_request(self):
+        # the TLS handshake is performed upon ``accept()``
+        request = HTTPServer.get_request(self)
+        self.backend.record(None)
+        return request
+
+    def handle_error(self, request, client_address):
+        pass  # e.g. connections closed by clients
+
+    pass
+
+
+class StandInBackend(object):
+    """
+    Local HTTPS stand-in for SnapSearch backend service, which records the
+    number of accepted connections (i.e. TLS handshakes) and the payloads of
+    requests. ``responder(payload) -> body`` produces the response body.
+    """
+
+    def __init__(self, responder=render_url, delay=0):
+        self.responder = responder
+        self.delay = delay
+        self.connections = 0
+        self.payloads = []
+        self.lock = threading.Lock()
+        context = ssl.SSLContext(
+            getattr(ssl, 'PROTOCOL_TLS_SERVER', ssl.PROTOCOL_SSLv23))
+        context.load_cert_chain(LOCALHOST_PEM)
+        self.server = _StandInServer(("127.0.0.1", 0), _StandInHandler)
+        self.server.socket = context.wrap_socket(
+            self.server.socket, server_side=True)
+        self.server.backend = self
+        self.url = "https://127.0.0.1:%d/api/v1/robot" % \
+            self.server.server_address[1]
+        self.ca_path = LOCALHOST_PEM
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.05, ))
+        self.thread.daemon = True
+        pass  # void return
+
+    def record(self, payload):
+        with self.lock:
+            if payload is None:
+                self.connections += 1
+            else:
+                self.payloads.append(payload)
+        pass  # void return
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        pass  # void return
+
+    pass
+
+
+class _AsyncStandInProtocol(asyncio.Protocol if asyncio else object):
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.buffer = b""
+        self.transport = None
+        pass  # void return
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.backend.connections += 1
+        self.backend.transports.append(transport)
+        pass  # void return
+
+    def data_received(self, data):
+        self.buffer += data
+        while True:
+            head, sep, rest = self.buffer.partition(b"\r\n\r\n")
+            if not sep:
+                break
+            headers = dict(
+                (name.strip().lower(), value.strip())
+                for name, _, value in (line.partition(b":")
+                                       for line in head.split(b"\r\n")[1:]))
+            length = int(headers.get(b"content-length", 0))
+            if len(rest) < length:
+                break
+            body, self.buffer = rest[:length], rest[length:]
+            payload = json.loads(body.decode("utf-8"))
+            close = headers.get(b"connection", b"").lower() == b"close"
+            self.backend.targets.append(
+                head.split(b"\r\n")[0].split(b" ")[1].decode("ascii"))
+            self.backend.enter(payload)
+            self.backend.loop.call_later(
+                self.backend.delay, self.respond, payload, close)
+        pass  # void return
+
+    def respond(self, payload, close):
+        self.backend.leave()
+        if self.transport.is_closing():
+            return
+        body = json.dumps(self.backend.responder(payload)).encode("utf-8")
+        head = ["HTTP/1.1 200 OK",
+                "Content-Type: application/json",
+                "Content-Length: %d" % len(body)]
+        if close:
+            head.append("Connection: close")
+        if self.backend.truncate:
+            # a partial response, then a broken connection
+            body, close = body[:len(body) // 2], True
+        self.transport.write(
+            ("\r\n".join(head) + "\r\n\r\n").encode("ascii") + body)
+        if close:
+            self.transport.close()
+        pass  # void return
+
+    pass
+
+
+class AsyncStandInBackend(object):
+    """
+    Local asyncio HTTPS stand-in for SnapSearch backend service, running on
+    its own event loop (see ``run()``). Besides connections and payloads, it
+    records the request targets and the maximum number of requests in flight
+    at once. With ``truncate``, responses are cut short.
+    """
+
+    def __init__(self, responder=render_url, delay=0):
+        self.responder = responder
+        self.delay = delay
+        self.connections = 0
+        self.payloads = []
+        self.targets = []
+        self.truncate = False
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.transports = []
+        self.loop = asyncio.new_event_loop()
+        context = ssl.SSLContext(
+            getattr(ssl, 'PROTOCOL_TLS_SERVER', ssl.PROTOCOL_SSLv23))
+        context.load_cert_chain(LOCALHOST_PEM)
+        self.server = self.loop.run_until_complete(self.loop.create_server(
+            lambda: _AsyncStandInProtocol(self), "127.0.0.1", 0, ssl=context))
+        self.url = "https://127.0.0.1:%d/api/v1/robot" % \
+            self.server.sockets[0].getsockname()[1]
+        self.ca_path = LOCALHOST_PEM
+        pass  # void return
+
+    def enter(self, payload):
+        self.payloads.append(payload)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        pass  # void return
+
+    def leave(self):
+        self.in_flight -= 1
+        pass  # void return
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.close()
+        for transport in self.transports:
+            transport.close()
+        # let both ends of the connections shut down
+        self.loop.run_until_complete(asyncio.sleep(0.05))
+        self.loop.run_until_complete(self.server.wait_closed())
+        self.loop.close()
+        pass  # void return
+
+    pass
+
+
 # preliminary tests
 class TestPackageIntegrity(unittest.TestCase):
     """
@@ -0,0 +1,342 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.tests.test_aio
+    ~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Tests SnapSearch.aio
+
+    :author: `LIU Yu <liuyu@opencps.net>`_
+    :date: 2014/03/08
+"""
+
+__all__ = ['TestAsyncClient',
+           'TestAsyncInterceptor', ]
+
+
+import os
+import sys
+
+try:
+    from . import _config
+    from ._config import unittest
+except (ValueError, ImportError):
+    import _config
+    from _config import unittest
+
+
+class _AsyncTestCase(unittest.TestCase):
+
+    def setUp(self):
+        if _config.asyncio is None or sys.version_info < (3, 5):
+            self.skipTest("requires python 3.5+")
+        self.backend = _config.AsyncStandInBackend(
+            delay=getattr(self, 'delay', 0)).__enter__()
+        pass  # void return
+
+    def tearDown(self):
+        self.backend.__exit__()
+        pass  # void return
+
+    def make_client(self, **kwds):
+        from SnapSearch.aio import AsyncClient
+        return AsyncClient("fantasy@email.com", "fantasy_Api_Key", {'test': 1},
+                           api_url=self.backend.url,
+                           ca_path=self.backend.ca_path, **kwds)
+
+    pass
+
+
+class TestAsyncClient(_AsyncTestCase):
+    """
+    Tests ``AsyncClient`` against a local asyncio stand-in for SnapSearch
+    backend service.
+    """
+
+    delay = 0.05
+
+    def test_async_client_response(self):
+        from SnapSearch.api import aio
+        from SnapSearch.api.response import Response
+        client = self.make_client()
+        r = self.backend.run(aio.dispatch(
+            **client._prepare_dispatch("http://localhost/")))
+        client.close()
+        self.assertTrue(isinstance(r, Response))
+        self.assertEqual(r.status, 200)
+        self.assertEqual(r.headers['content-type'], "application/json")
+        payload = {'test': 1, 'url': "http://localhost/"}
+        self.assertEqual(r.body, _config.render_url(payload))
+        pass  # void return
+
+    def test_async_client_matches_sync(self):
+        from SnapSearch import Client
+        client = self.make_client()
+        urls = ["http://localhost/%d" % i for i in range(3)]
+        async_results = [self.backend.run(client(url)) for url in urls]
+        client.close()
+        with _config.StandInBackend() as backend:
+            with Client("fantasy@email.com", "fantasy_Api_Key", {'test': 1},
+                        api_url=backend.url,
+                        ca_path=backend.ca_path) as sync_client:
+                sync_results = [sync_client(url) for url in urls]
+        self.assertEqual(async_results, sync_results)
+        pass  # void return
+
+    def test_async_client_reuse(self):
+        client = self.make_client()
+        for i in range(10):
+            response = self.backend.run(client("http://localhost/%d" % i))
+            self.assertEqual(response['status'], 200)
+        client.close()
+        # one TLS handshake for all requests
+        self.assertEqual(self.backend.connections, 1)
+        pass  # void return
+
+    def test_async_client_no_keep_alive(self):
+        client = self.make_client(keep_alive=False)
+        for i in range(3):
+            self.backend.run(client("http://localhost/%d" % i))
+        client.close()
+        self.assertEqual(self.backend.connections, 3)
+        pass  # void return
+
+    def test_async_client_concurrency(self):
+        import asyncio
+        client = self.make_client(pool_size=4)
+        urls = ["http://localhost/%d" % i for i in range(20)]
+        tasks = [self.backend.loop.create_task(client(url)) for url in urls]
+        responses = self.backend.run(asyncio.gather(*tasks))
+        client.close()
+        self.assertEqual(
+            [r['html'] for r in responses],
+            ["<html><body>%s</body></html>" % url for url in urls])
+        # bounded concurrency
+        self.assertTrue(2 <= self.backend.max_in_flight <= 4)
+        self.assertTrue(self.backend.connections <= 4)
+        pass  # void return
+
+    def test_async_client_coalesce(self):
+        import asyncio
+        client = self.make_client()
+        urls = ["http://localhost/"] * 8 + ["http://other/"]
+        tasks = [self.backend.loop.create_task(client(url)) for url in urls]
+        responses = self.backend.run(asyncio.gather(*tasks))
+        client.close()
+        # one backend render per distinct URL
+        self.assertEqual(len(self.backend.payloads), 2)
+        self.assertEqual(responses[:8], [responses[0]] * 8)
+        # each caller gets its own copy of the response
+        self.assertEqual(len(set(id(r) for r in responses[:8])), 8)
+        self.assertEqual(responses[8]['html'],
+                         "<html><body>http://other/</body></html>")
+        pass  # void return
+
+    def test_async_client_render_many(self):
+        from SnapSearch.error import SnapSearchError
+        client = self.make_client(pool_size=4)
+        urls = ["http://localhost/%d" % i for i in range(20)]
+        self.backend.responder = lambda payload: (
+            {'code': "validation_error"} if payload['url'] == urls[7] else
+            _config.render_url(payload))
+        progress = []
+        results = {}
+        iterator = client.render_many(iter(urls), concurrency=8,
+                                      progress=progress.append)
+        while True:
+            try:
+                url, result = self.backend.run(iterator.__anext__())
+            except StopAsyncIteration:
+                break
+            results[url] = result
+        self.assertEqual(sorted(results), sorted(urls))
+        # awaited results, not coroutines
+        self.assertTrue(isinstance(results.pop(urls[7]), SnapSearchError))
+        for url, result in results.items():
+            self.assertEqual(result['html'],
+                             "<html><body>%s</body></html>" % url)
+        self.assertEqual((progress[-1].rendered, progress[-1].failed),
+                         (19, 1))
+        # bounded by ``pool_size``
+        self.assertTrue(2 <= self.backend.max_in_flight <= 4)
+
+        # stopped early
+        iterator = client.render_many(
+            "http://localhost/%d" % i for i in range(1000))
+        url, result = self.backend.run(iterator.__anext__())
+        self.assertEqual(result['status'], 200)
+        self.backend.run(iterator.aclose())
+        client.close()
+        # stopped with the dispatches in flight
+        self.assertTrue(len(self.backend.payloads) < 40)
+        pass  # void return
+
+    def test_async_client_partial_response(self):
+        from SnapSearch.error import SnapSearchConnectionError
+        client = self.make_client()
+        self.backend.run(client("http://localhost/0"))
+        # not sent again over a new connection, unlike a request on an idle
+        # connection closed by the backend
+        self.backend.truncate = True
+        self.assertRaises(SnapSearchConnectionError, self.backend.run,
+                          client("http://localhost/1"))
+        client.close()
+        self.assertEqual(len(self.backend.payloads), 2)
+        self.assertEqual(self.backend.connections, 1)
+        pass  # void return
+
+    def test_async_client_api_url_query(self):
+        from SnapSearch.aio import AsyncClient
+        client = AsyncClient("fantasy@email.com", "fantasy_Api_Key",
+                             api_url=self.backend.url + "?region=eu",
+                             ca_path=self.backend.ca_path)
+        self.backend.run(client("http://localhost/"))
+        client.close()
+        self.assertEqual(self.backend.targets, ["/api/v1/robot?region=eu"])
+        pass  # void return
+
+    def test_async_client_timeout(self):
+        from SnapSearch.error import SnapSearchConnectionError
+        client = self.make_client(timeout=0.01)
+        self.assertRaises(SnapSearchConnectionError, self.backend.run,
+                          client("http://localhost/"))
+        client.close()
+        pass  # void return
+
+    pass
+
+
+class TestAsyncInterceptor(_AsyncTestCase):
+    """
+    Tests ``AsyncInterceptor`` against a local asyncio stand-in for SnapSearch
+    backend service.
+    """
+
+    ROBOT_REQUEST = {
+        'HTTP_USER_AGENT': "Googlebot/2.1 (+http://www.google.com/bot.html)",
+        'SERVER_NAME': "localhost",
+        'SERVER_PORT': "80",
+        'REQUEST_METHOD': "GET",
+        'PATH_INFO': "/",
+        'wsgi.url_scheme': "http", }
+
+    BROWSER_REQUEST = dict(
+        ROBOT_REQUEST,
+        HTTP_USER_AGENT="Mozilla/5.0 (X11; Linux x86_64; rv:24.0) "
+                        "Gecko/20140205 Firefox/24.0 Iceweasel/24.3.0")
+
+    def make_interceptor(self, **kwds):
+        from SnapSearch import Detector
+        from SnapSearch.aio import AsyncInterceptor
+        return AsyncInterceptor(self.make_client(), Detector(), **kwds)
+
+    def test_async_interceptor_verdicts(self):
+        interceptor = self.make_interceptor()
+        response = self.backend.run(interceptor(self.ROBOT_REQUEST))
+        self.assertEqual(response['html'],
+                         "<html><body>http://localhost/</body></html>")
+        self.assertEqual(
+            self.backend.run(interceptor(self.BROWSER_REQUEST)), None)
+        interceptor.client.close()
+        self.assertEqual(len(self.backend.payloads), 1)
+        pass  # void return
+
+    def test_async_interceptor_callbacks(self):
+        import asyncio
+        seen = []
+
+        def before_intercept(url):
+            return {'cached': url}
+
+        def after_intercept(url, response):
+            seen.append((url, response['status']))
+            return asyncio.sleep(0)  # awaitable
+
+        interceptor = self.make_interceptor(before_intercept=before_intercept)
+        self.assertEqual(self.backend.run(interceptor(self.ROBOT_REQUEST)),
+                         {'cached': "http://localhost/"})
+        interceptor = self.make_interceptor(after_intercept=after_intercept)
+        self.backend.run(interceptor(self.ROBOT_REQUEST))
+        interceptor.client.close()
+        self.assertEqual(seen, [("http://localhost/", 200)])
+        pass  # void return
+
+    def test_async_interceptor_stale_while_revalidate(self):
+        import asyncio
+        import gc
+        from SnapSearch.cache import SnapshotCache
+        clock = [1000.0]
+
+        class FakeClockCache(SnapshotCache):
+            __slots__ = []
+            _clock = staticmethod(lambda: clock[0])
+
+        cache = FakeClockCache(ttl=60, hard_ttl=3600)
+        interceptor = self.make_interceptor(cache=cache)
+        first = self.backend.run(interceptor(self.ROBOT_REQUEST))
+        clock[0] += 120
+        second = self.backend.run(interceptor(self.ROBOT_REQUEST))
+        self.assertEqual(second, first)
+        self.assertEqual((cache.stale_hits, cache.refreshes), (1, 1))
+        # the refresh task completes on the event loop, held by the
+        # interceptor (not only weakly by the loop) until then
+        tasks = interceptor._AsyncInterceptor__tasks
+        self.assertEqual(len(tasks), 1)
+        gc.collect()
+        self.backend.run(asyncio.sleep(0.2))
+        self.assertEqual(len(tasks), 0)
+        interceptor.client.close()
+        self.assertEqual(len(self.backend.payloads), 2)
+        self.assertEqual(cache.get(cache.make_key(
+            "http://localhost/", {'test': 1})), first)
+        pass  # void return
+
+    def test_async_interceptor_cache_executor(self):
+        import threading
+        from SnapSearch.cache import MemoryStorage, SnapshotCache
+        threads, loop_threads = [], []
+
+        class ThreadRecordingStorage(MemoryStorage):
+            __slots__ = []
+
+            def get(self, key):
+                threads.append(threading.current_thread())
+                return super(ThreadRecordingStorage, self).get(key)
+
+            def set(self, key, blob):
+                threads.append(threading.current_thread())
+                super(ThreadRecordingStorage, self).set(key, blob)
+                pass  # void return
+
+        interceptor = self.make_interceptor(
+            cache=SnapshotCache(ThreadRecordingStorage()),
+            before_intercept=lambda url: loop_threads.append(
+                threading.current_thread()))
+        first = self.backend.run(interceptor(self.ROBOT_REQUEST))
+        second = self.backend.run(interceptor(self.ROBOT_REQUEST))
+        interceptor.client.close()
+        self.assertEqual(second, first)
+        self.assertEqual(len(self.backend.payloads), 1)
+        # the storage is accessed off the thread of the event loop
+        self.assertTrue(threads and loop_threads)
+        self.assertFalse(set(threads) & set(loop_threads))
+        pass  # void return
+
+    def test_async_interceptor_client(self):
+        from SnapSearch import Client, Detector
+        from SnapSearch.aio import AsyncInterceptor
+        client = Client("fantasy@email.com", "fantasy_Api_Key",
+                        api_url=self.backend.url, ca_path=self.backend.ca_path)
+        self.assertRaises(AssertionError, AsyncInterceptor, client, Detector())
+        pass  # void return
+
+    pass
+
+
+def test_suite():
+    return unittest.TestSuite([
+        unittest.TestLoader().loadTestsFromTestCase(eval(c)) for c in __all__])
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.tests.test_asgi
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Tests SnapSearch.asgi
+
+    :author: `LIU Yu <liuyu@opencps.net>`_
+    :date: 2014/03/08
+"""
+
+__all__ = ['TestAsgiMiddlewareMethods', ]
+
+
+import os
+import sys
+
+try:
+    from . import _config
+    from ._config import unittest
+except (ValueError, ImportError):
+    import _config
+    from _config import unittest
+
+
+class DummyApp(object):
+    """
+    Dummy ASGI application
+    """
+    def __init__(self):
+        self.scopes = []
+        pass  # void return
+
+    def __call__(self, scope, receive, send):
+        self.scopes.append(scope)
+        send({'type': "http.response.start", 'status': 200,
+              'headers': [(b"content-type", b"text/html"), ]})
+        return send({'type': "http.response.body",
+                     'body': b"Hello World!\r\n"})
+
+    pass
+
+
+class TestAsgiMiddlewareMethods(unittest.TestCase):
+    """
+    Tests ``InterceptorMiddleware.__init__()`` and ``__call__()`` against a
+    local asyncio stand-in for SnapSearch backend service.
+    """
+
+    def setUp(self):
+        if _config.asyncio is None or sys.version_info < (3, 5):
+            self.skipTest("requires python 3.5+")
+        self.backend = _config.AsyncStandInBackend().__enter__()
+        self.messages = []
+        pass  # void return
+
+    def tearDown(self):
+        self.backend.__exit__()
+        pass  # void return
+
+    def make_scope(self, user_agent, **kwds):
+        scope = {'type': "http",
+                 'http_version': "1.1",
+                 'method': "GET",
+                 'scheme': "http",
+                 'path': "/",
+                 'root_path': "",
+                 'query_string': b"",
+                 'server': ("localhost", 80),
+                 'client': ("127.0.0.1", 54321),
+                 'headers': [(b"host", b"localhost"),
+                             (b"user-agent", user_agent.encode()), ], }
+        scope.update(kwds)
+        return scope
+
+    def make_middleware(self, interceptor=None):
+        from SnapSearch import Detector
+        from SnapSearch.aio import AsyncClient, AsyncInterceptor
+        from SnapSearch.asgi import InterceptorMiddleware
+        if interceptor is None:
+            client = AsyncClient("fantasy@email.com", "fantasy_Api_Key",
+                                 {'test': 1}, api_url=self.backend.url,
+                                 ca_path=self.backend.ca_path)
+            interceptor = AsyncInterceptor(client, Detector())
+        return InterceptorMiddleware(DummyApp(), interceptor)
+
+    def send(self, message):
+        self.messages.append(message)
+        future = self.backend.loop.create_future()
+        future.set_result(None)
+        return future
+
+    def receive(self):
+        return self.send({'type': "http.disconnect"})
+
+    def test_asgi_middleware_init(self):
+        from SnapSearch.wsgi import default_response_callback
+        im = self.make_middleware()
+        self.assertTrue(isinstance(im.application, DummyApp))
+        self.assertEqual(im.response_callback, default_response_callback)
+        self.assertRaises(AssertionError, type(im), DummyApp(), None)
+        pass  # void return
+
+    def test_asgi_middleware_environ(self):
+        from SnapSearch._compat import u
+        from SnapSearch.asgi import _build_environ
+        environ = _build_environ(self.make_scope(
+            "Googlebot", path=u("/caf\xe9"), query_string=b"a=1&b=%20",
+            headers=[(b"accept", b"text/html"), (b"accept", b"*/*"),
+                     (b"content-type", b"text/plain"), ]))
+        self.assertEqual(environ['PATH_INFO'], "/caf\xc3\xa9")
+        self.assertEqual(environ['QUERY_STRING'], "a=1&b=%20")
+        self.assertEqual(environ['HTTP_ACCEPT'], "text/html,*/*")
+        self.assertEqual(environ['CONTENT_TYPE'], "text/plain")
+        self.assertEqual(environ['SERVER_NAME'], "localhost")
+        self.assertEqual(environ['SERVER_PORT'], "80")
+        self.assertEqual(environ['REMOTE_ADDR'], "127.0.0.1")
+        pass  # void return
+
+    def test_asgi_middleware_call_normal(self):
+        im = self.make_middleware()
+        self.backend.run(im(self.make_scope("Mozilla/5.0 Firefox/27.0"),
+                            self.receive, self.send))
+        im.interceptor.client.close()
+        self.assertEqual(len(im.application.scopes), 1)
+        self.assertEqual(self.messages[-1]['body'], b"Hello World!\r\n")
+        self.assertEqual(self.backend.payloads, [])
+        pass  # void return
+
+    def test_asgi_middleware_call_intercepted(self):
+        im = self.make_middleware()
+        self.backend.run(im(self.make_scope("AdsBot-Google"),
+                            self.receive, self.send))
+        im.interceptor.client.close()
+        self.assertEqual(im.application.scopes, [])
+        start, body = self.messages
+        self.assertEqual(start['type'], "http.response.start")
+        self.assertEqual(start['status'], 200)
+        # stale headers removed by ``default_response_callback``
+        self.assertEqual(dict(start['headers']),
+                         {b"server": b"stand-in",
+                          b"content-length": str(len(body['body'])).encode()})
+        self.assertEqual(body['type'], "http.response.body")
+        self.assertEqual(body['body'],
+                         b"<html><body>http://localhost/</body></html>")
+        pass  # void return
+
+    def test_asgi_middleware_call_sync_interceptor(self):
+        from SnapSearch import Client, Detector, Interceptor
+        ticks = []
+        detected = []
+
+        class RecordingDetector(Detector):
+
+            def __call__(self, request):
+                detected.append(request)
+                return Detector.__call__(self, request)
+
+            pass
+
+        def tick():
+            ticks.append(1)
+            self.backend.loop.call_later(0.01, tick)
+
+        with _config.StandInBackend(delay=0.2) as backend:
+            client = Client("fantasy@email.com", "fantasy_Api_Key",
+                            {'test': 1}, api_url=backend.url,
+                            ca_path=backend.ca_path)
+            im = self.make_middleware(
+                Interceptor(client, RecordingDetector()))
+            tick()
+            self.backend.run(im(self.make_scope("AdsBot-Google"),
+                                self.receive, self.send))
+            client.close()
+        self.assertEqual(self.messages[-1]['body'],
+                         b"<html><body>http://localhost/</body></html>")
+        # the event loop kept running while the backend was dispatched
+        self.assertTrue(len(ticks) > 5)
+        # detected once, on the event loop only
+        self.assertEqual(len(detected), 1)
+        pass  # void return
+
+    def test_asgi_middleware_fallback_to_normal(self):
+        im = self.make_middleware()
+        # force the detector to raise an exception, and resume to
+        # non-intercepted mode
+        im.interceptor.detector.robots['match'] = None
+        self.backend.run(im(self.make_scope("AdsBot-Google"),
+                            self.receive, self.send))
+        im.interceptor.client.close()
+        self.assertEqual(self.messages[-1]['body'], b"Hello World!\r\n")
+        pass  # void return
+
+    def test_asgi_middleware_other_scope(self):
+        im = self.make_middleware()
+        self.backend.run(im({'type': "lifespan"}, self.receive, self.send))
+        im.interceptor.client.close()
+        self.assertEqual(im.application.scopes, [{'type': "lifespan"}])
+        pass  # void return
+
+    pass
+
+
+def test_suite():
+    return unittest.TestSuite([
+        unittest.TestLoader().loadTestsFromTestCase(eval(c)) for c in __all__])
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.tests.test_breaker
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Tests SnapSearch.breaker
+
+    :author: `LIU Yu <liuyu@opencps.net>`_
+    :date: 2014/03/08
+"""
+
+__all__ = ['TestCircuitBreaker',
+           'TestCircuitBreakerClient', ]
+
+
+import time
+
+try:
+    from . import _config
+    from ._config import unittest
+except (ValueError, ImportError):
+    import _config
+    from _config import unittest
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """
+    Tests the states of ``CircuitBreaker``, on a fake clock.
+    """
+
+    def make_breaker(self, **kwds):
+        from SnapSearch.breaker import CircuitBreaker
+
+        class FakeClockBreaker(CircuitBreaker):
+            __slots__ = []
+            _clock = staticmethod(lambda: self.now)
+
+        self.now = 1000.0
+        return FakeClockBreaker(**kwds)
+
+    def dispatch(self, breaker, exc=None, duration=0.0):
+        with breaker.guard():
+            self.now += duration
+            if exc is not None:
+                raise exc
+        pass  # void return
+
+    def test_breaker_failure_rate(self):
+        from SnapSearch.error import (
+            SnapSearchError, SnapSearchConnectionError,
+            SnapSearchCircuitOpenError)
+        breaker = self.make_breaker(failure_rate=0.5, window=4, min_calls=4)
+        failure = SnapSearchConnectionError("down")
+        self.dispatch(breaker)
+        self.assertRaises(SnapSearchConnectionError,
+                          self.dispatch, breaker, failure)
+        # errors answered by the backend service are no failures
+        self.assertRaises(SnapSearchError, self.dispatch, breaker,
+                          SnapSearchError("validation_error"))
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        self.assertEqual(breaker.failure_rate, 1 / 3.0)
+        self.assertRaises(SnapSearchConnectionError,
+                          self.dispatch, breaker, failure)
+        self.assertEqual(breaker.state, breaker.OPEN)
+        # skipped at once
+        self.assertRaises(SnapSearchCircuitOpenError, self.dispatch, breaker)
+        self.assertEqual((breaker.trips, breaker.rejections), (1, 1))
+        breaker.reset()
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        self.dispatch(breaker)
+        pass  # void return
+
+    def test_breaker_latency(self):
+        from SnapSearch.error import SnapSearchCircuitOpenError
+        breaker = self.make_breaker(slow_call_duration=5.0, min_calls=3)
+        for i in range(2):
+            self.dispatch(breaker, duration=6.0)
+        self.dispatch(breaker, duration=1.0)
+        # 2 slow dispatches out of 3
+        self.assertEqual(breaker.state, breaker.OPEN)
+        self.assertRaises(SnapSearchCircuitOpenError, self.dispatch, breaker)
+        pass  # void return
+
+    def test_breaker_half_open(self):
+        from SnapSearch.error import (
+            SnapSearchConnectionError, SnapSearchCircuitOpenError)
+        breaker = self.make_breaker(min_calls=1, reset_timeout=30,
+                                    half_open_calls=2)
+        failure = SnapSearchConnectionError("down")
+        self.assertRaises(SnapSearchConnectionError,
+                          self.dispatch, breaker, failure)
+        self.now += 30
+        self.assertEqual(breaker.state, breaker.HALF_OPEN)
+        # a failed probe opens the breaker again
+        self.assertRaises(SnapSearchConnectionError,
+                          self.dispatch, breaker, failure)
+        self.assertEqual(breaker.state, breaker.OPEN)
+        self.now += 30
+        # one probe at a time
+        with breaker.guard():
+            self.assertRaises(SnapSearchCircuitOpenError,
+                              self.dispatch, breaker)
+        self.assertEqual(breaker.state, breaker.HALF_OPEN)
+        self.dispatch(breaker)
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        self.assertEqual(breaker.trips, 2)
+        pass  # void return
+
+    def test_breaker_interrupted(self):
+        breaker = self.make_breaker(min_calls=1)
+        # other exceptions neither count, nor keep the probe in flight
+        self.assertRaises(KeyError, self.dispatch, breaker, KeyError())
+        self.assertEqual(breaker.failure_rate, 0.0)
+        pass  # void return
+
+    pass
+
+
+class TestCircuitBreakerClient(unittest.TestCase):
+    """
+    Tests ``Client`` and ``InterceptorMiddleware`` with a ``CircuitBreaker``
+    against a slow local stand-in for SnapSearch backend service.
+    """
+
+    ROBOT_REQUEST = {
+        'HTTP_USER_AGENT': "AdsBot-Google",
+        'SERVER_NAME': "localhost",
+        'SERVER_PORT': "80",
+        'REQUEST_METHOD': "GET",
+        'PATH_INFO': "/",
+        'wsgi.url_scheme': "http", }
+
+    def setUp(self):
+        self.backend = _config.StandInBackend(delay=0.2).__enter__()
+        pass  # void return
+
+    def tearDown(self):
+        self.backend.__exit__()
+        pass  # void return
+
+    def make_client(self, **kwds):
+        from SnapSearch import Client
+        from SnapSearch.breaker import CircuitBreaker
+        return Client("fantasy@email.com", "fantasy_Api_Key", {'test': 1},
+                      api_url=self.backend.url, ca_path=self.backend.ca_path,
+                      breaker=CircuitBreaker(**kwds))
+
+    def test_breaker_client(self):
+        from SnapSearch.error import SnapSearchCircuitOpenError
+        with self.make_client(slow_call_duration=0.1, min_calls=2,
+                              reset_timeout=0.3) as client:
+            for i in range(2):
+                client("http://localhost/%d" % i)
+            self.assertEqual(client.breaker.state, client.breaker.OPEN)
+            start = time.time()
+            self.assertRaises(SnapSearchCircuitOpenError,
+                              client, "http://localhost/")
+            self.assertTrue(time.time() - start < 0.1)
+            self.assertEqual(len(self.backend.payloads), 2)
+            # probed again after ``reset_timeout``
+            time.sleep(0.3)
+            self.backend.delay = 0
+            client("http://localhost/")
+            self.assertEqual(client.breaker.state, client.breaker.CLOSED)
+        pass  # void return
+
+    def test_breaker_middleware(self):
+        from SnapSearch import Detector, Interceptor
+        from SnapSearch.wsgi import InterceptorMiddleware
+
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/html")])
+            return [b"from the application"]
+
+        client = self.make_client(slow_call_duration=0.1, min_calls=1)
+        im = InterceptorMiddleware(app, Interceptor(client, Detector()))
+        im(dict(self.ROBOT_REQUEST), lambda status, headers: None)
+        # falls back to the application without waiting for the backend
+        start = time.time()
+        body = im(dict(self.ROBOT_REQUEST), lambda status, headers: None)
+        self.assertTrue(time.time() - start < self.backend.delay)
+        self.assertEqual(b"".join(body), b"from the application")
+        self.assertEqual(len(self.backend.payloads), 1)
+        client.close()
+        pass  # void return
+
+    pass
+
+
+def test_suite():
+    return unittest.TestSuite([
+        unittest.TestLoader().loadTestsFromTestCase(eval(c)) for c in __all__])
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -0,0 +1,359 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.tests.test_cache
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Tests SnapSearch.cache
+
+    :author: `LIU Yu <liuyu@opencps.net>`_
+    :date: 2014/03/08
+"""
+
+__all__ = ['TestSnapshotCache',
+           'TestSnapshotCacheInterceptor', ]
+
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+try:
+    from . import _config
+    from ._config import unittest
+except (ValueError, ImportError):
+    import _config
+    from _config import unittest
+
+
+CONTENT = {'status': 200,
+           'headers': [{'name': "Server", 'value': "stand-in"}, ],
+           'html': "<html><body>snapshot</body></html>", }
+
+
+class TestSnapshotCache(unittest.TestCase):
+    """
+    Tests ``SnapshotCache`` and its storage objects.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        pass  # void return
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        pass  # void return
+
+    def make_cache(self, **kwds):
+        from SnapSearch.cache import SnapshotCache
+
+        class FakeClockCache(SnapshotCache):
+            __slots__ = []
+            _clock = staticmethod(lambda: self.now)
+
+        self.now = 1000.0
+        return FakeClockCache(**kwds)
+
+    def test_cache_key(self):
+        from SnapSearch.cache import SnapshotCache
+        make_key = SnapshotCache.make_key
+        key = make_key("http://localhost/", {'test': 1, 'width': 1024})
+        self.assertEqual(len(key), 40)
+        # the ``url`` field and the order of parameters are irrelevant
+        self.assertEqual(key, make_key(
+            "http://localhost/", {'width': 1024, 'url': "x", 'test': 1}))
+        self.assertNotEqual(key, make_key("http://localhost/", {'test': 1}))
+        self.assertNotEqual(key, make_key(
+            "http://localhost/?a=1", {'test': 1, 'width': 1024}))
+        pass  # void return
+
+    def test_cache_ttl(self):
+        cache = self.make_cache(ttl=60)
+        cache.set("k", CONTENT)
+        self.now += 59
+        self.assertEqual(cache.get("k"), CONTENT)
+        self.now += 1
+        self.assertEqual(cache.get("k"), None)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual((len(cache), cache.size), (0, 0))
+        pass  # void return
+
+    def test_cache_max_bytes(self):
+        cache = self.make_cache()
+        cache.set("probe", CONTENT)
+        entry_size = cache.size
+        # room for exactly two entries
+        cache = self.make_cache(max_bytes=2 * entry_size)
+        cache.set("a", CONTENT)
+        cache.set("b", CONTENT)
+        cache.get("a")  # "b" becomes the least recently used entry
+        cache.set("c", CONTENT)
+        self.assertEqual(cache.get("b"), None)
+        self.assertEqual(cache.get("a"), CONTENT)
+        self.assertEqual(cache.get("c"), CONTENT)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.size, 2 * entry_size)
+        self.assertEqual(sorted(cache.storage.keys()), ["a", "c"])
+        # larger than the whole cache
+        cache.set("d", dict(CONTENT, html="x" * (2 * entry_size)))
+        self.assertEqual(cache.get("d"), None)
+        self.assertEqual(len(cache), 2)
+        pass  # void return
+
+    def test_cache_disk_storage(self):
+        from SnapSearch.cache import DiskStorage
+        cache = self.make_cache(storage=DiskStorage(self.directory))
+        cache.set("a", CONTENT)
+        cache.set("b", CONTENT)
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ["a.snapshot", "b.snapshot"])
+        # entries are adopted by a new cache on the same directory
+        other = self.make_cache(storage=DiskStorage(self.directory))
+        self.assertEqual(len(other), 2)
+        self.assertEqual(other.size, cache.size)
+        self.assertEqual(other.get("a"), CONTENT)
+        other.delete("a")
+        self.assertEqual(cache.get("a"), None)
+        other.clear()
+        self.assertEqual(os.listdir(self.directory), [])
+        pass  # void return
+
+    def test_cache_disk_storage_mmap(self):
+        from SnapSearch.cache import DiskStorage
+        storage = DiskStorage(self.directory)
+        storage.set("k", b"first")
+        blob = storage.get("k")
+        # the map keeps its content even if the file is replaced meanwhile
+        storage.set("k", b"second")
+        self.assertEqual(blob[:], b"first")
+        blob.close()
+        blob = storage.get("k")
+        self.assertEqual(blob[:], b"second")
+        blob.close()
+        storage.set("k", b"")
+        self.assertEqual(storage.get("k"), b"")
+        storage.delete("k")
+        self.assertEqual(storage.get("k"), None)
+        # no temporary files left behind
+        self.assertEqual(os.listdir(self.directory), [])
+        pass  # void return
+
+    def test_cache_disk_storage_mode(self):
+        import stat
+        from SnapSearch.cache import DiskStorage
+        storage = DiskStorage(self.directory)
+        storage.set("k", b"snapshot")
+        # not the ``0o600`` of temporary files
+        mode = stat.S_IMODE(os.stat(storage._path("k")).st_mode)
+        self.assertEqual((storage.mode, mode), (0o644, 0o644))
+        storage = DiskStorage(self.directory, mode=0o640)
+        storage.set("k", b"snapshot")
+        mode = stat.S_IMODE(os.stat(storage._path("k")).st_mode)
+        self.assertEqual(mode, 0o640)
+        pass  # void return
+
+    def test_cache_disk_storage_shared(self):
+        from SnapSearch.cache import DiskStorage
+        # e.g. two worker processes on the same directory
+        cache = self.make_cache(storage=DiskStorage(self.directory))
+        other = self.make_cache(storage=DiskStorage(self.directory))
+        cache.set("a", CONTENT)
+        self.assertEqual(other.get("a"), CONTENT)
+        other.set("b", CONTENT)
+        self.assertEqual(len(cache), 1)
+        # entries of the other cache are adopted on the next scan
+        self.now += cache.SCAN_INTERVAL
+        cache.set("c", CONTENT)
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.size, 3 * other.size // 2)
+        other.delete("a")
+        self.now += cache.SCAN_INTERVAL
+        cache.set("c", CONTENT)
+        self.assertEqual(len(cache), 2)
+        pass  # void return
+
+    def test_cache_stale(self):
+        cache = self.make_cache(ttl=60, hard_ttl=600)
+        cache.set("k", CONTENT)
+        self.assertEqual(cache.lookup("k"), (CONTENT, False))
+        self.now += 60
+        self.assertEqual(cache.lookup("k"), (CONTENT, True))
+        # stale entries are not live for ``get()``
+        self.assertEqual(cache.get("k"), None)
+        self.now += 540
+        self.assertEqual(cache.lookup("k"), (None, False))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual((cache.hits, cache.stale_hits, cache.misses),
+                         (1, 2, 1))
+        pass  # void return
+
+    def test_cache_revalidate(self):
+        cache = self.make_cache(max_refreshes=1)
+        release = threading.Event()
+
+        def render():
+            release.wait(5)
+            return CONTENT
+
+        self.assertTrue(cache.revalidate("a", render))
+        # in progress, or at capacity
+        self.assertFalse(cache.revalidate("a", render))
+        self.assertFalse(cache.revalidate("b", render))
+        release.set()
+        for i in range(100):
+            if cache.get("a"):
+                break
+            time.sleep(0.01)
+        self.assertEqual(cache.get("a"), CONTENT)
+        time.sleep(0.05)
+        self.assertTrue(cache.revalidate("b", lambda: None))
+        self.assertEqual(cache.refreshes, 2)
+        pass  # void return
+
+    def test_cache_set_unlocked(self):
+        from SnapSearch.cache import MemoryStorage
+        writing, release = threading.Event(), threading.Event()
+
+        class SlowStorage(MemoryStorage):
+            __slots__ = []
+
+            def set(self, key, blob):
+                if key == "slow":
+                    writing.set()
+                    release.wait(5)
+                MemoryStorage.set(self, key, blob)
+                pass  # void return
+
+            pass
+
+        cache = self.make_cache(storage=SlowStorage())
+        cache.set("a", CONTENT)
+        thread = threading.Thread(target=cache.set, args=("slow", CONTENT))
+        thread.start()
+        try:
+            writing.wait(5)
+            # not blocked by the write in progress
+            start = time.time()
+            self.assertEqual(cache.get("a"), CONTENT)
+            self.assertTrue(time.time() - start < 1)
+        finally:
+            release.set()
+            thread.join(5)
+        self.assertEqual(cache.get("slow"), CONTENT)
+        self.assertEqual(len(cache), 2)
+        pass  # void return
+
+    def test_cache_corrupted_entry(self):
+        cache = self.make_cache()
+        cache.storage.set("k", b"{not json")
+        self.assertEqual(cache.get("k"), None)
+        self.assertEqual(cache.storage.get("k"), None)
+        pass  # void return
+
+    pass
+
+
+class TestSnapshotCacheInterceptor(unittest.TestCase):
+    """
+    Tests ``Interceptor`` with a ``SnapshotCache`` against a local stand-in
+    for SnapSearch backend service.
+    """
+
+    ROBOT_REQUEST = {
+        'HTTP_USER_AGENT': "Googlebot/2.1 (+http://www.google.com/bot.html)",
+        'SERVER_NAME': "localhost",
+        'SERVER_PORT': "80",
+        'REQUEST_METHOD': "GET",
+        'PATH_INFO': "/",
+        'wsgi.url_scheme': "http", }
+
+    def setUp(self):
+        self.backend = _config.StandInBackend().__enter__()
+        pass  # void return
+
+    def tearDown(self):
+        self.backend.__exit__()
+        pass  # void return
+
+    def make_interceptor(self, cache, request_parameters={'test': 1}):
+        from SnapSearch import Client, Detector, Interceptor
+        client = Client("fantasy@email.com", "fantasy_Api_Key",
+                        request_parameters, api_url=self.backend.url,
+                        ca_path=self.backend.ca_path)
+        return Interceptor(client, Detector(), cache=cache)
+
+    def test_interceptor_cache(self):
+        from SnapSearch.cache import SnapshotCache
+        cache = SnapshotCache()
+        interceptor = self.make_interceptor(cache)
+        self.assertEqual(interceptor.cache, cache)
+        first = interceptor(dict(self.ROBOT_REQUEST))
+        second = interceptor(dict(self.ROBOT_REQUEST))
+        interceptor.client.close()
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.backend.payloads), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        pass  # void return
+
+    def test_interceptor_cache_request_parameters(self):
+        from SnapSearch.cache import SnapshotCache
+        cache = SnapshotCache()
+        for params in ({'test': 1}, {'test': 1, 'width': 800}):
+            interceptor = self.make_interceptor(cache, params)
+            interceptor(dict(self.ROBOT_REQUEST))
+            interceptor.client.close()
+        # rendered with different parameters, cached apart
+        self.assertEqual(len(self.backend.payloads), 2)
+        self.assertEqual(len(cache), 2)
+        pass  # void return
+
+    def test_interceptor_stale_while_revalidate(self):
+        from SnapSearch.cache import SnapshotCache
+        clock = [1000.0]
+
+        class FakeClockCache(SnapshotCache):
+            __slots__ = []
+            _clock = staticmethod(lambda: clock[0])
+
+        cache = FakeClockCache(ttl=60, hard_ttl=3600)
+        interceptor = self.make_interceptor(cache)
+        first = interceptor(dict(self.ROBOT_REQUEST))
+        self.backend.delay = 0.5
+        clock[0] += 120
+        # the stale snapshot is served without waiting for the backend
+        start = time.time()
+        second = interceptor(dict(self.ROBOT_REQUEST))
+        self.assertTrue(time.time() - start < self.backend.delay)
+        self.assertEqual(second, first)
+        self.assertEqual((cache.stale_hits, cache.refreshes), (1, 1))
+        # ... while being refreshed in the background
+        key = cache.make_key("http://localhost/", {'test': 1})
+        for i in range(200):
+            if cache.lookup(key)[1] is False:
+                break
+            time.sleep(0.01)
+        interceptor.client.close()
+        self.assertEqual(len(self.backend.payloads), 2)
+        self.assertEqual(cache.lookup(key), (first, False))
+        pass  # void return
+
+    def test_interceptor_no_cache(self):
+        interceptor = self.make_interceptor(None)
+        interceptor(dict(self.ROBOT_REQUEST))
+        interceptor(dict(self.ROBOT_REQUEST))
+        interceptor.client.close()
+        self.assertEqual(len(self.backend.payloads), 2)
+        pass  # void return
+
+    pass
+
+
+def test_suite():
+    return unittest.TestSuite([
+        unittest.TestLoader().loadTestsFromTestCase(eval(c)) for c in __all__])
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
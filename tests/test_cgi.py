@@ -10,7 +10,8 @@
     :date: 2014/03/10
 """
 
-__all__ = ['TestControllerMethods', ]
+__all__ = ['TestControllerMethods',
+           'TestControllerStandIn', ]
 
 
 import json
@@ -153,6 +154,80 @@ class TestControllerMethods(unittest.TestCase):
     pass
 
 
+class TestControllerStandIn(unittest.TestCase):
+    """
+    Tests ``InterceptorController.start()`` and ``stop()`` against a local
+    stand-in for SnapSearch backend service.
+    """
+
+    ENVIRON = {
+        'HTTP_USER_AGENT': "AdsBot-Google",
+        'SERVER_NAME': "localhost",
+        'SERVER_PORT': "80",
+        'REQUEST_METHOD': "GET",
+        'PATH_INFO': "/",
+        'GATEWAY_INTERFACE': "CGI/1.1",
+        'HTTPS': "off", }
+
+    def setUp(self):
+        import io
+        # text stream of python 3.x over a binary stream
+        self.stdout = io.BytesIO()
+        self.old_stdout, sys.stdout = sys.stdout, io.TextIOWrapper(
+            self.stdout, encoding="utf-8", write_through=True) \
+            if sys.version_info >= (3, ) else self.stdout
+        pass  # void return
+
+    def tearDown(self):
+        sys.stdout = self.old_stdout
+        pass  # void return
+
+    def make_controller(self, backend):
+        from SnapSearch import Client, Detector, Interceptor
+        from SnapSearch.cgi import InterceptorController
+        client = Client("fantasy@email.com", "fantasy_Api_Key", {'test': 1},
+                        api_url=backend.url, ca_path=backend.ca_path)
+        return InterceptorController(Interceptor(client, Detector()))
+
+    def test_controller_intercepted(self):
+        with _config.StandInBackend() as backend:
+            ic = self.make_controller(backend)
+            self.assertTrue(ic.start(dict(self.ENVIRON)))
+            ic.stop(False)
+            ic.interceptor.client.close()
+        self.assertEqual(
+            self.stdout.getvalue(),
+            b"Status: 200 OK\r\nserver: stand-in\r\n\r\n"
+            b"<html><body>http://localhost/</body></html>")
+        pass  # void return
+
+    def test_controller_released(self):
+        with _config.StandInBackend() as backend:
+            ic = self.make_controller(backend)
+            self.assertTrue(ic.start(dict(self.ENVIRON)))
+            sys.stdout.write(b"Hello World!\r\n")
+            ic.stop(True)
+            ic.interceptor.client.close()
+        # buffered data follows the intercepted response
+        self.assertTrue(self.stdout.getvalue().endswith(
+            b"</html>Hello World!\r\n"))
+        pass  # void return
+
+    def test_controller_normal(self):
+        stdout = sys.stdout
+        with _config.StandInBackend() as backend:
+            ic = self.make_controller(backend)
+            environ = dict(self.ENVIRON, HTTP_USER_AGENT="Mozilla")
+            self.assertFalse(ic.start(environ))
+            ic.interceptor.client.close()
+        self.assertTrue(sys.stdout is stdout)
+        self.assertEqual(self.stdout.getvalue(), b"")
+        self.assertEqual(backend.payloads, [])
+        pass  # void return
+
+    pass
+
+
 def test_suite():
     return unittest.TestSuite([
         unittest.TestLoader().loadTestsFromTestCase(eval(c)) for c in __all__])
@@ -11,11 +11,17 @@
 """
 
 __all__ = ['TestClientInit',
-           'TestClientMethods', ]
+           'TestClientMethods',
+           'TestClientCoalesce',
+           'TestClientRenderMany',
+           'TestClientSession',
+           'TestPycurlSession', ]
 
 
 import os
 import sys
+import threading
+import time
 
 try:
     from . import _config
@@ -71,6 +77,48 @@ class TestClientInit(unittest.TestCase):
             {'test': 1}, ca_path=self.NON_EXISTENT_PEM)
         pass  # void return
 
+    def test_client_init_payload_template(self):
+        import json
+        from SnapSearch import Client
+        from SnapSearch._compat import u
+
+        def expected(params, url):
+            params = dict(params)
+            params['url'] = url
+            return json.dumps(params).encode("ascii")
+
+        params = {'test': 1,
+                  'cookies': [{'name': "a\"b", 'value': u("\xe7") + "\\"}],
+                  'url': "placeholder", 'width': 1024}
+        client = Client(self.api_email, self.api_key, params)
+        for url in ("http://localhost/",
+                    u("http://localhost/\xe9?q=\"x\"&\u2028"),
+                    "http://localhost/" + "x" * 4096):
+            payload = client._prepare_dispatch(url)['payload']
+            self.assertEqual(payload, expected(params, url))
+        # the template is rebuilt after the parameters are modified
+        client.request_parameters['width'] = 800
+        params['width'] = 800
+        self.assertEqual(client._prepare_dispatch("http://a/")['payload'],
+                         expected(params, "http://a/"))
+        client.request_parameters.update(test=0)
+        del client.request_parameters['cookies']
+        self.assertEqual(client._prepare_dispatch("http://a/")['payload'],
+                         expected({'test': 0, 'url': "", 'width': 800},
+                                  "http://a/"))
+        client.request_parameters = {'javascript': "x = \"url\";"}
+        self.assertEqual(client._prepare_dispatch("http://a/")['payload'],
+                         expected({'javascript': "x = \"url\";"}, "http://a/"))
+        # nested values of the caller are copied, not shared
+        cookies = [{'name': "a", 'value': "b"}]
+        client.request_parameters = {'cookies': cookies}
+        cookies[0]['value'] = "changed"
+        cookies.append({'name': "c", 'value': "d"})
+        self.assertEqual(client._prepare_dispatch("http://a/")['payload'],
+                         expected({'cookies': [{'name': "a", 'value': "b"}]},
+                                  "http://a/"))
+        pass  # void return
+
     pass
 
 
@@ -160,6 +208,452 @@ class TestClientMethods(unittest.TestCase):
     pass
 
 
+class TestClientSession(unittest.TestCase):
+    """
+    Tests the pooled connections of ``Client`` against a local stand-in for
+    SnapSearch backend service.
+    """
+
+    def setUp(self):
+        self.backend = _config.StandInBackend().__enter__()
+        pass  # void return
+
+    def tearDown(self):
+        self.backend.__exit__()
+        pass  # void return
+
+    def make_client(self, **kwds):
+        from SnapSearch import Client
+        return Client("fantasy@email.com", "fantasy_Api_Key", {'test': 1},
+                      api_url=self.backend.url, ca_path=self.backend.ca_path,
+                      **kwds)
+
+    def test_client_session_reuse(self):
+        with self.make_client() as client:
+            for i in range(20):
+                response = client("http://localhost/%d" % i)
+                self.assertEqual(response['status'], 200)
+        # one TLS handshake for all requests
+        self.assertEqual(len(self.backend.payloads), 20)
+        self.assertEqual(self.backend.connections, 1)
+        pass  # void return
+
+    def test_client_session_concurrent(self):
+        client = self.make_client(pool_size=4)
+
+        def render(n):
+            for i in range(10):
+                client("http://localhost/%d/%d" % (n, i))
+
+        threads = [threading.Thread(target=render, args=(n, ))
+                   for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        client.close()
+        # at most one TLS handshake per pooled connection
+        self.assertEqual(len(self.backend.payloads), 80)
+        self.assertTrue(1 <= self.backend.connections <= 4)
+        pass  # void return
+
+    def test_client_session_thread_safety(self):
+        from SnapSearch import Client
+        request_parameters = {'test': 1}
+        client = Client("fantasy@email.com", "fantasy_Api_Key",
+                        request_parameters, api_url=self.backend.url,
+                        ca_path=self.backend.ca_path, pool_size=8)
+        urls = ["http://localhost/%d" % i for i in range(2000)]
+        mismatches = []
+
+        def render(urls):
+            for url in urls:
+                response = client(url)
+                if response['html'] != "<html><body>%s</body></html>" % url:
+                    mismatches.append(url)
+
+        threads = [threading.Thread(target=render, args=(urls[n::16], ))
+                   for n in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        client.close()
+        # each payload carries the URL of its own call
+        self.assertEqual(mismatches, [])
+        self.assertEqual(sorted(p['url'] for p in self.backend.payloads),
+                         sorted(urls))
+        self.assertTrue(all(p['test'] == 1 for p in self.backend.payloads))
+        # the parameters of the caller are left untouched
+        self.assertEqual(request_parameters, {'test': 1})
+        self.assertEqual(client.request_parameters, {'test': 1})
+        pass  # void return
+
+    def test_client_session_close(self):
+        client = self.make_client()
+        client("http://localhost/")
+        client.close()
+        client("http://localhost/")
+        self.assertEqual(self.backend.connections, 2)
+        pass  # void return
+
+    def test_client_session_no_keep_alive(self):
+        with self.make_client(keep_alive=False) as client:
+            for i in range(3):
+                client("http://localhost/%d" % i)
+        self.assertEqual(self.backend.connections, 3)
+        pass  # void return
+
+    pass
+
+
+class TestClientCoalesce(unittest.TestCase):
+    """
+    Tests the coalescing of concurrent ``Client`` calls for the same URL.
+    """
+
+    def make_client(self, backend, **kwds):
+        from SnapSearch import Client
+        return Client("fantasy@email.com", "fantasy_Api_Key", {'test': 1},
+                      api_url=backend.url, ca_path=backend.ca_path, **kwds)
+
+    def render_concurrently(self, client, urls):
+        results = [None] * len(urls)
+
+        def render(i):
+            try:
+                results[i] = client(urls[i])
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=render, args=(i, ))
+                   for i in range(len(urls))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def test_client_coalesce(self):
+        with _config.StandInBackend(delay=0.2) as backend:
+            with self.make_client(backend) as client:
+                results = self.render_concurrently(
+                    client, ["http://localhost/"] * 8 + ["http://other/"])
+        # one backend render per distinct URL
+        self.assertEqual(len(backend.payloads), 2)
+        self.assertEqual(results[:8], [results[0]] * 8)
+        # each caller gets its own copy of the response
+        self.assertEqual(len(set(id(r) for r in results[:8])), 8)
+        self.assertEqual(
+            len(set(id(r['headers']) for r in results[:8])), 8)
+        self.assertEqual(results[0]['html'],
+                         "<html><body>http://localhost/</body></html>")
+        self.assertEqual(results[8]['html'],
+                         "<html><body>http://other/</body></html>")
+        pass  # void return
+
+    def test_client_coalesce_failure(self):
+        from SnapSearch.error import SnapSearchError
+        responder = lambda payload: {'code': "validation_error"}
+        with _config.StandInBackend(responder, delay=0.2) as backend:
+            with self.make_client(backend) as client:
+                results = self.render_concurrently(
+                    client, ["http://localhost/"] * 4)
+                self.assertEqual(len(backend.payloads), 1)
+                for result in results:
+                    self.assertTrue(isinstance(result, SnapSearchError))
+                # nothing in flight afterwards
+                self.assertRaises(SnapSearchError, client, "http://localhost/")
+                self.assertEqual(len(backend.payloads), 2)
+        pass  # void return
+
+    def test_client_coalesce_timeout(self):
+        from SnapSearch.error import SnapSearchConnectionError
+        with _config.StandInBackend(delay=0.3) as backend:
+            with self.make_client(backend, coalesce_timeout=0.05) as client:
+                results = self.render_concurrently(
+                    client, ["http://localhost/"] * 3)
+        self.assertEqual(len(backend.payloads), 1)
+        self.assertEqual(
+            sorted(isinstance(r, SnapSearchConnectionError) for r in results),
+            [False, True, True])
+        pass  # void return
+
+    def test_client_no_coalesce(self):
+        with _config.StandInBackend(delay=0.1) as backend:
+            with self.make_client(backend, coalesce=False) as client:
+                self.render_concurrently(client, ["http://localhost/"] * 4)
+        self.assertEqual(len(backend.payloads), 4)
+        pass  # void return
+
+    pass
+
+
+class TestClientRenderMany(unittest.TestCase):
+    """
+    Tests ``Client.render_many()`` against a local stand-in for SnapSearch
+    backend service.
+    """
+
+    def setUp(self):
+        self.backend = _config.StandInBackend(delay=0.05).__enter__()
+        pass  # void return
+
+    def tearDown(self):
+        self.backend.__exit__()
+        pass  # void return
+
+    def make_client(self, failures=0, **kwds):
+        from SnapSearch import Client
+        from SnapSearch.error import SnapSearchConnectionError
+        attempts = {}
+        lock = threading.Lock()
+
+        class FlakyClient(Client):
+            # fails the first ``failures`` dispatches of each URL
+            __slots__ = []
+
+            def _dispatch(self, current_url):
+                with lock:
+                    n = attempts[current_url] = \
+                        attempts.get(current_url, 0) + 1
+                if n <= failures:
+                    raise SnapSearchConnectionError("transient")
+                return super(FlakyClient, self)._dispatch(current_url)
+
+        self.attempts = attempts
+        return FlakyClient("fantasy@email.com", "fantasy_Api_Key",
+                           {'test': 1}, api_url=self.backend.url,
+                           ca_path=self.backend.ca_path, **kwds)
+
+    def test_client_render_many(self):
+        urls = ["http://localhost/%d" % i for i in range(40)]
+        progress = []
+        start = time.time()
+        with self.make_client(pool_size=8) as client:
+            results = list(client.render_many(
+                iter(urls), concurrency=8, progress=progress.append))
+        # rendered concurrently, each URL once
+        self.assertTrue(time.time() - start < 40 * self.backend.delay * 0.75)
+        self.assertEqual(sorted(url for url, result in results),
+                         sorted(urls))
+        for url, result in results:
+            self.assertEqual(result['html'],
+                             "<html><body>%s</body></html>" % url)
+        self.assertEqual(len(self.backend.payloads), 40)
+        self.assertEqual(len(progress), 40)
+        stats = progress[-1]
+        self.assertEqual((stats.rendered, stats.failed, stats.retries),
+                         (40, 0, 0))
+        self.assertTrue(stats.throughput > 0)
+        pass  # void return
+
+    def test_client_render_many_retries(self):
+        from SnapSearch.error import SnapSearchConnectionError
+        progress = []
+        urls = ["http://localhost/%d" % i for i in range(5)]
+        with self.make_client(failures=2) as client:
+            results = dict(client.render_many(
+                urls, retries=2, backoff=0.01, progress=progress.append))
+        self.assertEqual(sorted(results), urls)
+        self.assertTrue(all(r['status'] == 200 for r in results.values()))
+        self.assertEqual(progress[-1].retries, 10)
+        # retries exhausted
+        with self.make_client(failures=2) as client:
+            results = list(client.render_many(
+                urls[:1], retries=1, backoff=0.01, progress=progress.append))
+        self.assertTrue(isinstance(results[0][1], SnapSearchConnectionError))
+        self.assertEqual(self.attempts, {urls[0]: 2})
+        self.assertEqual((progress[-1].rendered, progress[-1].failed),
+                         (0, 1))
+        pass  # void return
+
+    def test_client_render_many_errors(self):
+        from SnapSearch.error import SnapSearchError
+
+        def urls():
+            yield "http://localhost/"
+            raise ValueError("broken sitemap")
+
+        # errors of the backend are results, not retried
+        self.backend.responder = lambda payload: {'code': "validation_error"}
+        with self.make_client() as client:
+            results = list(client.render_many(["http://localhost/"]))
+            self.assertTrue(isinstance(results[0][1], SnapSearchError))
+            self.assertEqual(len(self.backend.payloads), 1)
+            # errors of ``urls`` propagate
+            self.assertRaises(ValueError, list,
+                              client.render_many(urls(), concurrency=1))
+        pass  # void return
+
+    def test_client_render_many_close(self):
+        urls = ("http://localhost/%d" % i for i in range(1000))
+        with self.make_client(pool_size=4) as client:
+            results = client.render_many(urls, concurrency=4)
+            next(results)
+            results.close()
+        # stopped after the dispatches in flight
+        self.assertTrue(len(self.backend.payloads) < 20)
+        pass  # void return
+
+    pass
+
+
+class TestPycurlSession(unittest.TestCase):
+    """
+    Tests the pooled ``Curl`` handles of the ``pycurl`` backend against a
+    local stand-in for SnapSearch backend service.
+    """
+
+    def setUp(self):
+        try:
+            import pycurl
+        except ImportError:
+            self.skipTest("requires ``pycurl``")
+        self.backend = _config.StandInBackend(delay=0.1).__enter__()
+        pass  # void return
+
+    def tearDown(self):
+        self.backend.__exit__()
+        pass  # void return
+
+    def make_session(self, **kwds):
+        from SnapSearch.api.backend import _SessionViaPycurl
+        return _SessionViaPycurl(**kwds)
+
+    def make_request(self, url, api_url=None):
+        import json
+        return dict(email="fantasy@email.com", key="fantasy_Api_Key",
+                    payload=json.dumps({'url': url}),
+                    url=api_url or self.backend.url,
+                    ca_path=self.backend.ca_path)
+
+    def test_pycurl_session_reuse(self):
+        session = self.make_session()
+        for i in range(5):
+            request = self.make_request("http://localhost/%d" % i)
+            r = session.dispatch(**request)
+            self.assertEqual(r.status, 200)
+            self.assertEqual(r.body['content']['status'], 200)
+        session.close()
+        # one TLS handshake for all requests
+        self.assertEqual(self.backend.connections, 1)
+        pass  # void return
+
+    def test_pycurl_session_no_keep_alive(self):
+        session = self.make_session(keep_alive=False)
+        for i in range(3):
+            session.dispatch(**self.make_request("http://localhost/%d" % i))
+        session.close()
+        self.assertEqual(self.backend.connections, 3)
+        pass  # void return
+
+    def test_pycurl_session_settings(self):
+        import SnapSearch.api as api
+        from SnapSearch.error import SnapSearchConnectionError
+        session = self.make_session(pool_size=1)
+        session.dispatch(**self.make_request("http://localhost/"))
+        # not kept by the pooled handle from its first request
+        request = self.make_request("http://localhost/")
+        request['ca_path'] = self.backend.ca_path + ".missing"
+        self.assertRaises(SnapSearchConnectionError,
+                          session.dispatch, **request)
+        timeout = api.SNAPSEARCH_API_TIMEOUT
+        api.SNAPSEARCH_API_TIMEOUT = 1
+        self.backend.delay = 1.5
+        try:
+            self.assertRaises(SnapSearchConnectionError, session.dispatch,
+                              **self.make_request("http://localhost/"))
+        finally:
+            api.SNAPSEARCH_API_TIMEOUT = timeout
+            self.backend.delay = 0.1
+        session.close()
+        pass  # void return
+
+    def test_pycurl_session_dispatch_many(self):
+        session = self.make_session(pool_size=4)
+        urls = ["http://localhost/%d" % i for i in range(12)]
+        start = time.time()
+        results = session.dispatch_many([self.make_request(u) for u in urls])
+        elapsed = time.time() - start
+        # in order of the batch
+        self.assertEqual(
+            [r.body['content']['html'] for r in results],
+            ["<html><body>%s</body></html>" % u for u in urls])
+        # concurrent transfers over at most ``pool_size`` connections
+        self.assertTrue(elapsed < 12 * self.backend.delay)
+        self.assertTrue(1 <= self.backend.connections <= 4)
+        # which are kept for the next batch
+        connections = self.backend.connections
+        session.dispatch_many([self.make_request(u) for u in urls])
+        session.close()
+        self.assertEqual(self.backend.connections, connections)
+        pass  # void return
+
+    def test_pycurl_session_dispatch_many_failure(self):
+        from SnapSearch.error import SnapSearchConnectionError
+        session = self.make_session(pool_size=2)
+        batch = [self.make_request("http://localhost/0"),
+                 self.make_request("http://localhost/1",
+                                   api_url="https://127.0.0.1:1/api/v1/robot"),
+                 self.make_request("http://localhost/2"), ]
+        results = session.dispatch_many(batch)
+        session.close()
+        self.assertEqual(results[0].status, 200)
+        self.assertTrue(isinstance(results[1], SnapSearchConnectionError))
+        self.assertEqual(results[2].status, 200)
+        pass  # void return
+
+    def test_pycurl_client_render_many(self):
+        from SnapSearch import Client
+        from SnapSearch.error import SnapSearchConnectionError
+        urls = ["http://localhost/%d" % i for i in range(20)]
+
+        class BatchClient(Client):
+            # all requests go through ``dispatch_many()`` of the session
+            __slots__ = []
+
+            def _dispatch(self, current_url):
+                raise AssertionError("dispatched one by one")
+
+        with BatchClient("fantasy@email.com", "fantasy_Api_Key", {'test': 1},
+                         api_url=self.backend.url,
+                         ca_path=self.backend.ca_path, pool_size=4,
+                         http_library="pycurl") as client:
+            start = time.time()
+            results = dict(client.render_many(iter(urls), concurrency=4))
+            elapsed = time.time() - start
+        self.assertEqual(sorted(results), sorted(urls))
+        for url, result in results.items():
+            self.assertEqual(result['html'],
+                             "<html><body>%s</body></html>" % url)
+        # batches of concurrent transfers
+        self.assertTrue(elapsed < 20 * self.backend.delay * 0.75)
+        self.assertTrue(1 <= self.backend.connections <= 4)
+        # connection failures are retried
+        progress = []
+        with Client("fantasy@email.com", "fantasy_Api_Key",
+                    api_url="https://127.0.0.1:1/api/v1/robot",
+                    ca_path=self.backend.ca_path,
+                    http_library="pycurl") as client:
+            results = list(client.render_many(
+                urls[:3], retries=2, backoff=0.01, progress=progress.append))
+        self.assertTrue(all(isinstance(result, SnapSearchConnectionError)
+                            for url, result in results))
+        self.assertEqual((progress[-1].failed, progress[-1].retries), (3, 6))
+        pass  # void return
+
+    def test_pycurl_client_http_library(self):
+        from SnapSearch import Client
+        from SnapSearch.error import SnapSearchDependencyError
+        self.assertRaises(SnapSearchDependencyError, Client,
+                          "fantasy@email.com", "fantasy_Api_Key",
+                          http_library="urllib")
+        pass  # void return
+
+    pass
+
+
 def test_suite():
     return unittest.TestSuite([
         unittest.TestLoader().loadTestsFromTestCase(eval(c)) for c in __all__])
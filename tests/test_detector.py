@@ -13,12 +13,16 @@
 # future import should come first
 from __future__ import with_statement
 
-__all__ = ['TestDetectorInit',
+__all__ = ['TestDetectorFileExtension',
+           'TestDetectorInit',
+           'TestDetectorMatchers',
            'TestDetectorMethods',
            'TestDetectorProperties', ]
 
 
 import os
+import random
+import re
 import sys
 
 try:
@@ -91,6 +95,106 @@ class TestDetectorInit(unittest.TestCase):
     pass
 
 
+class TestDetectorMatchers(unittest.TestCase):
+    """
+    Tests user agent matching engines of ``SnapSearch.detector``.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.ROBOTS = json.loads(_config.DATA_ROBOTS_JSON)
+        cls.ADSBOT_GOOG_GET = json.loads(_config.DATA_ADSBOT_GOOG_GET)
+        cls.FIREFOX_REQUEST = json.loads(_config.DATA_FIREFOX_REQUEST)
+        cls.USER_AGENTS = [
+            "", "a", "bot", "Testbot", "testBOT/1.0", "xxTestbo", "AdsBot",
+            "adsbot-google", "Mozilla/5.0 (compatible; Googlebot/2.1)",
+            "Mozilla/5.0 (Windows NT 6.1; WOW64; rv:27.0) Firefox/27.0", ]
+        pass  # void return
+
+    def test_matchers_equivalence(self):
+        from SnapSearch._compat import u
+        from SnapSearch.detector import AhoCorasickMatcher, RegexMatcher
+        # long s, final sigma, capital sigma, dotted capital I, Kelvin sign
+        special = [u("\u017f"), u("\u03c2"), u("\u03a3"), u("\u0130"),
+                   u("\u212a")]
+        for tokens in ([], [""], ["a"], ["aab", "ab", "b"], ["he", "she",
+                       "his", "hers"], self.ROBOTS['match'],
+                       ["s", "in", "k"], special, ["bot"] + special, ):
+            ac, rx = AhoCorasickMatcher(tokens), RegexMatcher(tokens)
+            for ua in self.USER_AGENTS + ["ahishers", "ushe", "aaab", "s",
+                                          "i", "in", "K"] + special + [
+                    u("\u0130n"), u("\u03c3"), u("Bot\u017f")]:
+                self.assertEqual(ac(ua), rx(ua), (tokens, ua))
+        pass  # void return
+
+    def test_route_matcher(self):
+        from SnapSearch.detector import RouteMatcher
+        matcher = RouteMatcher(["^/other", "^/(?P<x>ab)+$", ])
+        self.assertTrue(matcher("/OTHER/path"))
+        self.assertEqual(matcher.match("/OTHER/path"), "^/other")
+        self.assertEqual(matcher.match("/abab"), "^/(?P<x>ab)+$")
+        self.assertFalse(matcher("/x"))
+        self.assertEqual(matcher.match("/x"), None)
+        self.assertTrue(RouteMatcher([""])("/x"))
+        # routes with numbered back-references are matched one by one
+        matcher = RouteMatcher(["^/(a)\\1$", "^/(b)(?(1)c|d)$", ])
+        self.assertEqual(matcher.match("/aa"), "^/(a)\\1$")
+        self.assertEqual(matcher.match("/bc"), "^/(b)(?(1)c|d)$")
+        self.assertFalse(matcher("/ab"))
+        self.assertFalse(RouteMatcher([]))
+        pass  # void return
+
+    def test_detector_matcher_regex(self):
+        from SnapSearch import Detector
+        from SnapSearch.detector import RegexMatcher
+        detector = Detector(matcher=RegexMatcher)
+        self.assertTrue(detector(self.ADSBOT_GOOG_GET))
+        self.assertFalse(detector(self.FIREFOX_REQUEST))
+        pass  # void return
+
+    pass
+
+
+class TestDetectorFileExtension(unittest.TestCase):
+    """
+    Tests the file extension scanner of ``SnapSearch.detector`` against the
+    regular expression it replaces.
+    """
+
+    REGEX = re.compile(r"^(?:(?![?#].*/[^/?#]+\.[^/?#]+).)*"
+                       r"/[^/?#]+\.([^/?#]+)", re.U)
+
+    def assertSameExtension(self, path):
+        from SnapSearch.detector import _file_extension
+        matches = self.REGEX.match(path)
+        self.assertEqual(_file_extension(path),
+                         matches.group(1) if matches else None, repr(path))
+        pass  # void return
+
+    def test_file_extension_examples(self):
+        from SnapSearch.detector import _file_extension
+        self.assertEqual(_file_extension("/a/b.html?c=d.e"), "html")
+        self.assertEqual(_file_extension("/a.b/c.tar.gz#x"), "gz")
+        self.assertEqual(_file_extension("/a?/c.d"), None)
+        self.assertEqual(_file_extension("/a.b./c"), "b.")
+        self.assertEqual(_file_extension("/.htaccess"), None)
+        for path in ("", "/", "/a.html?", "/a.b?\n/c.d", "/a\n.b/c.d?/e.f",
+                     "?/a.b", "/a?b/c.d", "/a.b?c/d", "/a/b.c\nd/e.f"):
+            self.assertSameExtension(path)
+        pass  # void return
+
+    def test_file_extension_equivalence(self):
+        # property: for random paths over the characters significant to the
+        # regular expression, both agree on the extension (or its absence).
+        rng = random.Random(20140308)
+        for i in range(20000):
+            self.assertSameExtension("".join(
+                rng.choice("/?#.ab\n") for j in range(rng.randint(0, 16))))
+        pass  # void return
+
+    pass
+
+
 class TestDetectorMethods(unittest.TestCase):
     """
     Test ``Detector.__call__()`` with different requests.
@@ -203,6 +307,74 @@ class TestDetectorMethods(unittest.TestCase):
         self.assertTrue(detector(request))  # should be intercepted
         pass  # void return
 
+    def test_detector_call_fast_path(self):
+        from SnapSearch import Detector, error
+        requests = [self.FIREFOX_REQUEST, self.SAFARI_REQUEST,
+                    self.ADSBOT_GOOG_GET, self.ADSBOT_GOOG_HTML,
+                    self.ADSBOT_GOOG_MP3, self.ADSBOT_GOOG_POST,
+                    self.SNAPSEARCH_GET, self.GOOGBOT_IGNORED,
+                    self.MSNBOT_MATCHED, self.ESCAPE_FRAG_NULL,
+                    self.ESCAPE_FRAG_VARS,
+                    dict(self.FIREFOX_REQUEST,
+                         QUERY_STRING="%5Fescaped_fragment_=/path"), ]
+        for kwds in ({}, {'check_file_extensions': True},
+                     {'ignored_routes': ["^/ignored"]},
+                     {'matched_routes': ["^/matched"]}, ):
+            fast = Detector(fast_path=True, **kwds)
+            slow = Detector(fast_path=False, **kwds)
+            for request in requests:
+                self.assertEqual(fast(dict(request)), slow(dict(request)))
+        # invalid ``extensions`` still raises an error for non-robots
+        detector = Detector(check_file_extensions=True)
+        detector.extensions['generic'] = None
+        self.assertRaises(error.SnapSearchError, detector,
+                          dict(self.FIREFOX_REQUEST))
+        pass  # void return
+
+    def test_detector_call_read_only_environ(self):
+        from SnapSearch import Detector
+        from SnapSearch.api import AnyEnv, LazyEnv
+        detector = Detector()
+        for request in (self.FIREFOX_REQUEST, self.ADSBOT_GOOG_GET,
+                        self.ESCAPE_FRAG_VARS, ):
+            # the request is left untouched
+            environ = dict(request)
+            detector(environ)
+            self.assertEqual(environ, request)
+            # yet the view sees the same as ``AnyEnv``
+            lazy, env = LazyEnv(dict(request)), AnyEnv(dict(request))
+            for name in ("scheme", "method", "user_agent", "path_qs", "url",
+                         "GET", ):
+                self.assertEqual(getattr(lazy, name), getattr(env, name))
+        pass  # void return
+
+    def test_detector_call_url_components(self):
+        # compares the url and path of ``LazyEnv`` with their reconstruction
+        # by separate ``wsgiref.util.request_uri()`` calls.
+        import wsgiref.util
+        from SnapSearch._compat import url_split, url_unquote
+        from SnapSearch.api import LazyEnv
+        for request in (self.FIREFOX_REQUEST, self.ADSBOT_GOOG_GET,
+                        self.ESCAPE_FRAG_NULL, self.ESCAPE_FRAG_VARS, ):
+            for extra in ({}, {'QUERY_STRING': "a=%20b#c"},
+                          {'PATH_INFO': "/x y/%7E?", 'QUERY_STRING': "q"},
+                          {'SCRIPT_NAME': "", 'HTTP_HOST': ""}, ):
+                environ = dict(request, **extra)
+                environ.setdefault('wsgi.url_scheme', "http")
+                env = LazyEnv(environ)
+                if env.has_escaped_fragment:
+                    continue
+                url = wsgiref.util.request_uri(environ, True)
+                parts = url_split(url)
+                self.assertEqual(env.url, url)
+                self.assertEqual(env.path_qs, url_unquote(
+                    "?".join([parts.path, parts.query])))
+                self.assertEqual(env._get_decoded_path(False),
+                                 url_unquote(parts.path))
+                self.assertEqual(env._get_encoded_url(False),
+                                 wsgiref.util.request_uri(environ, False))
+        pass  # void return
+
     def test_detector_call_return_escape_frag_null(self):
         from SnapSearch import Detector
         detector = Detector()
@@ -243,6 +415,92 @@ class TestDetectorProperties(unittest.TestCase):
         self.assertRaises(error.SnapSearchError, detector, request)
         pass  # void return
 
+    def test_detector_prop_robots_matchers(self):
+        from SnapSearch import Detector
+        detector = Detector()
+        request = self.ADSBOT_GOOG_GET
+        # compiled matchers are reused as long as ``robots`` is unchanged
+        matchers = detector._get_robots_matchers()
+        self.assertTrue(detector(request))
+        self.assertTrue(matchers is detector._get_robots_matchers())
+        # in-place mutations of the lists trigger recompilation
+        detector.robots['match'].remove("Adsbot-Google")
+        self.assertFalse(matchers is detector._get_robots_matchers())
+        self.assertFalse(detector(request))
+        detector.robots['match'][0:0] = ["AdsBot-Google", ]
+        self.assertTrue(detector(request))
+        del detector.robots['match'][0]
+        self.assertFalse(detector(request))
+        # so do mutations of ``robots`` itself
+        detector.robots.update(match=["adsbot"])
+        self.assertTrue(detector(request))
+        detector.robots['match'] = ["Testbot"]
+        self.assertFalse(detector(request))
+        detector.robots.pop('match')
+        detector.robots.setdefault('match', []).append("adsbot-google")
+        self.assertTrue(detector(request))
+        pass  # void return
+
+    def test_detector_prop_verdict_cache(self):
+        from SnapSearch import Detector
+        detector = Detector(verdict_cache_size=1)
+        cache = detector.verdict_cache
+        request = self.ADSBOT_GOOG_GET
+        self.assertTrue(detector(request))
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        self.assertTrue(detector(request))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        # another user agent evicts the least recently used verdict
+        request = dict(request, HTTP_USER_AGENT="Mozilla")
+        self.assertFalse(detector(request))
+        self.assertEqual((len(cache), cache.evictions), (1, 1))
+        # altering ``robots`` invalidates memoized verdicts
+        detector.robots['match'].append("mozilla")
+        self.assertTrue(detector(request))
+        self.assertEqual(cache.hits, 1)
+        pass  # void return
+
+    def test_detector_prop_verdict_cache_ttl(self):
+        from SnapSearch.detector import LRUCache
+        cache = LRUCache(2, ttl=0)
+        cache.set("a", 1)
+        self.assertEqual(cache.get("a"), None)
+        cache = LRUCache(0)
+        cache.set("a", 1)
+        self.assertEqual((len(cache), cache.get("a", 2)), (0, 2))
+        pass  # void return
+
+    def test_detector_prop_ordered_dict(self):
+        from SnapSearch._compat import _OrderedDict
+        # the fallback of python 2.6 behaves as ``collections.OrderedDict``
+        rng = random.Random(0)
+        expected, actual = [], _OrderedDict()
+        for i in range(2000):
+            key, op = rng.randrange(20), rng.randrange(4)
+            if op == 0:
+                if key not in actual:
+                    expected.append(key)
+                actual[key] = i
+            elif op == 1:
+                if key in expected:
+                    expected.remove(key)
+                actual.pop(key, None)
+            elif op == 2 and expected:
+                last = bool(rng.randrange(2))
+                self.assertEqual(actual.popitem(last=last)[0],
+                                 expected.pop(-1 if last else 0))
+            elif op == 3 and key in expected:
+                expected.remove(key)
+                expected.append(key)
+                actual[key] = actual.pop(key)
+            self.assertEqual(list(actual), expected)
+            self.assertEqual(actual.keys(), expected)
+        self.assertEqual(actual.values(), [actual[k] for k in expected])
+        actual.clear()
+        self.assertEqual((list(actual), len(actual)), ([], 0))
+        self.assertRaises(KeyError, actual.popitem)
+        pass  # void return
+
     def test_detector_prop_update_extension(self):
         from SnapSearch import Detector, error
         detector = Detector(check_file_extensions=True)
@@ -255,6 +513,24 @@ class TestDetectorProperties(unittest.TestCase):
         self.assertRaises(error.SnapSearchError, detector, request)
         pass  # void return
 
+    def test_detector_prop_extension_groups(self):
+        from SnapSearch import Detector
+        request = dict(self.ADSBOT_GOOG_MP3, PATH_INFO="/snapsearch/index.PHP")
+        detector = Detector(check_file_extensions=True)
+        self.assertFalse(detector(request))
+        detector = Detector(check_file_extensions=True,
+                            extension_groups=("generic", "php", "asp", ))
+        self.assertTrue(detector(request))
+        # the set of valid extensions is only rebuilt on changes
+        extensions = detector._get_valid_extensions()
+        self.assertTrue(extensions is detector._get_valid_extensions())
+        self.assertTrue("aspx" in extensions and "py" not in extensions)
+        detector.extensions['php'].remove("php")
+        self.assertFalse(detector(request))
+        detector.extensions['php'] += ["Php"]
+        self.assertTrue(detector(request))
+        pass  # void return
+
     pass
 
 
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.tests.test_stream
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Tests SnapSearch.api.stream
+
+    :author: `LIU Yu <liuyu@opencps.net>`_
+    :date: 2014/03/08
+"""
+
+__all__ = ['TestBodyParser',
+           'TestBodyParserBackend', ]
+
+
+import json
+import sys
+
+try:
+    from . import _config
+    from ._config import unittest
+except (ValueError, ImportError):
+    import _config
+    from _config import unittest
+
+from SnapSearch._compat import u
+
+
+HTML = u("<html lang=\"fr\">\n<body class='x'>caf\xe9 \u2713 "
+         "\U0001f600 <\\/body>\t</html>")
+
+BODY = {'code': "success",
+        'content': {
+            'status': 200,
+            'headers': [{'name': "Content-Type", 'value': "text/html"}, ],
+            'html': HTML * 3, },
+        'misc': [1, -2.5e3, True, False, None, [], {}, ""], }
+
+
+class TestBodyParser(unittest.TestCase):
+    """
+    Tests ``BodyParser`` against ``json.loads()``.
+    """
+
+    def parse(self, chunks):
+        from SnapSearch.api.stream import BodyParser
+        parser = BodyParser()
+        for chunk in chunks:
+            parser.feed(chunk)
+        return parser.close()
+
+    def test_body_parser_split(self):
+        for ensure_ascii in (True, False):
+            raw = json.dumps(BODY, ensure_ascii=ensure_ascii).encode("utf-8")
+            self.assertEqual(self.parse([raw]), BODY)
+            # split at every offset, within escape and UTF-8 sequences
+            for i in range(len(raw)):
+                self.assertEqual(self.parse([raw[:i], raw[i:]]), BODY)
+            # byte by byte
+            self.assertEqual(
+                self.parse([raw[i:i + 1] for i in range(len(raw))]), BODY)
+        pass  # void return
+
+    def test_body_parser_scalar(self):
+        for raw in (b"1", b" -12.5e1 ", b"true", b"null", b'"x"', b"[]",
+                    b"{}"):
+            self.assertEqual(self.parse([raw[:1], raw[1:]]),
+                             json.loads(raw.decode("utf-8")))
+        pass  # void return
+
+    def test_body_parser_malformed(self):
+        from SnapSearch.api.stream import BodyParser
+        for raw in (b"", b"{", b'{"a": 1}x', b'{"a" 1}', b"[1, ]", b"tru",
+                    b'"abc', b'{"a": 1, }', b"<html></html>"):
+            self.assertRaises(ValueError, self.parse, [raw])
+        # errors are deferred to ``close()``
+        parser = BodyParser()
+        parser.feed(b"<html>")
+        parser.feed(b"</html>")
+        self.assertFalse(parser.done)
+        self.assertRaises(ValueError, parser.close)
+        pass  # void return
+
+    pass
+
+
+class TestBodyParserBackend(unittest.TestCase):
+    """
+    Tests the streaming parse of large responses from a local stand-in for
+    SnapSearch backend service, through each HTTP library.
+    """
+
+    def setUp(self):
+        def responder(payload):
+            body = dict(BODY)
+            body['content'] = dict(BODY['content'], html=HTML * 20000)
+            return body
+        self.backend = _config.StandInBackend(responder).__enter__()
+        pass  # void return
+
+    def tearDown(self):
+        self.backend.__exit__()
+        pass  # void return
+
+    def make_request(self):
+        return dict(email="fantasy@email.com", key="fantasy_Api_Key",
+                    payload=json.dumps({'url': "http://localhost/"}),
+                    url=self.backend.url, ca_path=self.backend.ca_path)
+
+    def check(self, r):
+        self.assertEqual(r.status, 200)
+        self.assertEqual(r.body['code'], "success")
+        self.assertEqual(r.body['content']['html'], HTML * 20000)
+        pass  # void return
+
+    def test_body_parser_requests(self):
+        try:
+            import requests
+        except ImportError:
+            self.skipTest("requires ``requests``")
+        from SnapSearch.api.backend import _SessionViaRequests
+        session = _SessionViaRequests()
+        self.check(session.dispatch(**self.make_request()))
+        session.close()
+        pass  # void return
+
+    def test_body_parser_pycurl(self):
+        try:
+            import pycurl
+        except ImportError:
+            self.skipTest("requires ``pycurl``")
+        from SnapSearch.api.backend import _SessionViaPycurl
+        session = _SessionViaPycurl()
+        self.check(session.dispatch(**self.make_request()))
+        self.check(session.dispatch_many([self.make_request()])[0])
+        session.close()
+        pass  # void return
+
+    def test_body_parser_aio(self):
+        if _config.asyncio is None or sys.version_info < (3, 5):
+            self.skipTest("requires python 3.5+")
+        from SnapSearch.api.aio import AsyncSession
+        session = AsyncSession()
+        loop = _config.asyncio.new_event_loop()
+        try:
+            self.check(loop.run_until_complete(
+                session.dispatch(**self.make_request())))
+            session.close()
+            loop.run_until_complete(_config.asyncio.sleep(0.05))
+        finally:
+            loop.close()
+        pass  # void return
+
+    pass
+
+
+def test_suite():
+    return unittest.TestSuite([
+        unittest.TestLoader().loadTestsFromTestCase(eval(c)) for c in __all__])
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    SnapSearch.tests.test_warm
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Tests SnapSearch.warm
+
+    :author: `LIU Yu <liuyu@opencps.net>`_
+    :date: 2014/03/08
+"""
+
+__all__ = ['TestIterUrls',
+           'TestCheckpoint',
+           'TestWarm', ]
+
+
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+try:
+    from . import _config
+    from ._config import unittest
+except (ValueError, ImportError):
+    import _config
+    from _config import unittest
+
+
+SITEMAP = """<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+%s
+</urlset>
+"""
+
+SITEMAP_INDEX = """<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+%s
+</sitemapindex>
+"""
+
+
+def make_sitemap(urls):
+    # ``str`` formatting, as ``bytes`` has none before python 3.5
+    return (SITEMAP % "\n".join(
+        "<url><loc> %s </loc><lastmod>2014-03-08</lastmod></url>" % url
+        for url in urls)).encode("utf-8")
+
+
+class TestIterUrls(unittest.TestCase):
+    """
+    Tests ``iter_urls()`` with the different kinds of sources.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        pass  # void return
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        pass  # void return
+
+    def save(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_iter_urls_sitemap(self):
+        from SnapSearch.warm import iter_urls
+        urls = ["http://localhost/%d?a=1&b=2" % i for i in range(100)]
+        path = self.save("sitemap.xml", make_sitemap(urls).replace(
+            b"&b", b"&amp;b"))
+        self.assertEqual(list(iter_urls([path])), urls)
+        pass  # void return
+
+    def test_iter_urls_sitemap_index(self):
+        from SnapSearch.warm import iter_urls
+        first = self.save("first.xml", make_sitemap(["http://a/1"]))
+        second = os.path.join(self.directory, "second.xml.gz")
+        with gzip.GzipFile(second, "wb") as f:
+            f.write(make_sitemap(["http://b/1", "http://b/2"]))
+        index = self.save("index.xml", (SITEMAP_INDEX % "\n".join(
+            "<sitemap><loc>%s</loc></sitemap>" % path
+            for path in (first, second))).encode("utf-8"))
+        self.assertEqual(list(iter_urls([index, first])),
+                         ["http://a/1", "http://b/1", "http://b/2",
+                          "http://a/1"])
+        pass  # void return
+
+    def test_iter_urls_sitemap_namespace(self):
+        from SnapSearch.warm import iter_urls
+        # without a namespace, or with a former one
+        path = self.save("bare.xml", b"""<?xml version="1.0"?>
+<urlset><url><loc>http://a/1</loc></url><url><loc>http://a/2</loc></url>
+</urlset>
+""")
+        self.assertEqual(list(iter_urls([path])), ["http://a/1", "http://a/2"])
+        path = self.save("index.xml", ("""<?xml version="1.0"?>
+<sitemapindex xmlns="http://www.google.com/schemas/sitemap/0.84">
+<sitemap><loc>%s</loc></sitemap>
+</sitemapindex>
+""" % path).encode("utf-8"))
+        self.assertEqual(list(iter_urls([path])), ["http://a/1", "http://a/2"])
+        pass  # void return
+
+    def test_iter_urls_image_video(self):
+        from SnapSearch.warm import iter_urls
+        path = self.save("media.xml", b"""<?xml version="1.0"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"
+  xmlns:image="http://www.google.com/schemas/sitemap-image/1.1"
+  xmlns:video="http://www.google.com/schemas/sitemap-video/1.1">
+<url>
+  <loc>https://example.com/page.html</loc>
+  <image:image><image:loc>https://example.com/photo.jpg</image:loc>
+  </image:image>
+  <video:video>
+    <video:content_loc>https://example.com/video.mp4</video:content_loc>
+    <video:player_loc>https://example.com/player</video:player_loc>
+  </video:video>
+</url>
+<url><loc>https://example.com/other.html</loc></url>
+</urlset>
+""")
+        self.assertEqual(list(iter_urls([path])),
+                         ["https://example.com/page.html",
+                          "https://example.com/other.html"])
+        pass  # void return
+
+    def test_iter_urls_lines(self):
+        from SnapSearch._compat import u
+        from SnapSearch.warm import iter_urls
+        path = self.save("urls.txt", b"# comment\nhttp://a/1\n\n  http://a/2"
+                                     b"\r\nhttp://a/\xc3\xa9")
+        self.assertEqual(list(iter_urls([path])),
+                         ["http://a/1", "http://a/2", u("http://a/\xe9")])
+        pass  # void return
+
+    def test_iter_urls_incremental(self):
+        from SnapSearch.warm import iter_urls
+        # a sitemap of 20000 URLs (about 1.5 MB), read in chunks
+        path = self.save("large.xml", make_sitemap(
+            "http://localhost/page/%d" % i for i in range(20000)))
+        urls = iter_urls([path])
+        self.assertEqual(next(urls), "http://localhost/page/0")
+        self.assertEqual(sum(1 for url in urls), 19999)
+        pass  # void return
+
+    pass
+
+
+class TestCheckpoint(unittest.TestCase):
+    """
+    Tests ``Checkpoint`` with URLs completing out of order.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "warm.json")
+        pass  # void return
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        pass  # void return
+
+    def test_checkpoint_position(self):
+        from SnapSearch.warm import Checkpoint
+        urls = ["a", "b", "a", "c", "d"]
+        checkpoint = Checkpoint(self.path, ["sitemap.xml"])
+        issued = list(checkpoint.track(urls))
+        self.assertEqual(issued, urls)
+        for url, position in (("b", 0), ("a", 2), ("c", 2), ("a", 4)):
+            checkpoint.complete(url)
+            self.assertEqual(checkpoint.position, position)
+        checkpoint.save()
+        # resumed from the saved position, for the same sources only
+        checkpoint = Checkpoint(self.path, ["sitemap.xml"])
+        self.assertEqual(checkpoint.position, 4)
+        self.assertEqual(list(checkpoint.track(urls)), ["d"])
+        checkpoint = Checkpoint(self.path, ["other.xml"])
+        self.assertEqual(checkpoint.position, 0)
+        self.assertEqual(os.listdir(self.directory), ["warm.json"])
+        pass  # void return
+
+    def test_checkpoint_failed(self):
+        from SnapSearch.warm import Checkpoint
+        urls = ["a", "b", "c"]
+        checkpoint = Checkpoint(self.path, ["sitemap.xml"])
+        list(checkpoint.track(urls))
+        checkpoint.complete("a")
+        checkpoint.complete("b", failed=True)
+        self.assertEqual((checkpoint.position, checkpoint.failed), (2, ["b"]))
+        checkpoint.save()
+        # failed URLs are retried first, until rendered
+        checkpoint = Checkpoint(self.path, ["sitemap.xml"])
+        self.assertEqual(checkpoint.failed, ["b"])
+        self.assertEqual(list(checkpoint.track(urls)), ["b", "c"])
+        checkpoint.save()
+        self.assertEqual(Checkpoint(self.path, ["sitemap.xml"]).failed, ["b"])
+        checkpoint.complete("b")
+        checkpoint.complete("c", failed=True)
+        checkpoint.save()
+        checkpoint = Checkpoint(self.path, ["sitemap.xml"])
+        self.assertEqual((checkpoint.position, checkpoint.failed), (3, ["c"]))
+        pass  # void return
+
+    pass
+
+
+class TestWarm(unittest.TestCase):
+    """
+    Tests warming up a ``DiskStorage`` against a local stand-in for
+    SnapSearch backend service.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.backend = _config.StandInBackend().__enter__()
+        self.urls = ["http://localhost/%d" % i for i in range(30)]
+        self.sitemap = os.path.join(self.directory, "sitemap.xml")
+        with open(self.sitemap, "wb") as f:
+            f.write(make_sitemap(self.urls))
+        pass  # void return
+
+    def tearDown(self):
+        self.backend.__exit__()
+        shutil.rmtree(self.directory)
+        pass  # void return
+
+    def test_warm(self):
+        from SnapSearch import Client, Detector, Interceptor
+        from SnapSearch.cache import DiskStorage, SnapshotCache
+        from SnapSearch.warm import iter_urls, warm
+        cache_dir = os.path.join(self.directory, "snapshots")
+        progress = []
+        with Client("fantasy@email.com", "fantasy_Api_Key", {'test': 1},
+                    api_url=self.backend.url,
+                    ca_path=self.backend.ca_path) as client:
+            stats = warm(client, iter_urls([self.sitemap]),
+                         SnapshotCache(DiskStorage(cache_dir)), concurrency=4,
+                         rate=300,
+                         progress=lambda *args: progress.append(args))
+            self.assertEqual((stats.rendered, stats.failed), (30, 0))
+            self.assertEqual(len(progress), 30)
+            # at most ``rate`` URLs per second
+            self.assertTrue(stats.elapsed >= 29 / 300.0)
+            # served from the warmed snapshots by an application
+            interceptor = Interceptor(
+                client, Detector(),
+                cache=SnapshotCache(DiskStorage(cache_dir)))
+            response = interceptor({
+                'HTTP_USER_AGENT': "Googlebot/2.1",
+                'SERVER_NAME': "localhost",
+                'SERVER_PORT': "80",
+                'REQUEST_METHOD': "GET",
+                'PATH_INFO': "/7",
+                'wsgi.url_scheme': "http", })
+        self.assertEqual(response['html'],
+                         "<html><body>http://localhost/7</body></html>")
+        self.assertEqual(len(self.backend.payloads), 30)
+        pass  # void return
+
+    def test_warm_failed(self):
+        from SnapSearch import Client
+        from SnapSearch.cache import DiskStorage, SnapshotCache
+        from SnapSearch.warm import Checkpoint, iter_urls, warm
+        broken = set(["http://localhost/3", "http://localhost/20"])
+
+        def responder(payload):
+            if payload['url'] in broken:
+                return {'code': "validation_error"}
+            return _config.render_url(payload)
+
+        self.backend.responder = responder
+        cache = SnapshotCache(DiskStorage(os.path.join(self.directory, "s")))
+        path = os.path.join(self.directory, "warm.json")
+        with Client("fantasy@email.com", "fantasy_Api_Key", {'test': 1},
+                    api_url=self.backend.url,
+                    ca_path=self.backend.ca_path) as client:
+            checkpoint = Checkpoint(path, [self.sitemap])
+            stats = warm(client, iter_urls([self.sitemap]), cache,
+                         checkpoint=checkpoint)
+            self.assertEqual(stats.failed, 2)
+            self.assertEqual(sorted(checkpoint.failed), sorted(broken))
+            # only the failed URLs are rendered again when resuming
+            broken.clear()
+            checkpoint = Checkpoint(path, [self.sitemap])
+            stats = warm(client, iter_urls([self.sitemap]), cache,
+                         checkpoint=checkpoint)
+        self.assertEqual((stats.rendered, stats.failed), (2, 0))
+        self.assertEqual(checkpoint.failed, [])
+        self.assertEqual(len(self.backend.payloads), 32)
+        self.assertEqual(len(cache), 30)
+        pass  # void return
+
+    def test_warm_main(self):
+        from SnapSearch.warm import main
+        cache_dir = os.path.join(self.directory, "snapshots")
+        checkpoint = os.path.join(self.directory, "warm.json")
+        argv = ["--cache-dir", cache_dir, "--checkpoint", checkpoint,
+                "--credentials", "fantasy@email.com:fantasy_Api_Key",
+                "--parameters", '{"test": 1}', "--api-url", self.backend.url,
+                "--ca-path", self.backend.ca_path, "--concurrency", "4",
+                self.sitemap]
+        try:
+            from StringIO import StringIO
+        except ImportError:
+            from io import StringIO
+        stderr, sys.stderr = sys.stderr, StringIO()
+        try:
+            self.assertEqual(main(argv), 0)
+            with open(checkpoint) as f:
+                self.assertEqual(json.load(f)['position'], 30)
+            self.assertEqual(len(os.listdir(cache_dir)), 30)
+            # resumed after the completed URLs
+            self.assertEqual(main(argv), 0)
+            self.assertEqual(len(self.backend.payloads), 30)
+            self.assertTrue("resuming after 30 URLs" in sys.stderr.getvalue())
+            # invalid options
+            self.assertEqual(main(argv[:-1] + ["--ca-path", "/nonexistent",
+                                               self.sitemap]), 2)
+        finally:
+            sys.stderr = stderr
+        pass  # void return
+
+    def test_warm_main_not_rendered(self):
+        from SnapSearch.warm import main
+        checkpoint = os.path.join(self.directory, "warm.json")
+        argv = ["--cache-dir", os.path.join(self.directory, "snapshots"),
+                "--checkpoint", checkpoint,
+                "--credentials", "fantasy@email.com:fantasy_Api_Key",
+                "--api-url", self.backend.url,
+                "--ca-path", self.backend.ca_path, self.sitemap]
+        # neither rendered nor failed as of ``Client.__call__()``
+        self.backend.responder = lambda payload: {'code': "error",
+                                                  'content': {}}
+        try:
+            from StringIO import StringIO
+        except ImportError:
+            from io import StringIO
+        stderr, sys.stderr = sys.stderr, StringIO()
+        try:
+            self.assertEqual(main(argv), 1)
+            self.assertTrue("failed: http://localhost/0 (not rendered)" in
+                            sys.stderr.getvalue())
+            self.assertEqual(main(argv), 1)
+            self.assertTrue("retrying 30 failed" in sys.stderr.getvalue())
+        finally:
+            sys.stderr = stderr
+        pass  # void return
+
+    pass
+
+
+def test_suite():
+    return unittest.TestSuite([
+        unittest.TestLoader().loadTestsFromTestCase(eval(c)) for c in __all__])
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -10,7 +10,8 @@
     :date: 2014/03/08
 """
 
-__all__ = ['TestMiddlewareMethods', ]
+__all__ = ['TestMiddlewareMethods',
+           'TestMiddlewareStandIn', ]
 
 
 import json
@@ -161,6 +162,102 @@ class TestMiddlewareMethods(unittest.TestCase):
     pass
 
 
+class TestMiddlewareStandIn(unittest.TestCase):
+    """
+    Tests ``InterceptorMiddleware.__call__()`` against a local stand-in for
+    SnapSearch backend service.
+    """
+
+    ROBOT_REQUEST = {
+        'HTTP_USER_AGENT': "AdsBot-Google",
+        'SERVER_NAME': "localhost",
+        'SERVER_PORT': "80",
+        'REQUEST_METHOD': "GET",
+        'PATH_INFO': "/",
+        'wsgi.url_scheme': "http", }
+
+    def make_middleware(self, backend, response_callback=None, **kwds):
+        from SnapSearch import Client, Detector, Interceptor
+        from SnapSearch.wsgi import InterceptorMiddleware
+        client = Client("fantasy@email.com", "fantasy_Api_Key", {'test': 1},
+                        api_url=backend.url, ca_path=backend.ca_path)
+        return InterceptorMiddleware(DummyApp(), Interceptor(
+            client, Detector()), response_callback, **kwds)
+
+    def test_middleware_native_strings(self):
+        from SnapSearch._compat import u
+        started = []
+
+        def responder(payload):
+            body = _config.render_url(payload)
+            body['content']['headers'].append(
+                {'name': "Location", 'value': u("/caf\xe9")})
+            return body
+
+        with _config.StandInBackend(responder) as backend:
+            im = self.make_middleware(backend)
+            body = im(dict(self.ROBOT_REQUEST),
+                      lambda status, headers: started.append(
+                          (status, headers)))
+            im.interceptor.client.close()
+        status, headers = started[0]
+        self.assertEqual(status, "200 OK")
+        # :PEP:`3333`: native strings of the ISO-8859-1 encoded headers
+        self.assertTrue(all(isinstance(name, str) and isinstance(val, str)
+                            for name, val in headers))
+        self.assertEqual(dict(headers)['location'],
+                         u("/caf\xe9").encode("utf-8").decode("iso-8859-1"))
+        self.assertEqual(body, (
+            b"<html><body>http://localhost/</body></html>", ))
+        pass  # void return
+
+    def test_middleware_body_without_copy(self):
+        from SnapSearch.api.response import message_extractor
+        shipped = []
+
+        @message_extractor
+        def callback(message):
+            shipped.append(message['html'])
+            return message
+
+        with _config.StandInBackend() as backend:
+            im = self.make_middleware(backend, callback)
+            body, = im(dict(self.ROBOT_REQUEST), lambda *args: None)
+            im.interceptor.client.close()
+        # the encoded body is handed to the server as is
+        self.assertTrue(body is shipped[0])
+        pass  # void return
+
+    def test_middleware_chunk_size(self):
+        started = []
+
+        def responder(payload):
+            body = _config.render_url(payload)
+            # stale length from the backend
+            body['content']['headers'].append(
+                {'name': "Content-Length", 'value': "1"})
+            return body
+
+        with _config.StandInBackend(responder) as backend:
+            im = self.make_middleware(backend, None, chunk_size=8)
+            self.assertEqual(im.chunk_size, 8)
+            chunks = list(im(dict(self.ROBOT_REQUEST),
+                             lambda status, headers: started.append(
+                                 headers)))
+            im.interceptor.client.close()
+        html = b"<html><body>http://localhost/</body></html>"
+        self.assertEqual(b"".join(chunks), html)
+        self.assertEqual([len(chunk) for chunk in chunks],
+                         [8] * 5 + [3])
+        # the whole length, set up front
+        self.assertEqual([val for name, val in started[0]
+                          if name.lower() == "content-length"],
+                         [str(len(html))])
+        pass  # void return
+
+    pass
+
+
 def test_suite():
     return unittest.TestSuite([
         unittest.TestLoader().loadTestsFromTestCase(eval(c)) for c in __all__])